@@ -13,22 +13,112 @@ short_description: Action to render templates used with the tipsconfig_write mod
 version_added: "2.9"
 '''
 
+import functools
+import multiprocessing
 import os
+import threading
 import jinja2
 
+from concurrent.futures import ProcessPoolExecutor
+
 from ansible.plugins.action import ActionBase
 from ansible.errors import AnsibleError, AnsibleFileNotFound, AnsibleAction, AnsibleActionFail
 from ansible.module_utils._text import to_bytes, to_text, to_native
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import XMLValidator
+
+
+# Environments are shared by all tasks run by the same worker process, e.g.
+# every item of a loop, so each template is only compiled once. Compiled
+# templates are also kept on disk for later processes.
+_ENVIRONMENTS = dict()
+_ENVIRONMENTS_LOCK = threading.Lock()
+_BYTECODE_CACHE = jinja2.FileSystemBytecodeCache()
+
+# Template, context and items of the bulk render in progress. Render processes
+# are forked, so they inherit the compiled template and task vars instead of
+# receiving them pickled, and only item indexes and rendered payloads cross
+# the process boundary.
+_RENDER_JOB = None
+
+
+@functools.lru_cache(maxsize=256)
+def build_searchpath(base, basedir, source_dir):
+    searchpath = list(base) + [basedir, source_dir]
+    searchpath.extend([os.path.join(path, 'templates') for path in searchpath])
+    return tuple(dict.fromkeys(searchpath))
+
+
+def get_environment(searchpath):
+    with _ENVIRONMENTS_LOCK:
+        env = _ENVIRONMENTS.get(searchpath)
+        if env is None:
+            env = jinja2.Environment(
+                loader=jinja2.FileSystemLoader(list(searchpath)),
+                autoescape=jinja2.select_autoescape(['html', 'xml']),
+                bytecode_cache=_BYTECODE_CACHE
+            )
+            _ENVIRONMENTS[searchpath] = env
+        return env
+
+
+def render_validated(template, context):
+    # Render chunk by chunk so malformed output fails as soon as it is produced,
+    # the payload being joined once and never parsed into a tree here.
+    validator = XMLValidator()
+    chunks = list()
+    for chunk in template.generate(**context):
+        validator.feed(chunk)
+        chunks.append(chunk)
+    validator.close()
+    return to_text(''.join(chunks))
+
+
+def render_item(index):
+    template, context, items = _RENDER_JOB
+    return render_validated(template, dict(context, item=items[index]))
+
+
+def render_bulk(template, context, items, workers=1):
+    """Renders the template once per item, spread over workers forked processes."""
+    global _RENDER_JOB
+    if workers <= 1 or len(items) <= 1:
+        return [render_validated(template, dict(context, item=item)) for item in items]
+    _RENDER_JOB = (template, context, items)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('fork')
+        ) as executor:
+            chunksize = max(1, len(items) // (workers * 4))
+            return list(executor.map(render_item, range(len(items)), chunksize=chunksize))
+    finally:
+        _RENDER_JOB = None
 
 
 class ActionModule(ActionBase):
 
     def get_template_searchpath(self, task_vars, source):
-        searchpath = task_vars.get('ansible_search_path', [])
-        searchpath.extend([self._loader._basedir, os.path.dirname(source)])
-        for i in range(len(searchpath)):
-            searchpath.append(os.path.join(searchpath[i], 'templates'))
-        return searchpath
+        return build_searchpath(
+            tuple(task_vars.get('ansible_search_path', [])),
+            self._loader._basedir,
+            os.path.dirname(source)
+        )
+
+    def render_template(self, task_vars, template_source):
+        try:
+            searchpath = self.get_template_searchpath(task_vars, template_source)
+            template = get_environment(searchpath).get_template(template_source)
+            return render_validated(template, task_vars)
+        except Exception as exc:
+            raise AnsibleActionFail(f'Error trying to process template, {type(exc).__name__}: {to_text(exc)}')
+
+    def render_items(self, task_vars, template_source, items, workers=1):
+        try:
+            searchpath = self.get_template_searchpath(task_vars, template_source)
+            template = get_environment(searchpath).get_template(template_source)
+            return render_bulk(template, task_vars, items, workers)
+        except Exception as exc:
+            raise AnsibleActionFail(f'Error trying to process template, {type(exc).__name__}: {to_text(exc)}')
 
     def run(self, tmp=None, task_vars=None):
 
@@ -39,21 +129,30 @@ class ActionModule(ActionBase):
             task_vars = dict()
         result = super(ActionModule, self).run(tmp, task_vars)
 
+        # If a template is provided along with items, render it once per item
+        # and replace the list of payloads with rendered contents.
+        if module_args.get('template', None) and module_args.get('items', None) is not None:
+            module_args['payloads'] = self.render_items(
+                task_vars,
+                module_args['template'],
+                module_args['items'],
+                int(module_args.get('render_workers', None) or 1)
+            )
+            module_args['template'] = None
+            module_args['items'] = None
+
         # If a template file path is provided in the module arguments,
         # render it and replace the xml payload with rendered contents.
         if module_args.get('template', None):
-            template_source = module_args['template']
-            try:
-                searchpath = self.get_template_searchpath(task_vars, template_source)
-                env = jinja2.Environment(
-                    loader=jinja2.FileSystemLoader(searchpath),
-                    autoescape=jinja2.select_autoescape(['html', 'xml'])
-                )
-                template = env.get_template(template_source)
-                module_args['template'] = None
-                module_args['xml'] = to_text(template.render(**task_vars))
-            except Exception as exc:
-                raise AnsibleActionFail(f'Error trying to process template, {type(exc).__name__}: {to_text(exc)}')
+            module_args['xml'] = self.render_template(task_vars, module_args['template'])
+            module_args['template'] = None
+
+        # Likewise, a list of templates replaces the list of payloads.
+        if module_args.get('templates', None):
+            module_args['payloads'] = [
+                self.render_template(task_vars, source) for source in module_args['templates']
+            ]
+            module_args['templates'] = None
 
         # Execute the module and return final result.
         result.update(self._execute_module(
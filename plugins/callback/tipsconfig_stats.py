@@ -0,0 +1,264 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+author: Sacha Boudjema (@sachaboudjema)
+callback: tipsconfig_stats
+type: aggregate
+short_description: Aggregates the tipsconfig API calls of a playbook run.
+description:
+  - Collects the results of the tipsconfig modules and aggregates them per entity type and API method.
+  - Reports API request counts, error rates, 50th, 95th and 99th latency percentiles and request and response
+    sizes in a table at the end of the playbook.
+  - Request counts, latencies and sizes are taken from the C(timings) result of the modules when the I(timings)
+    option is set, each request of a task counting with the mean latency of the task's requests. Otherwise each
+    task counts as one request, timed by the task duration and sized by the encoded C(tips_request) and
+    C(tips_response).
+  - Errors count the failed tasks that sent requests.
+  - Optionally writes the same figures to a JSON file, or to a Prometheus textfile collector file.
+version_added: "2.9"
+requirements:
+  - enable in configuration, e.g. C(callbacks_enabled = sachaboudjema.tipsconfig.tipsconfig_stats)
+options:
+  json_path:
+    description:
+      - Path of the JSON file to write the statistics to.
+    type: path
+    env:
+      - name: ANSIBLE_TIPSCONFIG_STATS_JSON
+    ini:
+      - section: callback_tipsconfig_stats
+        key: json_path
+  prometheus_path:
+    description:
+      - Path of the Prometheus textfile to write the statistics to, e.g. in the node exporter textfile directory.
+      - The file is replaced atomically.
+    type: path
+    env:
+      - name: ANSIBLE_TIPSCONFIG_STATS_PROMETHEUS
+    ini:
+      - section: callback_tipsconfig_stats
+        key: prometheus_path
+'''
+
+import json
+import os
+import tempfile
+import time
+
+from collections import defaultdict
+from ansible.module_utils._text import to_bytes
+from ansible.plugins.callback import CallbackBase
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.output import FILE_MODE
+
+MODULE_PREFIX = 'tipsconfig_'
+MODULE_METHODS = {
+    'tipsconfig_read': 'read',
+    'tipsconfig_namelist': 'namelist',
+    'tipsconfig_deleteconfirm': 'deleteConfirm',
+    'tipsconfig_write': 'write',
+    'tipsconfig_delete': 'delete',
+    'tipsconfig_reorder': 'reorder',
+    'tipsconfig_statuschange': 'status',
+    'tipsconfig_export': 'export',
+}
+PERCENTILES = (50, 95, 99)
+METRIC_PREFIX = 'tipsconfig'
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return 0.0
+    rank = max(1, -(-p * len(values) // 100))
+    return values[rank - 1]
+
+
+def module_name(action):
+    return action.rpartition('.')[2]
+
+
+def prometheus_labels(**labels):
+    return ','.join('{0}="{1}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels.items())
+
+
+class CallStats:
+    """Requests of one API method on one entity type."""
+
+    def __init__(self):
+        self.latencies = list()
+        self.errors = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    @property
+    def calls(self):
+        return len(self.latencies)
+
+    def add(self, latencies, request_bytes, response_bytes, failed):
+        self.latencies.extend(latencies)
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+        self.errors += bool(failed and latencies)
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        return dict(
+            calls=self.calls,
+            errors=self.errors,
+            error_rate=round(self.errors / self.calls, 4) if self.calls else 0.0,
+            latency={f'p{p}': round(percentile(latencies, p), 6) for p in PERCENTILES},
+            latency_sum=round(sum(latencies), 6),
+            request_bytes=self.request_bytes,
+            response_bytes=self.response_bytes
+        )
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'sachaboudjema.tipsconfig.tipsconfig_stats'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        self.stats = defaultdict(CallStats)
+        self.started = dict()
+
+    def _is_tipsconfig(self, task):
+        return module_name(task.action).startswith(MODULE_PREFIX)
+
+    def _key(self, result):
+        return result._host.get_name(), result._task._uuid
+
+    def _elapsed(self, result):
+        # Items of a loop are timed from the end of the previous one.
+        now = time.monotonic()
+        start = self.started.get(self._key(result), now)
+        self.started[self._key(result)] = now
+        return now - start
+
+    def _record(self, result, data, failed):
+        task = result._task
+        name = module_name(task.action)
+        method = MODULE_METHODS.get(name, name[len(MODULE_PREFIX):])
+        entity = data.get('invocation', {}).get('module_args', {}).get('entity') or task.args.get('entity') or '-'
+        elapsed = self._elapsed(result)
+        timings = data.get('timings')
+        if timings:
+            # Only the totals of the task are known, not the latency of each request.
+            requests = timings['requests']
+            latencies = [(timings['transport'] + timings['server']) / requests] * requests if requests else []
+            request_bytes = timings['request_bytes']
+            response_bytes = timings['response_bytes']
+        else:
+            latencies = [elapsed]
+            request_bytes = len(to_bytes(data.get('tips_request') or ''))
+            response_bytes = len(to_bytes(data.get('tips_response') or ''))
+        self.stats[(str(entity), method)].add(latencies, request_bytes, response_bytes, failed)
+
+    def _handle(self, result, failed):
+        if not self._is_tipsconfig(result._task) or 'results' in result._result:
+            return
+        if result._result.get('skipped'):
+            return
+        self._record(result, result._result, failed)
+
+    def v2_runner_on_start(self, host, task):
+        if self._is_tipsconfig(task):
+            self.started[(host.get_name(), task._uuid)] = time.monotonic()
+
+    def v2_runner_on_ok(self, result):
+        self._handle(result, False)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._handle(result, True)
+
+    def v2_runner_on_unreachable(self, result):
+        self._handle(result, True)
+
+    def v2_runner_item_on_ok(self, result):
+        self._handle(result, False)
+
+    def v2_runner_item_on_failed(self, result):
+        self._handle(result, True)
+
+    def summaries(self):
+        return [
+            dict(entity=entity, method=method, **stats.summary())
+            for (entity, method), stats in sorted(self.stats.items())
+        ]
+
+    def v2_playbook_on_stats(self, stats):
+        if not self.stats:
+            return
+        summaries = self.summaries()
+        self.display_table(summaries)
+        if self.get_option('json_path'):
+            self.write_file(self.get_option('json_path'), json.dumps(summaries, indent=2, sort_keys=True) + '\n')
+        if self.get_option('prometheus_path'):
+            self.write_file(self.get_option('prometheus_path'), self.prometheus(summaries))
+
+    def display_table(self, summaries):
+        header = ('ENTITY', 'METHOD', 'CALLS', 'ERR%', 'P50', 'P95', 'P99', 'BYTES OUT', 'BYTES IN')
+        rows = [header] + [
+            (
+                s['entity'], s['method'], str(s['calls']), f"{s['error_rate'] * 100:.1f}",
+                *(f"{s['latency'][f'p{p}']:.3f}" for p in PERCENTILES),
+                str(s['request_bytes']), str(s['response_bytes'])
+            )
+            for s in summaries
+        ]
+        widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+        self._display.banner('TIPSCONFIG API STATS')
+        for row in rows:
+            self._display.display('  '.join(
+                cell.ljust(width) if i < 2 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            ))
+
+    def prometheus(self, summaries):
+        lines = [
+            f'# HELP {METRIC_PREFIX}_request_duration_seconds Latency of tipsconfig API requests.',
+            f'# TYPE {METRIC_PREFIX}_request_duration_seconds summary',
+        ]
+        for s in summaries:
+            labels = dict(entity=s['entity'], method=s['method'])
+            for p in PERCENTILES:
+                quantile = prometheus_labels(**labels, quantile=p / 100)
+                lines.append(f"{METRIC_PREFIX}_request_duration_seconds{{{quantile}}} {s['latency'][f'p{p}']}")
+            lines.append(f"{METRIC_PREFIX}_request_duration_seconds_sum{{{prometheus_labels(**labels)}}} {s['latency_sum']}")
+            lines.append(f"{METRIC_PREFIX}_request_duration_seconds_count{{{prometheus_labels(**labels)}}} {s['calls']}")
+        counters = (
+            ('errors_total', 'errors', 'Failed tipsconfig tasks that sent API requests.'),
+            ('request_bytes_total', 'request_bytes', 'Bytes sent to the tipsconfig API.'),
+            ('response_bytes_total', 'response_bytes', 'Bytes received from the tipsconfig API.'),
+        )
+        for metric, field, description in counters:
+            lines.append(f'# HELP {METRIC_PREFIX}_{metric} {description}')
+            lines.append(f'# TYPE {METRIC_PREFIX}_{metric} counter')
+            for s in summaries:
+                labels = prometheus_labels(entity=s['entity'], method=s['method'])
+                lines.append(f'{METRIC_PREFIX}_{metric}{{{labels}}} {s[field]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_file(self, path, content):
+        path = os.path.expanduser(path)
+        directory = os.path.dirname(os.path.abspath(path))
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tipsconfig_stats.')
+            with os.fdopen(fd, 'w') as f:
+                f.write(content)
+            os.chmod(tmp, FILE_MODE)
+            os.replace(tmp, path)
+        except OSError as exc:
+            if tmp is not None and os.path.exists(tmp):
+                os.unlink(tmp)
+            self._display.warning(f'Could not write tipsconfig stats to {path}: {exc}')
@@ -13,36 +13,777 @@ httpapi: sachaboudjema.aruba.clearpass
 short_description: HttpApi Plugin for Aruba Clearpass SOAP Configuration API.
 description:
   - Implements the httpapi connection type for Aruba Clearpass Configuration API.
+  - The tipsconfig_read, tipsconfig_namelist, tipsconfig_write and tipsconfig_delete modules only validate their
+    arguments, the API requests being built and their responses parsed by the persistent connection.
 version_added: "2.9"
+options:
+  keepalive:
+    type: bool
+    description:
+      - Keep HTTP(S) connections to the server open and reuse them for subsequent requests,
+        including requests of later tasks served by the same persistent connection.
+      - When disabled, every request opens a new connection.
+      - Kept connections honour the C(session_key), C(ca_path), C(validate_certs), C(client_cert),
+        C(client_key), C(ciphers) and C(http_agent) options of the connection. Requests go through
+        the stock transport instead when a proxy applies to the host and C(use_proxy) is set.
+    default: yes
+    vars:
+      - name: ansible_tipsconfig_keepalive
+  compression:
+    type: bool
+    description:
+      - Advertise gzip and deflate support to the server and decompress encoded responses.
+    default: yes
+    vars:
+      - name: ansible_tipsconfig_compression
+  compress_request:
+    type: bool
+    description:
+      - Gzip-compress request bodies and flag them with a C(Content-Encoding) header.
+      - Only enable this if the server accepts compressed requests.
+    default: no
+    vars:
+      - name: ansible_tipsconfig_compress_request
+  cache_ttl:
+    type: int
+    description:
+      - Number of seconds successful read, namelist and deleteConfirm responses are cached for
+        by the persistent connection, keyed by request path and body.
+      - Cached responses of an entity type are discarded whenever a write, delete, reorder or
+        status change is sent for it, or a write carries elements of that type.
+      - The cache is disabled when set to 0.
+    default: 0
+    vars:
+      - name: ansible_tipsconfig_cache_ttl
+  cache_max_bytes:
+    type: int
+    description:
+      - Maximum total size of the cached responses. The least recently used ones are evicted first.
+    default: 67108864
+    vars:
+      - name: ansible_tipsconfig_cache_max_bytes
+  max_concurrency:
+    type: int
+    description:
+      - Maximum number of requests in flight at once on this persistent connection, e.g. by tipsconfig_export.
+      - The limit is halved whenever the server answers with a retryable error, and grows back by one
+        request per successful round of requests, up to this value.
+    default: 4
+    vars:
+      - name: ansible_tipsconfig_max_concurrency
+  rate_limit:
+    type: float
+    description:
+      - Maximum sustained number of requests per second sent on this persistent connection.
+      - The rate limit is disabled when set to 0.
+    default: 0
+    vars:
+      - name: ansible_tipsconfig_rate_limit
+  rate_burst:
+    type: int
+    description:
+      - Number of requests that may be sent at once above I(rate_limit) after an idle period.
+    default: 5
+    vars:
+      - name: ansible_tipsconfig_rate_burst
+  request_timeout:
+    type: float
+    description:
+      - Socket timeout in seconds of a single attempt of a request, C(persistent_command_timeout) when set to 0.
+      - The attempts of a request, the delays between them and the waits for I(rate_limit) and
+        I(max_concurrency) all count against C(persistent_command_timeout), a request not being retried
+        once it has run out.
+    default: 0
+    vars:
+      - name: ansible_tipsconfig_request_timeout
+  retries:
+    type: int
+    description:
+      - Number of times a request is retried after a retryable HTTP status, a timeout or a connection failure.
+      - Write, delete, reorder and status change requests are only retried on HTTP 429 and 503 and when
+        no connection to the server could be established, as the server may have applied them otherwise.
+    default: 3
+    vars:
+      - name: ansible_tipsconfig_retries
+  retry_backoff:
+    type: float
+    description:
+      - Base delay in seconds between retries. The delay doubles with every attempt and a random
+        jitter between zero and the delay is applied. A C(Retry-After) header sent by the server
+        takes precedence when longer.
+    default: 1.0
+    vars:
+      - name: ansible_tipsconfig_retry_backoff
+  retry_max_backoff:
+    type: float
+    description:
+      - Upper bound of the delay in seconds between retries.
+    default: 30.0
+    vars:
+      - name: ansible_tipsconfig_retry_max_backoff
+  retry_statuses:
+    type: list
+    elements: int
+    description:
+      - HTTP status codes a request is retried on. Only 429 and 503 apply to write, delete, reorder
+        and status change requests.
+    default: [429, 500, 502, 503, 504]
+    vars:
+      - name: ansible_tipsconfig_retry_statuses
+  index:
+    type: bool
+    description:
+      - Keep an index of element names and element-ids, filled from the namelist, read and deleteConfirm
+        responses and updated by the write and delete requests sent through the persistent connection.
+      - Used by the tipsconfig_lookup module to resolve names without API calls.
+    default: no
+    vars:
+      - name: ansible_tipsconfig_index
+  index_path:
+    type: path
+    description:
+      - Path of a SQLite database the index is mirrored to, so that it outlives the persistent connection.
+      - The index is only kept in memory when not set.
+    vars:
+      - name: ansible_tipsconfig_index_path
+  index_ttl:
+    type: int
+    description:
+      - Number of seconds index entries are trusted for. They never expire when set to 0.
+    default: 3600
+    vars:
+      - name: ansible_tipsconfig_index_ttl
 '''
 
-from ansible.module_utils._text import to_text, to_native
+import base64
+import gzip
+import hashlib
+import random
+import re
+import select
+import socket
+import ssl
+import threading
+import time
+import zlib
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from ansible.module_utils._text import to_bytes, to_text, to_native
+from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible.module_utils.six.moves.urllib.request import getproxies, proxy_bypass
 from ansible.errors import AnsibleConnectionFailure
 from ansible.plugins.httpapi import HttpApiBase
-from http.client import HTTPException
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.choices import EntityChoices
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.elementindex import ElementIndex
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.operations import (
+    run_delete_batch, run_namelist, run_read, run_task, run_write_batch
+)
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.output import dump_response
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import ROOT_PATH, TipsApiError
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
 
 CHARSET = 'UTF-8'
 HEADERS = {
     'Accept': '*/*',
     'Content-Type': 'application/xml'
 }
+ACCEPT_ENCODING = 'gzip, deflate'
+CHUNK_SIZE = 64 * 1024
+GZIP_MAGIC = b'\x1f\x8b'
+CACHEABLE_METHODS = frozenset(('read', 'namelist', 'deleteConfirm'))
+MODIFYING_METHODS = frozenset(('write', 'delete', 'reorder', 'status'))
+# Statuses telling the server did not process the request, which can then be
+# sent again even when not idempotent.
+REPLAYABLE_STATUSES = frozenset((429, 503))
+UNSENT_ERRORS = (ConnectionRefusedError, socket.gaierror)
+ENTITY_ATTR_RE = re.compile(rb'entity="([^"]*)"')
+TAG_RE = re.compile(rb'<(?:\w+:)?(\w+)[\s/>]')
+ENTITY_TAGS = frozenset(to_bytes(e) for e in EntityChoices.CHOICES)
+SUCCESS_STATUS = b'<StatusCode>Success</StatusCode>'
+
+
+def decompressor(encoding):
+    if encoding == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        # Accepts zlib framed streams, and gzip framed ones sent by mislabelled servers.
+        return zlib.decompressobj(32 + zlib.MAX_WBITS)
+    return None
+
+
+def decode_content(data, encoding):
+    # The stock transport may already have decoded the body while leaving
+    # the Content-Encoding header in place, so check the payload as well.
+    if encoding == 'gzip' and data[:2] != GZIP_MAGIC:
+        return data
+    if encoding == 'deflate' and data.lstrip()[:1] == b'<':
+        return data
+    d = decompressor(encoding)
+    if d is None:
+        return data
+    try:
+        return d.decompress(data) + d.flush()
+    except zlib.error:
+        if encoding == 'deflate':
+            return zlib.decompress(data, -zlib.MAX_WBITS)
+        raise
+
+
+def modified_entities(entity, data):
+    """Returns the entity types a modifying request may change.
+
+    Those are the entity type of the request path, the ones named by entity
+    attributes, and the ones of the elements of the body, as a write document
+    may carry containers of several entity types.
+    """
+    entities = {entity}
+    if data:
+        entities.update(to_text(e) for e in ENTITY_ATTR_RE.findall(data))
+        entities.update(to_text(t) for t in set(TAG_RE.findall(data)) & ENTITY_TAGS)
+    return entities
+
+
+class ConnectFailure(AnsibleConnectionFailure):
+    """Raised when no connection to the server could be established, nothing of the request being sent."""
+
+
+def caused_by(exc, types):
+    """Tells whether an exception, or one it was raised from or wraps as reason, is of one of the types."""
+    while exc is not None:
+        if isinstance(exc, types) or isinstance(getattr(exc, 'reason', None), types):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def timed_out(exc):
+    """Tells whether a request failed on a socket timeout, after which the server may still process it."""
+    return caused_by(exc, socket.timeout)
+
+
+def unsent(exc):
+    """Tells whether a request failed before any of it was sent."""
+    return caused_by(exc, (ConnectFailure,) + UNSENT_ERRORS)
+
+
+def is_alive(conn):
+    """Tells whether an idle connection can be reused, i.e. the server has not closed it.
+
+    An idle connection has nothing to read, unless the server closed it.
+    """
+    if conn.sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return False
+    return not readable
+
+
+def split_path(path):
+    """Returns the API method and entity of a request path."""
+    method, _, entity = path[len(ROOT_PATH) + 1:].partition('/')
+    return method, entity
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of responses, invalidated by entity type."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, entities, response, ttl, max_bytes):
+        if len(response) > max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (time.monotonic() + ttl, entities, response)
+            self.size += len(response)
+            while self.size > max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, entity):
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if entity in e[1]]:
+                self._discard(key)
+                self.invalidations += 1
+
+    def _discard(self, key):
+        self.size -= len(self._entries.pop(key)[2])
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                entries=len(self._entries),
+                bytes=self.size,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                invalidations=self.invalidations
+            )
+
+
+class TokenBucket:
+    """Token bucket rate limiter, refilled at rate tokens per second up to burst tokens."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tokens = None
+        self.updated = time.monotonic()
+
+    def acquire(self, rate, burst):
+        if rate <= 0:
+            return
+        burst = max(1, burst)
+        with self._lock:
+            now = time.monotonic()
+            if self.tokens is None:
+                self.tokens = burst
+            self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            # Take the token right away and wait for it to be refilled, so that
+            # concurrent callers queue up in order without holding the lock.
+            self.tokens -= 1
+            wait = -self.tokens / rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class ConcurrencyLimiter:
+    """Bounds the requests in flight, backing off multiplicatively on overload (AIMD)."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.limit = None
+
+    def acquire(self, maximum, timeout=None):
+        """Waits for a request slot, returning False if none freed up within timeout seconds."""
+        maximum = max(1, maximum)
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self.limit is None or self.limit > maximum:
+                self.limit = float(maximum)
+            while self.in_flight >= int(self.limit):
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, overloaded, maximum):
+        with self._cond:
+            self.in_flight -= 1
+            if overloaded:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(max(1, maximum)), self.limit + 1 / self.limit)
+            self._cond.notify_all()
 
 
 class HttpApi(HttpApiBase):
 
+    def __init__(self, connection):
+        super(HttpApi, self).__init__(connection)
+        self._idle = list()
+        self._idle_lock = threading.Lock()
+        self._cache = ResponseCache()
+        self._local = threading.local()
+        self._last_timing = None
+        self._bucket = TokenBucket()
+        self._limiter = ConcurrencyLimiter()
+        self._index = None
+        self._index_lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+
+    def get_headers(self):
+        headers = dict(HEADERS)
+        if self.get_option('compression'):
+            headers['Accept-Encoding'] = ACCEPT_ENCODING
+        return headers
+
+    def encode_request(self, data, headers):
+        if data is None:
+            return None
+        if self.get_option('compress_request'):
+            data = gzip.compress(data)
+            headers['Content-Encoding'] = 'gzip'
+        return data
+
     def send_request(self, path, method='POST', params=dict(), data=None):
+        tips_method, entity = split_path(path)
+        data = to_bytes(data, encoding=CHARSET) if data is not None else None
+
+        timing = dict(http=0.0, server=0.0, request_bytes=len(data or b''), response_bytes=0, cached=False, retries=0)
+        self._last_timing = self._local.timing = timing
+
+        key = None
+        if tips_method in CACHEABLE_METHODS and self.get_option('cache_ttl') > 0:
+            key = hashlib.sha256(to_bytes(path) + b'\0' + (data or b'')).digest()
+            cached = self._cache.get(key)
+            if cached is not None:
+                timing.update(response_bytes=len(cached), cached=True)
+                return cached
+
+        self._local.server = None
+        self._local.retries = 0
+        start = time.perf_counter()
+        try:
+            response = self.transmit(path, data, method)
+        except Exception:
+            self.update_index(tips_method, entity, data, None)
+            raise
+        finally:
+            timing['http'] = time.perf_counter() - start
+            timing['retries'] = self._local.retries
+            timing['server'] = timing['http'] if self._local.server is None else self._local.server
+            if tips_method in MODIFYING_METHODS and self.get_option('cache_ttl') > 0:
+                for modified in modified_entities(entity, data):
+                    self._cache.invalidate(modified)
+        timing['response_bytes'] = len(response)
+        self.update_index(tips_method, entity, data, response)
+
+        if key is not None and SUCCESS_STATUS in response:
+            entities = frozenset(to_text(e) for e in ENTITY_ATTR_RE.findall(data or b'')) | {entity}
+            self._cache.put(key, entities, response, self.get_option('cache_ttl'), self.get_option('cache_max_bytes'))
+        return response
+
+    def get_cache_stats(self):
+        stats = self._cache.stats()
+        stats['enabled'] = self.get_option('cache_ttl') > 0
+        return stats
+
+    def get_index(self):
+        if not self.get_option('index'):
+            return None
+        with self._index_lock:
+            if self._index is None:
+                self._index = ElementIndex(self.get_option('index_path'), self.get_option('index_ttl'))
+            return self._index
+
+    def update_index(self, tips_method, entity, data, response):
+        index = self.get_index()
+        if index is None:
+            return
+        success = response is not None and SUCCESS_STATUS in response
+        try:
+            index.record(tips_method, entity, data or b'', response or b'', success)
+        except Exception as exc:
+            # The index is an optimization, never fail a request over it.
+            index.invalidate(entity)
+            self.connection.queue_message('warning', f'Could not update the element index: {to_text(exc)}')
+
+    def lookup_elements(self, entity, names):
+        """Returns the index entries of names, see ElementIndex.lookup()."""
+        index = self.get_index()
+        if index is None:
+            return dict(enabled=False, elements={name: dict(exists=None, element_id=None) for name in names})
+        return dict(enabled=True, elements=index.lookup(entity, names))
+
+    def get_index_stats(self):
+        index = self.get_index()
+        if index is None:
+            return dict(enabled=False)
+        return dict(index.stats(), enabled=True)
+
+    def get_request_timing(self):
+        """Returns the HTTP timing and body sizes of the last request sent.
+
+        server is the time from sending the request to receiving the response
+        headers, http also covers connecting and reading the body. Without
+        keepalive the stock transport gives no such split and both are equal.
+        """
+        if self._last_timing is None:
+            return dict(http=0.0, server=0.0, request_bytes=0, response_bytes=0, cached=False)
+        return dict(self._last_timing)
+
+    def send_requests(self, jobs, workers=1):
+        """Sends several requests concurrently.
+
+        Each job is a dict with the path and data of a request. Returns, in
+        order, a dict per job with either the response or the error raised,
+        and the timing of the request.
+        """
+        def run(job):
+            try:
+                result = dict(response=self.send_request(job['path'], data=job['data']))
+            except Exception as exc:
+                result = dict(error=f'{type(exc).__name__}: {to_text(exc)}')
+            result['timing'] = dict(self._local.timing)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            return list(executor.map(run, jobs))
+
+    def export_responses(self, jobs, workers=1):
+        """Sends several requests concurrently, streaming each response to its own file.
+
+        Each job is a dict with the entity, path and data of the request and the
+        dest and compress arguments of dump_response(). Failures are reported
+        per job rather than raised.
+        """
+        def run(job):
+            result = dict(entity=job['entity'], dest=job['dest'])
+            start = time.monotonic()
+            try:
+                response = self.send_request(job['path'], data=job['data'])
+                result['transfer'] = round(time.monotonic() - start, 3)
+                result.update(dump_response(response, job['dest'], compress=job.get('compress', False)))
+                result['status'] = 'Success'
+            except TipsApiError as exc:
+                result.update(status='Failure', msg=f'{exc.errorcode}: {exc.message}')
+            except Exception as exc:
+                result.update(status='Failure', msg=f'{type(exc).__name__}: {to_text(exc)}')
+            result['elapsed'] = round(time.monotonic() - start, 3)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            return list(executor.map(run, jobs))
+
+    def read(self, params, check_mode=False):
+        """Runs a tipsconfig_read task with the module params, returning the module result."""
+        return run_task(self, run_read, params, check_mode)
+
+    def namelist(self, params, check_mode=False):
+        """Runs a tipsconfig_namelist task with the module params, returning the module result."""
+        return run_task(self, run_namelist, params, check_mode)
+
+    def write_batch(self, params, check_mode=False, diff=False):
+        """Runs a tipsconfig_write task with the module params, returning the module result."""
+        return run_task(self, run_write_batch, params, check_mode, diff)
+
+    def delete_batch(self, params, check_mode=False):
+        """Runs a tipsconfig_delete task with the module params, returning the module result."""
+        return run_task(self, run_delete_batch, params, check_mode)
+
+    def transmit(self, path, data, method):
+        """Sends a request within the rate and concurrency limits, retrying retryable failures.
+
+        Modifying requests are only sent again when the server cannot have
+        applied them. Retries stop when the command timeout runs out.
+        """
+        modifying = split_path(path)[0] in MODIFYING_METHODS
+        deadline = time.monotonic() + self.connection.get_option('persistent_command_timeout')
+        attempt = 0
+        while True:
+            self._bucket.acquire(self.get_option('rate_limit'), self.get_option('rate_burst'))
+            if not self._limiter.acquire(self.get_option('max_concurrency'), deadline - time.monotonic()):
+                raise AnsibleConnectionFailure(f'No request slot freed up for {path} before the command timeout')
+            timeout = max(0.001, min(self.request_timeout(), deadline - time.monotonic()))
+            retry_after = None
+            try:
+                response = self.transmit_once(path, data, method, timeout)
+            except HTTPError as exc:
+                error = exc
+                overloaded = exc.code in self.get_option('retry_statuses')
+                retryable = overloaded and (not modifying or exc.code in REPLAYABLE_STATUSES)
+                retry_after = exc.headers.get('Retry-After') if exc.headers else None
+                self._limiter.release(overloaded, self.get_option('max_concurrency'))
+                if not retryable or attempt >= self.get_option('retries'):
+                    raise
+            except (AnsibleConnectionFailure, OSError) as exc:
+                error = exc
+                self._limiter.release(True, self.get_option('max_concurrency'))
+                if attempt >= self.get_option('retries') or (modifying and not unsent(exc)):
+                    raise
+            else:
+                self._limiter.release(False, self.get_option('max_concurrency'))
+                return response
+            delay = self.backoff(attempt, retry_after)
+            if time.monotonic() + delay >= deadline:
+                raise error
+            time.sleep(delay)
+            attempt += 1
+            self._local.retries = attempt
+
+    def backoff(self, attempt, retry_after=None):
+        """Returns the delay before a retry: exponential backoff with full jitter."""
+        ceiling = min(self.get_option('retry_max_backoff'), self.get_option('retry_backoff') * 2 ** attempt)
+        delay = random.uniform(0, ceiling)
         try:
+            delay = max(delay, min(float(retry_after), self.get_option('retry_max_backoff')))
+        except (TypeError, ValueError):
+            pass
+        return delay
+
+    def transmit_once(self, path, data, method, timeout):
+        headers = self.get_headers()
+        data = self.encode_request(data, headers)
+        try:
+            if self.get_option('keepalive') and not self.proxied():
+                return self.send_keepalive(path, data, method, headers, timeout)
             response, response_data = self.connection.send(
-                path, data, method=method, headers=HEADERS
+                path, data, method=method, headers=headers, timeout=timeout
             )
         except HTTPException as exc:
             raise AnsibleConnectionFailure(f'HTTP exception: {to_native(exc)}')
         return self.handle_response(response, response_data)
 
     def handle_response(self, response, response_data):
-        response_body = response_data.read().decode(CHARSET)
-        return response_body
+        # Bytes are handed back as-is: the connection layer decodes them once
+        # when serializing the reply, and the XML parser accepts either type.
+        encoding = response.headers.get('Content-Encoding', '').strip().lower()
+        return decode_content(response_data.read(), encoding)
 
     def handle_httperror(self, exc):
         # Always raise http errors
         return False
+
+    def close_connections(self):
+        with self._idle_lock:
+            idle, self._idle = self._idle, list()
+        for conn in idle:
+            conn.close()
+
+    def logout(self):
+        self.close_connections()
+
+    def connection_option(self, option):
+        """Returns an option of the connection, None when the installed connection plugin lacks it."""
+        try:
+            return self.connection.get_option(option)
+        except KeyError:
+            return None
+
+    def proxied(self):
+        """Tells whether requests to the host go through a proxy, which only the stock transport supports."""
+        if self.connection_option('use_proxy') is False:
+            return False
+        scheme = 'https' if self.connection.get_option('use_ssl') else 'http'
+        return scheme in getproxies() and not proxy_bypass(self.connection.get_option('host'))
+
+    def request_timeout(self):
+        command_timeout = self.connection.get_option('persistent_command_timeout')
+        timeout = self.get_option('request_timeout')
+        if timeout <= 0:
+            return command_timeout
+        return min(timeout, command_timeout)
+
+    def open_connection(self, timeout):
+        host = self.connection.get_option('host')
+        port = self.connection.get_option('port')
+        if not self.connection.get_option('use_ssl'):
+            return HTTPConnection(host, port or 80, timeout=timeout)
+        context = ssl.create_default_context(cafile=self.connection_option('ca_path'))
+        if self.connection_option('client_cert'):
+            context.load_cert_chain(self.connection_option('client_cert'), self.connection_option('client_key'))
+        ciphers = self.connection_option('ciphers')
+        if ciphers:
+            context.set_ciphers(ciphers if isinstance(ciphers, str) else ':'.join(ciphers))
+        if not self.connection.get_option('validate_certs'):
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        return HTTPSConnection(host, port or 443, timeout=timeout, context=context)
+
+    def acquire_connection(self, timeout):
+        while True:
+            with self._idle_lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self.open_connection(timeout), False
+            if is_alive(conn):
+                conn.timeout = timeout
+                conn.sock.settimeout(timeout)
+                return conn, True
+            conn.close()
+
+    def connect(self, conn, path):
+        try:
+            conn.connect()
+        except OSError as exc:
+            conn.close()
+            raise ConnectFailure(f'Could not connect to {self.connection._url + path}: {to_native(exc)}') from exc
+
+    def release_connection(self, conn):
+        with self._idle_lock:
+            self._idle.append(conn)
+
+    def get_auth_headers(self):
+        if self.connection._auth:
+            return dict(self.connection._auth)
+        credentials = '{0}:{1}'.format(
+            self.connection.get_option('remote_user'),
+            self.connection.get_option('password')
+        )
+        return {'Authorization': 'Basic ' + to_text(base64.b64encode(to_bytes(credentials)))}
+
+    def send_keepalive(self, path, data, method, headers, timeout):
+        # Log in or take the session key, as the stock transport does before its first request.
+        with self._connect_lock:
+            if not self.connection.connected:
+                self.connection._connect()
+        headers = dict(headers, **self.get_auth_headers())
+        if self.connection_option('http_agent'):
+            headers['User-Agent'] = self.connection_option('http_agent')
+        modifying = split_path(path)[0] in MODIFYING_METHODS
+        conn, reused = self.acquire_connection(timeout)
+        while True:
+            if not reused:
+                self.connect(conn, path)
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                sent = time.perf_counter()
+                response = conn.getresponse()
+                self._local.server = time.perf_counter() - sent
+                break
+            except (OSError, HTTPException) as exc:
+                conn.close()
+                # The server may have dropped the idle connection as it was reused,
+                # in which case idempotent requests are sent once more on a fresh one.
+                if not reused or modifying or timed_out(exc):
+                    raise AnsibleConnectionFailure(
+                        f'Could not connect to {self.connection._url + path}: {to_native(exc)}'
+                    ) from exc
+                conn, reused = self.open_connection(timeout), False
+
+        encoding = response.getheader('Content-Encoding', '').strip().lower()
+        d = decompressor(encoding)
+        buf = BytesIO()
+        try:
+            chunk = response.read(CHUNK_SIZE)
+            while chunk:
+                buf.write(d.decompress(chunk) if d else chunk)
+                chunk = response.read(CHUNK_SIZE)
+            if d:
+                buf.write(d.flush())
+        except (OSError, HTTPException):
+            # A connection left half-read cannot be reused.
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self.release_connection(conn)
+
+        self.connection._auth = self.update_auth(response, buf) or self.connection._auth
+        if response.status >= 400:
+            buf.seek(0)
+            exc = HTTPError(self.connection._url + path, response.status, response.reason, response.msg, buf)
+            if self.handle_httperror(exc) is not True:
+                raise exc
+            return self.send_keepalive(path, data, method, headers, timeout)
+        return buf.getvalue()
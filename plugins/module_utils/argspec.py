@@ -14,6 +14,11 @@ version_added: "2.9"
 '''
 
 from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.choices import EntityChoices, MatchChoices
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.result import RESPONSE_MAX_BYTES, ResponseModes
+
+BATCH_RECORDS = 1000
+BATCH_BYTES = 4 * 1024 * 1024
+DELETE_CHUNK = 500
 
 
 class TipsArgSpec:
@@ -23,6 +28,44 @@ class TipsArgSpec:
         choices=EntityChoices.CHOICES
     )
 
+    dest = dict(
+        required=False,
+        type='path',
+        default=None
+    )
+    compress = dict(
+        required=False,
+        type='bool',
+        default=False
+    )
+    parse = dict(
+        required=False,
+        type='bool',
+        default=False
+    )
+    timings = dict(
+        required=False,
+        type='bool',
+        default=False
+    )
+
+    return_request = dict(
+        required=False,
+        type='bool',
+        default=True
+    )
+    return_response = dict(
+        required=False,
+        type='str',
+        choices=ResponseModes.CHOICES,
+        default=ResponseModes.FULL
+    )
+    response_max_bytes = dict(
+        required=False,
+        type='int',
+        default=RESPONSE_MAX_BYTES
+    )
+
     _fieldname = dict(
         required=True,
         type='str'
@@ -0,0 +1,109 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+author: Sacha Boudjema (@sachaboudjema)
+short_description: Canonical forms and fingerprints of configuration elements, used to compare them.
+version_added: "2.9"
+'''
+
+import hashlib
+
+from xml.sax.saxutils import escape, quoteattr
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.choices import EntityChoices
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import qualify
+
+DIGEST_ALGORITHM = 'sha256'
+# Entity types by element tag, some entity names, e.g. "RADIUS Dictionary", not being valid tag names.
+ENTITY_TAGS = {qualify(entity.replace(' ', '')): entity for entity in EntityChoices.CHOICES}
+# Server-side identifiers, only present in some responses.
+IGNORED_ELEMENTS = frozenset((qualify('element-id'),))
+# Attribute telling apart child elements of the same type, e.g. <Rule name="...">.
+KEY_ATTRIBUTE = 'name'
+
+_XMLNS_PREFIX = qualify('')
+
+
+def normalize_name(name):
+    """Drops the API namespace from a tag or attribute name, other namespaces are kept as is."""
+    if name.startswith(_XMLNS_PREFIX):
+        return name[len(_XMLNS_PREFIX):]
+    return name
+
+
+def _child_keys(children, keyed):
+    """Yields the key of each child: its tag and name for keyed tags, else its tag and rank among same-tag siblings."""
+    ranks = dict()
+    for child in children:
+        if child.tag in keyed:
+            yield (child.tag, child.get(KEY_ATTRIBUTE))
+        else:
+            ranks[child.tag] = ranks.get(child.tag, -1) + 1
+            yield (child.tag, ranks[child.tag])
+
+
+def canonicalize(el, ignored_attributes=frozenset(), template=None):
+    """Returns a canonical string form of an element.
+
+    Names are stripped of the API namespace, attributes are sorted, surrounding
+    whitespace is stripped from text and ignored attributes and elements are
+    dropped. When a template element is given, only the attributes and child
+    elements it defines are kept, recursively, so that fields added by the
+    server do not count as differences. Children are matched to the ones of
+    the template by tag and name, or by tag and rank when the template ones
+    are unnamed, and children without a match are kept whole.
+    """
+    tag = normalize_name(el.tag)
+    attrs = sorted(
+        (normalize_name(k), v) for k, v in el.attrib.items()
+        if k not in ignored_attributes and (template is None or k in template.attrib)
+    )
+    parts = [f'<{tag}']
+    parts.extend(f' {k}={quoteattr(v)}' for k, v in attrs)
+    parts.append('>')
+    parts.append(escape((el.text or '').strip()))
+    children = [c for c in el if c.tag not in IGNORED_ELEMENTS]
+    if template is None:
+        for child in children:
+            parts.append(canonicalize(child, ignored_attributes))
+    else:
+        tchildren = [c for c in template if c.tag not in IGNORED_ELEMENTS]
+        tags = set(c.tag for c in tchildren)
+        keyed = tags - set(c.tag for c in tchildren if c.get(KEY_ATTRIBUTE) is None)
+        tkeys = dict(zip(_child_keys(tchildren, keyed), tchildren))
+        children = [c for c in children if c.tag in tags]
+        for key, child in zip(_child_keys(children, keyed), children):
+            parts.append(canonicalize(child, ignored_attributes, tkeys.get(key, child)))
+    parts.append(f'</{tag}>')
+    return ''.join(parts)
+
+
+class Fingerprinter:
+    """Computes digests of the canonical form of configuration elements.
+
+    Ignored attributes are configured per entity type, as named by
+    EntityChoices, the entity of an element being found from its tag.
+    """
+
+    def __init__(self, ignored_attributes=None, algorithm=DIGEST_ALGORITHM):
+        self.ignored_attributes = {
+            entity: frozenset(attrs) for entity, attrs in (ignored_attributes or dict()).items()
+        }
+        self.algorithm = algorithm
+
+    def ignored(self, el):
+        entity = ENTITY_TAGS.get(el.tag, normalize_name(el.tag))
+        return self.ignored_attributes.get(entity, frozenset())
+
+    def canonicalize(self, el, template=None):
+        return canonicalize(el, self.ignored(el), template)
+
+    def digest(self, el, template=None):
+        data = self.canonicalize(el, template).encode()
+        return hashlib.new(self.algorithm, data).hexdigest()
@@ -0,0 +1,210 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+author: Sacha Boudjema (@sachaboudjema)
+short_description: Name to element-id index of configuration elements, fed from API traffic.
+version_added: "2.9"
+'''
+
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.extractors import (
+    ELEMENT_ID_TAG, NAME_TAG, localname, name_attribute
+)
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import (
+    TipsApiResponseStream, iter_payload_elements, qualify
+)
+
+ELEMENT_ID_RE = re.compile(rb'<Element-Id>([^<]*)</Element-Id>')
+ENTITY_ATTR_RE = re.compile(rb'entity="([^"]*)"')
+NAMELIST_TAG = qualify('EntityNameList')
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS elements ('
+    'entity TEXT NOT NULL, name TEXT NOT NULL, element_id TEXT, updated REAL NOT NULL, '
+    'PRIMARY KEY (entity, name))',
+    'CREATE TABLE IF NOT EXISTS entities (entity TEXT PRIMARY KEY, updated REAL NOT NULL)',
+)
+
+
+class ElementIndex:
+    """Names and element-ids of the configuration elements seen in API responses.
+
+    Entries are kept per entity type in memory, and mirrored to a SQLite
+    database when a path is given so they survive the persistent connection.
+    An entity type is complete when its full name list was seen, in which
+    case absent names are known not to exist. Entries and completeness expire
+    after ttl seconds.
+    """
+
+    def __init__(self, path=None, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._names = dict()
+        self._ids = dict()
+        self._complete = dict()
+        self._db = None
+        if path:
+            self._open(path)
+
+    def _open(self, path):
+        path = os.path.expanduser(path)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        for statement in SCHEMA:
+            self._db.execute(statement)
+        for entity, name, element_id, updated in self._db.execute('SELECT entity, name, element_id, updated FROM elements'):
+            self._put(entity, name, element_id, updated)
+        for entity, updated in self._db.execute('SELECT entity, updated FROM entities'):
+            self._complete[entity] = updated
+
+    def _fresh(self, updated):
+        return updated is not None and (self.ttl <= 0 or time.time() - updated < self.ttl)
+
+    def _put(self, entity, name, element_id, updated):
+        names = self._names.setdefault(entity, dict())
+        previous = names.get(name)
+        if element_id is None and previous is not None:
+            element_id = previous[0]
+        if previous is not None and previous[0] is not None and previous[0] != element_id:
+            self._ids.pop((entity, previous[0]), None)
+        names[name] = (element_id, updated)
+        if element_id is not None:
+            self._ids[(entity, element_id)] = name
+        return element_id
+
+    def _remove(self, entity, name):
+        element_id = self._names.get(entity, dict()).pop(name, (None, None))[0]
+        if element_id is not None:
+            self._ids.pop((entity, element_id), None)
+
+    def _persist(self, statements):
+        # Called with the lock held, the database connection is shared by threads.
+        if self._db is None:
+            return
+        with self._db:
+            self._db.execute('BEGIN')
+            for statement, params in statements:
+                self._db.executemany(statement, params)
+
+    def lookup(self, entity, names):
+        """Returns, per name, whether it exists (None when unknown) and its element-id if known."""
+        result = dict()
+        with self._lock:
+            entries = self._names.get(entity, dict())
+            complete = self._fresh(self._complete.get(entity))
+            for name in names:
+                element_id, updated = entries.get(name, (None, None))
+                if self._fresh(updated):
+                    result[name] = dict(exists=True, element_id=element_id)
+                else:
+                    result[name] = dict(exists=False if complete else None, element_id=None)
+        return result
+
+    def add(self, entity, entries, complete=False):
+        """Records (name, element_id) pairs of an entity type, element_id being None when unknown.
+
+        With complete, the entries are the full list of the entity type and
+        replace the previous ones.
+        """
+        now = time.time()
+        rows = list()
+        with self._lock:
+            if complete:
+                seen = set(name for name, _ in entries)
+                for name in [n for n in self._names.get(entity, dict()) if n not in seen]:
+                    self._remove(entity, name)
+                self._complete[entity] = now
+            for name, element_id in entries:
+                rows.append((entity, name, self._put(entity, name, element_id, now), now))
+            statements = list()
+            if complete:
+                statements.append(('DELETE FROM elements WHERE entity = ?', [(entity,)]))
+                statements.append(('INSERT OR REPLACE INTO entities VALUES (?, ?)', [(entity, now)]))
+            statements.append(('INSERT OR REPLACE INTO elements VALUES (?, ?, ?, ?)', rows))
+            self._persist(statements)
+
+    def remove_ids(self, entity, element_ids):
+        with self._lock:
+            names = [self._ids.get((entity, i)) for i in element_ids]
+            names = [n for n in names if n is not None]
+            for name in names:
+                self._remove(entity, name)
+            self._persist([('DELETE FROM elements WHERE entity = ? AND name = ?', [(entity, n) for n in names])])
+
+    def invalidate(self, entity):
+        """Forgets that the name list of an entity type is complete, e.g. after a failed change."""
+        with self._lock:
+            self._complete.pop(entity, None)
+            self._persist([('DELETE FROM entities WHERE entity = ?', [(entity,)])])
+
+    def record(self, method, entity, request, response, success):
+        """Updates the index from a request sent and its response."""
+        # Entity types whose full list is requested, so that empty lists are recorded too.
+        requested = set(e.decode('utf-8') for e in ENTITY_ATTR_RE.findall(request)) or {entity}
+        if method == 'namelist':
+            if success:
+                self._record_namelist(requested, response)
+        elif method in ('deleteConfirm', 'read'):
+            if success:
+                complete = b'<Criteria' not in request
+                self._record_elements(requested if complete else set(), response, complete)
+        elif method == 'write':
+            if success:
+                self._record_write(request)
+            else:
+                self.invalidate(entity)
+        elif method == 'delete':
+            self.remove_ids(entity, [i.decode('utf-8') for i in ELEMENT_ID_RE.findall(request)])
+            if not success:
+                self.invalidate(entity)
+
+    def _record_namelist(self, requested, response):
+        entries = {e: list() for e in requested}
+        tips_stream = TipsApiResponseStream(response)
+        for el in tips_stream:
+            if el.tag == NAME_TAG and el.text and tips_stream.container.tag == NAMELIST_TAG:
+                entries.setdefault(tips_stream.container.get('entity'), list()).append((el.text, None))
+        for entity, names in entries.items():
+            self.add(entity, names, complete=True)
+
+    def _record_elements(self, requested, response, complete):
+        entries = {e: list() for e in requested}
+        tips_stream = TipsApiResponseStream(response)
+        for el in tips_stream:
+            entity = localname(el.tag)
+            name = el.get(name_attribute(entity))
+            if name is not None:
+                entries.setdefault(entity, list()).append((name, el.findtext(ELEMENT_ID_TAG)))
+        for entity, elements in entries.items():
+            self.add(entity, elements, complete=complete)
+
+    def _record_write(self, request):
+        entries = dict()
+        for _, el in iter_payload_elements([request]):
+            entity = localname(el.tag)
+            name = el.get(name_attribute(entity))
+            if name is not None:
+                entries.setdefault(entity, list()).append((name, None))
+        for entity, elements in entries.items():
+            self.add(entity, elements)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                entities=len(self._names),
+                elements=sum(len(n) for n in self._names.values()),
+                element_ids=len(self._ids),
+                complete=sorted(e for e, updated in self._complete.items() if self._fresh(updated)),
+                path=self.path
+            )
@@ -0,0 +1,82 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+author: Sacha Boudjema (@sachaboudjema)
+short_description: Per-entity extractors turning response elements into plain data.
+version_added: "2.9"
+'''
+
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.choices import EntityChoices
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import qualify
+
+ELEMENT_ID_TAG = qualify('element-id')
+NAME_TAG = qualify('Name')
+
+
+def localname(tag):
+    return tag.rpartition('}')[2]
+
+
+class EntityExtractor:
+    def __init__(self, name_attr='name', tags=None):
+        self.name_attr = name_attr
+        self.tags = qualify(tags) if tags else None
+
+    def __call__(self, el, container=None):
+        data = dict(
+            entity=localname(el.tag),
+            name=el.get(self.name_attr),
+            attributes=dict(el.attrib)
+        )
+        element_id = el.findtext(ELEMENT_ID_TAG)
+        if element_id is not None:
+            data['element_id'] = element_id
+        if self.tags is not None:
+            data['tags'] = {t.get('tagName'): t.get('tagValue') for t in el.iterfind(self.tags)}
+        return data
+
+
+class NameExtractor:
+    def __call__(self, el, container=None):
+        return dict(
+            entity=container.get('entity') if container is not None else None,
+            name=el.text
+        )
+
+
+DEFAULT_EXTRACTOR = EntityExtractor()
+
+ENTITY_EXTRACTORS = {
+    EntityChoices.ENDPOINT: EntityExtractor(name_attr='macAddress', tags='EndpointTags'),
+    EntityChoices.GUEST_USER: EntityExtractor(tags='GuestUserTags'),
+    EntityChoices.LOCAL_USER: EntityExtractor(tags='LocalUserTags'),
+}
+
+# Child elements holding the tags of the entity types that have some.
+TAG_TAGS = frozenset(e.tags for e in ENTITY_EXTRACTORS.values() if e.tags is not None)
+
+# Extractors are looked up by qualified tag, resolved once at import time.
+EXTRACTORS = {
+    qualify(entity): ENTITY_EXTRACTORS.get(entity, DEFAULT_EXTRACTOR)
+    for entity in EntityChoices.CHOICES
+}
+EXTRACTORS[NAME_TAG] = NameExtractor()
+
+
+def name_attribute(entity):
+    return ENTITY_EXTRACTORS.get(entity, DEFAULT_EXTRACTOR).name_attr
+
+
+def extract(el, container=None):
+    return EXTRACTORS.get(el.tag, DEFAULT_EXTRACTOR)(el, container)
+
+
+def extract_stream(tips_stream):
+    return [extract(el, tips_stream.container) for el in tips_stream]
@@ -0,0 +1,482 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+author: Sacha Boudjema (@sachaboudjema)
+short_description: Module logic run inside the persistent connection process.
+version_added: "2.9"
+'''
+
+import os
+import re
+
+from io import BytesIO
+from xml.etree.ElementTree import ParseError
+
+from ansible.errors import AnsibleError
+from ansible.module_utils._text import to_native
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.canonical import Fingerprinter
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.extractors import (
+    ELEMENT_ID_TAG, extract, extract_stream, name_attribute
+)
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.output import dump_response
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.query import Projection, Query
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.result import request_result, response_result
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.snapshot import SnapshotWriter
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import (
+    ROOT_PATH, TipsApiRequest, TipsApiResponse, TipsApiError, cache_result, iter_payload_elements, reset_timings,
+    send_requests, timing_result
+)
+
+
+class TaskExit(Exception):
+    def __init__(self, result):
+        self.result = result
+
+
+class Task:
+    """Stands in for AnsibleModule when module logic runs in the persistent connection.
+
+    Requests are handed to the httpapi plugin directly, and exit_json() and
+    fail_json() end the task with the result to send back to the module,
+    which has already validated the params.
+    """
+
+    def __init__(self, connection, params, check_mode=False, diff=False):
+        self.tips_connection = connection
+        self.params = params
+        self.check_mode = check_mode
+        self._diff = diff
+
+    def exit_json(self, **result):
+        raise TaskExit(result)
+
+    def fail_json(self, **result):
+        result['failed'] = True
+        raise TaskExit(result)
+
+
+def run_task(connection, operation, params, check_mode=False, diff=False):
+    """Runs an operation with the params of a module and returns the module result."""
+    reset_timings()
+    task = Task(connection, params, check_mode, diff)
+    try:
+        operation(task)
+    except TaskExit as exc:
+        return exc.result
+    except AnsibleError as exc:
+        return dict(failed=True, changed=False, msg=to_native(exc), **timing_result(task))
+    except (OSError, ParseError) as exc:
+        # Unreadable or unwritable files and malformed documents fail the
+        # task, rather than the persistent connection with a traceback.
+        return dict(failed=True, changed=False, msg=f'{type(exc).__name__}: {to_native(exc)}', **timing_result(task))
+    raise AnsibleError(f'{operation.__name__} returned without a result')
+
+
+def run_read(task):
+    dest = task.params.get('dest')
+    if dest and not os.path.isdir(os.path.dirname(os.path.abspath(os.path.expanduser(dest)))):
+        task.fail_json(changed=False, msg=f'Directory of dest {dest} does not exist')
+
+    query = None
+    filters = task.params.get('filters')
+    if task.params.get('query') is not None:
+        query = Query(task.params.get('query'))
+        filters = query.filters()
+
+    tips_request = TipsApiRequest.read(
+        task.params.get('entity'),
+        filters
+    )
+
+    if task.check_mode:
+        task.exit_json(
+            changed=False,
+            tips_path=tips_request.path,
+            **request_result(task, tips_request)
+        )
+
+    if task.params.get('dest'):
+        tips_stream = tips_request.get_response(task, stream=True)
+        try:
+            result = dump_response(
+                tips_stream.body,
+                dest,
+                compress=task.params.get('compress')
+            )
+        except TipsApiError as exc:
+            tips_request.fail_response(task, exc, tips_stream.body)
+        except OSError as exc:
+            task.fail_json(changed=False, msg=f'Cannot write dest {dest}: {exc.strerror or exc}', **timing_result(task))
+        task.exit_json(
+            **request_result(task, tips_request),
+            **result,
+            **cache_result(task),
+            **timing_result(task)
+        )
+
+    if query is not None or task.params.get('fields') is not None:
+        run_select(task, tips_request, query)
+
+    if task.params.get('parse'):
+        tips_stream = tips_request.get_response(task, stream=True)
+        try:
+            elements = extract_stream(tips_stream)
+        except TipsApiError as exc:
+            tips_request.fail_response(task, exc, tips_stream.body)
+        task.exit_json(
+            changed=False,
+            **request_result(task, tips_request),
+            elements=elements,
+            msg=tips_stream.message,
+            **cache_result(task),
+            **timing_result(task)
+        )
+
+    tips_response = tips_request.get_response(task)
+
+    task.exit_json(
+        changed=False,
+        **request_result(task, tips_request),
+        **response_result(task, tips_response),
+        msg=tips_response.message,
+        **cache_result(task),
+        **timing_result(task)
+    )
+
+
+def run_select(task, tips_request, query=None):
+    """Returns the elements matching the query, projected on the requested fields."""
+    children = None
+    projection = None
+    if task.params.get('fields') is not None:
+        projection = Projection(task.params.get('fields'), name_attribute(task.params.get('entity')))
+        children = projection.children
+        if query is not None:
+            children = children | Projection.tags(query.fields)
+    tips_stream = tips_request.get_response(task, stream=True, children=children)
+    selected = query.select(tips_stream) if query is not None else ((tips_stream.container, el) for el in tips_stream)
+    if projection is not None:
+        selected = ((container, projection(el)) for container, el in selected)
+    result = dict()
+    try:
+        if task.params.get('parse'):
+            result['elements'] = [extract(el, container) for container, el in selected]
+            matched = len(result['elements'])
+        else:
+            buf = BytesIO()
+            writer = SnapshotWriter(buf)
+            for container, el in selected:
+                writer.write(container, el)
+            writer.close()
+            result.update(response_result(task, buf.getvalue()))
+            matched = writer.count
+    except TipsApiError as exc:
+        tips_request.fail_response(task, exc, tips_stream.body)
+    task.exit_json(
+        changed=False,
+        **request_result(task, tips_request),
+        matched=matched,
+        scanned=tips_stream.count,
+        msg=tips_stream.message,
+        **result,
+        **cache_result(task),
+        **timing_result(task)
+    )
+
+
+def run_namelist(task):
+    tips_request = TipsApiRequest.namelist(
+        task.params.get('entity'),
+        task.params.get('entity_type_list')
+    )
+
+    if task.check_mode:
+        task.exit_json(
+            changed=False,
+            tips_path=tips_request.path,
+            **request_result(task, tips_request)
+        )
+
+    if task.params.get('parse'):
+        tips_stream = tips_request.get_response(task, stream=True)
+        try:
+            elements = extract_stream(tips_stream)
+        except TipsApiError as exc:
+            tips_request.fail_response(task, exc, tips_stream.body)
+        task.exit_json(
+            changed=False,
+            **request_result(task, tips_request),
+            elements=elements,
+            msg=tips_stream.message,
+            **cache_result(task),
+            **timing_result(task)
+        )
+
+    tips_response = tips_request.get_response(task)
+
+    task.exit_json(
+        changed=False,
+        **request_result(task, tips_request),
+        **response_result(task, tips_response),
+        msg=tips_response.message,
+        **cache_result(task),
+        **timing_result(task)
+    )
+
+
+def run_write_batch(task):
+    if task.params.get('payloads') is not None or task.params.get('idempotent'):
+        run_batches(task)
+
+    tips_request = TipsApiRequest.write(
+        task.params.get('entity'),
+        task.params.get('xml')
+    )
+
+    if task.check_mode:
+        task.exit_json(
+            changed=False,
+            tips_path=tips_request.path,
+            **request_result(task, tips_request)
+        )
+
+    tips_response = tips_request.get_response(task)
+
+    task.exit_json(
+        changed=True,
+        **request_result(task, tips_request),
+        **response_result(task, tips_response),
+        msg=tips_response.message,
+        **timing_result(task)
+    )
+
+
+def select_changes(task, elements):
+    """Filters out elements identical to their current version on the server."""
+    entity = task.params.get('entity')
+    field = name_attribute(entity)
+    fingerprinter = Fingerprinter({entity: task.params.get('ignore_attributes')})
+    names = list(dict.fromkeys(el.get(field) for _, el in elements if el.get(field) is not None))
+
+    current = dict()
+    if names:
+        tips_request = TipsApiRequest.read_names(entity, names, field)
+        tips_stream = tips_request.get_response(task, stream=True)
+        try:
+            wanted = set(names)
+            for el in tips_stream:
+                if el.get(field) in wanted:
+                    current[el.get(field)] = el
+        except TipsApiError as exc:
+            tips_request.fail_response(task, exc, tips_stream.body)
+
+    selected, changes, diff = list(), list(), list()
+    for container, el in elements:
+        name = el.get(field)
+        before = current.get(name)
+        if before is None:
+            changes.append(dict(name=name, action='create'))
+            diff.append(dict(
+                before_header=name, after_header=name,
+                before='', after=fingerprinter.canonicalize(el) + '\n'
+            ))
+        else:
+            if fingerprinter.digest(before, template=el) == fingerprinter.digest(el):
+                continue
+            changes.append(dict(name=name, action='update'))
+            diff.append(dict(
+                before_header=name, after_header=name,
+                before=fingerprinter.canonicalize(before, template=el) + '\n',
+                after=fingerprinter.canonicalize(el) + '\n'
+            ))
+        selected.append((container, el))
+    return selected, changes, diff
+
+
+def run_batches(task):
+    payloads = task.params.get('payloads')
+    if payloads is None:
+        payloads = [task.params.get('xml')]
+    elements = list(iter_payload_elements(payloads))
+
+    result = dict()
+    if task.params.get('idempotent'):
+        elements, result['changes'], diff = select_changes(task, elements)
+        if task._diff:
+            result['diff'] = diff
+
+    batches = list()
+    for tips_request in TipsApiRequest.write_elements(
+        task.params.get('entity'),
+        elements,
+        max_records=task.params.get('batch_records'),
+        max_bytes=task.params.get('batch_bytes')
+    ):
+        batch = dict(records=tips_request.records, bytes=tips_request.size)
+        batches.append(batch)
+        if task.check_mode:
+            continue
+        try:
+            tips_response = TipsApiResponse(tips_request.send(task))
+            batch.update(status=tips_response.statuscode, msg=tips_response.message)
+        except TipsApiError as exc:
+            batch.update(status='Failure', msg=f'{exc.errorcode}: {exc.message}')
+
+    if task.check_mode:
+        task.exit_json(
+            changed=bool(batches),
+            tips_path=f'{ROOT_PATH}/write/{task.params.get("entity")}',
+            batches=batches,
+            **result
+        )
+
+    failed = [b for b in batches if b['status'] == 'Failure']
+    result.update(
+        changed=len(failed) < len(batches),
+        batches=batches,
+        msg=f'{len(batches) - len(failed)} of {len(batches)} batch(es) written'
+    )
+    result.update(timing_result(task))
+    if failed:
+        task.fail_json(**result)
+    task.exit_json(**result)
+
+
+def run_delete_batch(task):
+    try:
+        missing_re = re.compile(task.params.get('missing_pattern'))
+    except (re.error, TypeError) as exc:
+        task.fail_json(changed=False, msg=f'Invalid missing_pattern: {exc}')
+
+    result = dict()
+    if task.params.get('filters') is not None:
+        identifiers = find_identifiers(task)
+        result['found'] = len(identifiers)
+        if task.check_mode:
+            result['identifiers'] = identifiers
+    else:
+        identifiers = list(dict.fromkeys(task.params.get('identifiers')))
+    tips_requests = list(TipsApiRequest.delete_chunks(
+        task.params.get('entity'),
+        identifiers,
+        task.params.get('chunk_size')
+    ))
+
+    if task.check_mode:
+        result.update(
+            changed=False,
+            tips_path=f'{ROOT_PATH}/delete/{task.params.get("entity")}',
+            chunks=[dict(index=i, records=len(r.identifiers)) for i, r in enumerate(tips_requests)]
+        )
+        if len(tips_requests) == 1:
+            result.update(request_result(task, tips_requests[0]))
+        task.exit_json(**result)
+
+    chunks, responses = delete_chunks(task, tips_requests, missing_re)
+
+    deleted = sum(c['deleted'] for c in chunks)
+    missing = [i for c in chunks for i in c['missing']]
+    failed = [c for c in chunks if c['status'] == 'Failure']
+    result.update(
+        changed=deleted > 0,
+        chunks=chunks,
+        deleted=deleted,
+        missing=missing,
+        msg=f'{deleted} of {len(identifiers)} element(s) deleted, {len(missing)} missing, '
+            f'{len(failed)} of {len(chunks)} chunk(s) failed',
+        **timing_result(task)
+    )
+    if len(tips_requests) == 1 and responses:
+        result.update(request_result(task, tips_requests[0]), **response_result(task, responses[0]))
+    if failed:
+        task.fail_json(**result)
+    task.exit_json(**result)
+
+
+def find_identifiers(task):
+    """Returns the element-ids of the elements matching the filters, streamed out of a deleteConfirm response."""
+    tips_request = TipsApiRequest.deleteconfirm(
+        task.params.get('entity'),
+        task.params.get('filters')
+    )
+    tips_stream = tips_request.get_response(task, stream=True)
+    identifiers = dict()
+    try:
+        for el in tips_stream:
+            element_id = el.findtext(ELEMENT_ID_TAG)
+            if element_id is not None:
+                identifiers[element_id] = None
+    except TipsApiError as exc:
+        tips_request.fail_response(task, exc, tips_stream.body)
+
+    max_deletions = task.params.get('max_deletions')
+    if max_deletions and len(identifiers) > max_deletions:
+        task.fail_json(
+            changed=False,
+            found=len(identifiers),
+            msg=f'{len(identifiers)} element(s) match the filters, more than max_deletions ({max_deletions}). '
+                'Nothing was deleted.',
+            **timing_result(task)
+        )
+    return list(identifiers)
+
+
+def delete_chunks(task, tips_requests, missing_re):
+    """Sends the delete requests, splitting chunks rejected for missing identifiers to single them out.
+
+    missing_re matches the errors of chunks holding missing identifiers.
+    Returns the outcome of each chunk, and the responses of unsplit chunks.
+    """
+    ignore_missing = task.params.get('ignore_missing')
+    entity = task.params.get('entity')
+
+    chunks = [
+        dict(index=i, records=len(r.identifiers), deleted=0, missing=list(), failed=list(),
+             requests=0, status='Success', msg='')
+        for i, r in enumerate(tips_requests)
+    ]
+    messages = [list() for _ in chunks]
+    responses = list()
+    pending = list(enumerate(tips_requests))
+    while pending:
+        results = send_requests(task, [r for _, r in pending], workers=task.params.get('workers'))
+        retry = list()
+        for (index, tips_request), result in zip(pending, results):
+            chunk = chunks[index]
+            chunk['requests'] += 1
+            identifiers = tips_request.identifiers
+            if 'error' in result:
+                chunk['failed'].extend(identifiers)
+                messages[index].append(result['error'])
+                continue
+            try:
+                tips_response = TipsApiResponse(result['response'])
+            except TipsApiError as exc:
+                error = f'{exc.errorcode}: {exc.message}'
+                missing = ignore_missing and missing_re.search(error)
+                if missing and len(identifiers) > 1:
+                    half = (len(identifiers) + 1) // 2
+                    retry.extend((index, r) for r in TipsApiRequest.delete_chunks(entity, identifiers, half))
+                elif missing:
+                    chunk['missing'].extend(identifiers)
+                else:
+                    chunk['failed'].extend(identifiers)
+                    messages[index].append(error)
+                continue
+            chunk['deleted'] += len(identifiers)
+            messages[index].extend(tips_response.messages)
+            if chunk['requests'] == 1:
+                responses.append(tips_response)
+        pending = retry
+
+    for chunk, chunk_messages in zip(chunks, messages):
+        chunk['status'] = 'Failure' if chunk['failed'] else 'Success'
+        chunk['msg'] = '. '.join(dict.fromkeys(m for m in chunk_messages if m))
+    return chunks, responses
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+author: Sacha Boudjema (@sachaboudjema)
+short_description: Helpers to write API responses to files instead of module results.
+version_added: "2.9"
+'''
+
+import gzip
+import hashlib
+import os
+import tempfile
+
+from ansible.module_utils._text import to_bytes
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiResponseStream, iter_chunks
+
+DIGEST_ALGORITHM = 'sha256'
+
+
+def _umask():
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+# Mode of the files written, as open() would create them. mkstemp() creates
+# them 0600 instead. The umask is read once as it cannot be read without
+# being set, which is not thread safe.
+FILE_MODE = 0o666 & ~_umask()
+
+
+def file_digest(path, compress=False):
+    """Returns the digest of the uncompressed content of a file, None if it cannot be read."""
+    hasher = hashlib.new(DIGEST_ALGORITHM)
+    try:
+        with (gzip.open(path, 'rb') if compress else open(path, 'rb')) as f:
+            for chunk in iter_chunks(f):
+                hasher.update(chunk)
+    except (OSError, EOFError):
+        return None
+    return f'{DIGEST_ALGORITHM}:{hasher.hexdigest()}'
+
+
+def dump_response(response, dest, compress=False):
+    """Streams a raw response body to dest, parsing it on the fly.
+
+    The file is written to a temporary sibling and moved in place once the
+    response has been fully parsed, so an API error never leaves a partial
+    export behind. dest is left untouched when it already holds the same
+    content, changed telling whether it was written. TipsApiError is
+    propagated to the caller.
+    """
+    dest = os.path.abspath(os.path.expanduser(dest))
+    hasher = hashlib.new(DIGEST_ALGORITHM)
+    stats = dict(size=0)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), prefix='.tipsconfig-')
+    try:
+        with os.fdopen(fd, 'wb') as raw:
+            with (gzip.GzipFile(fileobj=raw, mode='wb') if compress else raw) as f:
+
+                def tee():
+                    for chunk in iter_chunks(response):
+                        data = to_bytes(chunk)
+                        f.write(data)
+                        hasher.update(data)
+                        stats['size'] += len(data)
+                        yield data
+
+                stream = TipsApiResponseStream(tee())
+                for _ in stream:
+                    pass
+        digest = f'{DIGEST_ALGORITHM}:{hasher.hexdigest()}'
+        changed = not os.path.exists(dest) or file_digest(dest, compress) != digest
+        if changed:
+            os.chmod(tmp, FILE_MODE)
+            os.replace(tmp, dest)
+        else:
+            os.unlink(tmp)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return dict(
+        changed=changed,
+        dest=dest,
+        size=stats['size'],
+        records=stream.count,
+        digest=digest,
+        msg=stream.message
+    )
@@ -0,0 +1,242 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+author: Sacha Boudjema (@sachaboudjema)
+short_description: Read queries split between server filters and a streaming predicate.
+version_added: "2.9"
+'''
+
+import re
+
+from ansible.errors import AnsibleError
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.choices import MatchChoices
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.extractors import ELEMENT_ID_TAG, TAG_TAGS
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import qualify
+
+ELEMENT_ID_FIELD = 'element-id'
+TAG_FIELD_PREFIX = 'tag:'
+FIELD_RE = re.compile(r'^\w+$')
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _compare(test):
+    def op(value, arg):
+        value, arg = _number(value), _number(arg)
+        return value is not None and arg is not None and test(value, arg)
+    return op
+
+
+def _between(value, arg):
+    value, low, high = _number(value), _number(arg[0]), _number(arg[1])
+    return None not in (value, low, high) and low <= value <= high
+
+
+def _members(arg):
+    if isinstance(arg, str):
+        return arg.split(',')
+    return [str(a) for a in arg]
+
+
+OPERATORS = {
+    MatchChoices.EQUALS: lambda value, arg: value == str(arg),
+    MatchChoices.NOT_EQUALS: lambda value, arg: value != str(arg),
+    MatchChoices.CONTAINS: lambda value, arg: str(arg) in value,
+    MatchChoices.ICONTAINS: lambda value, arg: str(arg).lower() in value.lower(),
+    MatchChoices.BELONGS_TO: lambda value, arg: value in _members(arg),
+    'in': lambda value, arg: value in _members(arg),
+    'notin': lambda value, arg: value not in _members(arg),
+    'regex': lambda value, arg: arg.search(value) is not None,
+    'iregex': lambda value, arg: arg.search(value) is not None,
+    'gt': _compare(lambda value, arg: value > arg),
+    'ge': _compare(lambda value, arg: value >= arg),
+    'lt': _compare(lambda value, arg: value < arg),
+    'le': _compare(lambda value, arg: value <= arg),
+    'between': _between,
+}
+# Operators the server applies itself, others are evaluated on the parsed elements.
+PUSHDOWN_OPERATORS = frozenset(MatchChoices.CHOICES) | {'in'}
+
+
+def field_value(el, field):
+    """Returns the value of an attribute, of the element-id or of a tag of an element, None if missing."""
+    if field == ELEMENT_ID_FIELD:
+        return el.findtext(ELEMENT_ID_TAG)
+    if field.startswith(TAG_FIELD_PREFIX):
+        name = field[len(TAG_FIELD_PREFIX):]
+        for tag in el:
+            if tag.tag in TAG_TAGS and tag.get('tagName') == name:
+                return tag.get('tagValue')
+        return None
+    return el.get(field)
+
+
+class Condition:
+    def __init__(self, field, op, value):
+        if not isinstance(field, str):
+            raise AnsibleError(f'Query condition field must be a string, got: {field!r}')
+        if op not in OPERATORS and op != 'exists':
+            raise AnsibleError(f'Unsupported query operator "{op}", expected one of: {", ".join(sorted(OPERATORS))}, exists')
+        if op == 'between' and (not isinstance(value, (list, tuple)) or len(value) != 2):
+            raise AnsibleError(f'Operator "between" of field "{field}" expects a list of two bounds')
+        if op in (MatchChoices.BELONGS_TO, 'in', 'notin') and not isinstance(value, (str, list, tuple)):
+            raise AnsibleError(f'Operator "{op}" of field "{field}" expects a list or a comma separated string')
+        if op in ('regex', 'iregex'):
+            if not isinstance(value, str):
+                raise AnsibleError(f'Operator "{op}" of field "{field}" expects a regular expression string, got: {value!r}')
+            try:
+                value = re.compile(value, re.IGNORECASE if op == 'iregex' else 0)
+            except re.error as exc:
+                raise AnsibleError(f'Invalid regular expression for field "{field}": {exc}')
+        self.field = field
+        self.op = op
+        self.value = value
+
+    def __call__(self, el):
+        value = field_value(el, self.field)
+        if self.op == 'exists':
+            return (value is not None) == bool(self.value)
+        return value is not None and OPERATORS[self.op](value, self.value)
+
+    def criteria(self):
+        """Returns the server side criteria expression, or None if it cannot be pushed down."""
+        # Only what parse_filter_criteria() reads back unchanged can be sent.
+        if self.op not in PUSHDOWN_OPERATORS or not FIELD_RE.match(self.field):
+            return None
+        if self.op in (MatchChoices.BELONGS_TO, 'in'):
+            members = _members(self.value)
+            if any(',' in m for m in members):
+                return None
+            return f'{self.field} {MatchChoices.BELONGS_TO} {",".join(members)}'
+        if str(self.value) == '' or '\n' in str(self.value):
+            return None
+        return f'{self.field} {self.op} {self.value}'
+
+
+class Any:
+    def __init__(self, conditions):
+        self.conditions = conditions
+
+    def __call__(self, el):
+        return any(c(el) for c in self.conditions)
+
+    def criteria(self):
+        return None
+
+
+class All(Any):
+    def __call__(self, el):
+        return all(c(el) for c in self.conditions)
+
+
+class Not(Any):
+    def __call__(self, el):
+        return not self.conditions[0](el)
+
+
+def condition_fields(spec):
+    """Yields the fields a condition spec reads."""
+    for key in ('any', 'all'):
+        for c in spec.get(key, list()):
+            yield from condition_fields(c)
+    if 'not' in spec:
+        yield from condition_fields(spec['not'])
+    if 'field' in spec:
+        yield spec['field']
+
+
+def compile_condition(spec):
+    if not isinstance(spec, dict):
+        raise AnsibleError(f'Query conditions must be dicts, got: {spec!r}')
+    if 'any' in spec:
+        return Any([compile_condition(c) for c in spec['any']])
+    if 'all' in spec:
+        return All([compile_condition(c) for c in spec['all']])
+    if 'not' in spec:
+        return Not([compile_condition(spec['not'])])
+    if 'field' not in spec:
+        raise AnsibleError(f'Query condition without field: {spec!r}')
+    return Condition(spec['field'], spec.get('op', MatchChoices.EQUALS), spec.get('value', True))
+
+
+class Query:
+    """Conditions combined by an AND operator.
+
+    Top level conditions the server supports are sent as a single filter,
+    the remaining ones make up the predicate applied to the parsed elements.
+    """
+
+    def __init__(self, conditions, entity=None):
+        self.entity = entity
+        self.criteria = list()
+        self.conditions = list()
+        self.fields = set()
+        for spec in conditions:
+            condition = compile_condition(spec)
+            criteria = condition.criteria()
+            if criteria is None:
+                self.conditions.append(condition)
+                self.fields.update(condition_fields(spec))
+            else:
+                self.criteria.append(criteria)
+
+    def filters(self):
+        if not self.criteria:
+            return list()
+        f = dict(criteria=self.criteria)
+        if self.entity is not None:
+            f['entity'] = self.entity
+        return [f]
+
+    def __call__(self, el):
+        return all(c(el) for c in self.conditions)
+
+    def select(self, tips_stream):
+        """Yields (container, element) for the elements of a response stream matching the predicate."""
+        for el in tips_stream:
+            if self(el):
+                yield tips_stream.container, el
+
+
+class Projection:
+    """Keeps the given attributes and child elements of entity elements, plus their name and element-id.
+
+    children is the set of child tags to pass to TipsApiResponseStream so
+    that the other ones are pruned while parsing, which can be widened with
+    the fields a query needs before the projection is applied.
+    """
+
+    def __init__(self, fields, name_attr='name'):
+        self.attributes = set(fields) | {name_attr}
+        self.children = self.tags(fields) | {ELEMENT_ID_TAG}
+
+    @staticmethod
+    def tags(fields):
+        tags = set()
+        for field in fields:
+            if field.startswith(TAG_FIELD_PREFIX):
+                tags.update(TAG_TAGS)
+            elif field == ELEMENT_ID_FIELD:
+                tags.add(ELEMENT_ID_TAG)
+            else:
+                tags.add(qualify(field))
+        return tags
+
+    def __call__(self, el):
+        for key in [k for k in el.attrib if k not in self.attributes]:
+            del el.attrib[key]
+        for child in [c for c in el if c.tag not in self.children]:
+            el.remove(child)
+        return el
@@ -0,0 +1,73 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+author: Sacha Boudjema (@sachaboudjema)
+short_description: Policy for the request and response XML returned by modules.
+version_added: "2.9"
+'''
+
+import base64
+import gzip
+
+from ansible.module_utils._text import to_bytes, to_text
+
+
+class ResponseModes:
+    CHOICES = (
+        'full',
+        'truncate',
+        'compress',
+        'summary',
+    )
+    FULL = 'full'
+    TRUNCATE = 'truncate'
+    COMPRESS = 'compress'
+    SUMMARY = 'summary'
+
+
+RESPONSE_MAX_BYTES = 64 * 1024
+RESPONSE_ENCODING = 'gzip+base64'
+
+
+def request_result(ansible_module, tips_request):
+    """Returns the tips_request result of a module, unless the request echo is disabled."""
+    if not ansible_module.params.get('return_request', True):
+        return dict()
+    return dict(tips_request=to_text(tips_request.tostring()))
+
+
+def response_result(ansible_module, response):
+    """Returns the tips_response result of a module, shaped by the return_response option.
+
+    response is a response object or its XML content.
+    """
+    if hasattr(response, 'tostring'):
+        response = response.tostring()
+    mode = ansible_module.params.get('return_response') or ResponseModes.FULL
+    if mode == ResponseModes.FULL:
+        return dict(tips_response=to_text(response))
+    data = to_bytes(response)
+    result = dict(tips_response_size=len(data))
+    if mode == ResponseModes.TRUNCATE:
+        max_bytes = ansible_module.params.get('response_max_bytes') or RESPONSE_MAX_BYTES
+        result['tips_response_truncated'] = len(data) > max_bytes
+        # Drop a multi-byte character cut in half by the cap.
+        result['tips_response'] = data[:max_bytes].decode('utf-8', 'ignore')
+    elif mode == ResponseModes.COMPRESS:
+        result['tips_response'] = to_text(base64.b64encode(gzip.compress(data)))
+        result['tips_response_encoding'] = RESPONSE_ENCODING
+    return result
+
+
+def exit_result(ansible_module, result):
+    """Ends a module with a result computed by the persistent connection."""
+    if result.pop('failed', False):
+        ansible_module.fail_json(**result)
+    ansible_module.exit_json(**result)
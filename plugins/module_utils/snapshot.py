@@ -0,0 +1,146 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+author: Sacha Boudjema (@sachaboudjema)
+short_description: Local store of exported configuration, updated incrementally.
+version_added: "2.9"
+'''
+
+import gzip
+import json
+import os
+import tempfile
+
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape, quoteattr
+from ansible.module_utils._text import to_bytes
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.output import FILE_MODE
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import XMLNS, TipsApiResponseStream
+
+INDEX_FILE = 'index.json'
+CHANGESET_FILE = 'changeset.json'
+INDEX_VERSION = 1
+NS_PREFIX = f'{{{XMLNS}}}'
+# Whitespace characters attribute value normalization would turn into spaces.
+ATTR_ENTITIES = {'\n': '&#10;', '\r': '&#13;', '\t': '&#9;'}
+
+
+def open_snapshot(path, mode='rb', compress=None):
+    if compress is None:
+        compress = path.endswith('.gz')
+    if compress:
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def write_json(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tipsconfig-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.chmod(tmp, FILE_MODE)
+    os.replace(tmp, path)
+
+
+def load_index(dest):
+    try:
+        with open(os.path.join(dest, INDEX_FILE)) as f:
+            index = json.load(f)
+    except (IOError, ValueError):
+        return dict()
+    if index.get('version') != INDEX_VERSION:
+        return dict()
+    return index.get('entities', dict())
+
+
+def save_index(dest, entities):
+    write_json(os.path.join(dest, INDEX_FILE), dict(version=INDEX_VERSION, entities=entities))
+
+
+def read_names(path, field='name'):
+    """Returns the names of the entity elements of a snapshot file, in document order."""
+    with open_snapshot(path) as f:
+        return [el.get(field) for el in TipsApiResponseStream(f)]
+
+
+def start_tag(el):
+    name = el.tag.rpartition('}')[2]
+    attrs = ''.join(f' {k}={quoteattr(v, ATTR_ENTITIES)}' for k, v in el.attrib.items())
+    return to_bytes(f'<{name}{attrs}>')
+
+
+def end_tag(el):
+    return to_bytes(f'</{el.tag.rpartition("}")[2]}>')
+
+
+def element_tostring(el):
+    """Serializes an element like ElementTree.tostring, without declaring the default namespace of the snapshot again."""
+    if not el.tag.startswith(NS_PREFIX) or any(k.startswith('{') for k in el.attrib):
+        return ElementTree.tostring(el)
+    parts = [start_tag(el)]
+    if el.text:
+        parts.append(to_bytes(escape(el.text)))
+    parts.extend(element_tostring(child) for child in el)
+    parts.append(end_tag(el))
+    if el.tail:
+        parts.append(to_bytes(escape(el.tail)))
+    return b''.join(parts)
+
+
+class SnapshotWriter:
+    """Writes entity elements to a response-like document, grouped by container."""
+
+    def __init__(self, f):
+        self.f = f
+        self.container = None
+        self.count = 0
+        f.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>')
+        f.write(to_bytes(f'<TipsApiResponse xmlns="{XMLNS}"><StatusCode>Success</StatusCode>'))
+
+    def write(self, container, el):
+        if self.container is None or self.container.tag != container.tag:
+            self.close_container()
+            self.container = ElementTree.Element(container.tag, container.attrib)
+            self.f.write(start_tag(self.container))
+        self.f.write(element_tostring(el))
+        self.count += 1
+
+    def close_container(self):
+        if self.container is not None:
+            self.f.write(end_tag(self.container))
+            self.container = None
+
+    def close(self):
+        self.close_container()
+        self.f.write(b'</TipsApiResponse>')
+
+
+def merge_snapshot(path, removed, added, field='name'):
+    """Rewrites a snapshot file without the removed names and with the added (container, element) pairs.
+
+    Returns the number of elements in the new snapshot.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tipsconfig-')
+    os.close(fd)
+    try:
+        with open_snapshot(path) as src, open_snapshot(tmp, 'wb', compress=path.endswith('.gz')) as dst:
+            writer = SnapshotWriter(dst)
+            stream = TipsApiResponseStream(src)
+            for el in stream:
+                if el.get(field) not in removed:
+                    writer.write(stream.container, el)
+            for container, el in added:
+                writer.write(container, el)
+            writer.close()
+        os.chmod(tmp, FILE_MODE)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return writer.count
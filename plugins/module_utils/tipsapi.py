@@ -14,53 +14,250 @@ version_added: "2.9"
 '''
 
 import re
+import time
 
+from xml.parsers import expat
 from xml.etree import ElementTree
-from xml.etree.ElementTree import Element, SubElement, QName
+from xml.etree.ElementTree import Element, SubElement
 from ansible.errors import AnsibleError
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.argspec import BATCH_BYTES, BATCH_RECORDS, DELETE_CHUNK
 from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.choices import EntityChoices, EntityStatusChoices
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.result import request_result, response_result
 
 VERSION = '6.7'
 ROOT_PATH = '/tipsapi/config'
 XMLNS = 'http://www.avendasys.com/tipsapiDefs/1.0'
+CHUNK_SIZE = 64 * 1024
+CRITERIA_RE = re.compile(r'^(?P<field>\w+) (?P<operator>\w+) (?P<value>.+)$')
+# Whitespace before tags, including trailing whitespace of text values.
+WHITESPACE_RE = re.compile(r'\s+<')
+XML_DECLARATION = "<?xml version='1.0' encoding='utf8'?>\n"
+TIMING_PHASES = ('build', 'serialize', 'transport', 'server', 'parse')
+
+
+def qualify(tag):
+    return f'{{{XMLNS}}}{tag}'
+
+
+RESPONSE_META_TAGS = frozenset(
+    qualify(tag) for tag in (
+        'TipsHeader',
+        'StatusCode',
+        'EntityMaxRecordCount',
+        'LogMessages',
+        'TipsApiError',
+    )
+)
+
+# Serialize the API namespace as the default one, as the server expects.
+ElementTree.register_namespace('', XMLNS)
 
 
 def parse_filter_criteria(expression):
-    m = re.match(r'^(?P<field>\w+) (?P<operator>\w+) (?P<value>.+)$', expression)
+    m = CRITERIA_RE.match(expression)
     if not m:
         raise AnsibleError(f'Unable to parse criteria expression: "{expression}"')
     return m.group('field'), m.group('operator'), m.group('value')
 
 
+def iter_chunks(body, chunk_size=CHUNK_SIZE):
+    if isinstance(body, (str, bytes)):
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+    elif hasattr(body, 'read'):
+        chunk = body.read(chunk_size)
+        while chunk:
+            yield chunk
+            chunk = body.read(chunk_size)
+    else:
+        yield from body
+
+
+def get_connection(ansible_module):
+    """Returns the connection API requests are sent through.
+
+    Modules reach the persistent connection through its socket, while tasks
+    run by the persistent connection itself carry the httpapi plugin.
+    """
+    connection = getattr(ansible_module, 'tips_connection', None)
+    if connection is None:
+        from ansible.module_utils.connection import Connection
+        connection = Connection(ansible_module._socket_path)
+    return connection
+
+
+def cache_result(ansible_module):
+    """Returns the response cache counters of the connection, to be merged into module results."""
+    stats = get_connection(ansible_module).get_cache_stats()
+    if not stats.pop('enabled'):
+        return dict()
+    return dict(tips_cache=stats)
+
+
+class RequestTimings:
+    """Time spent in each phase of the API requests of a module run, in seconds.
+
+    build and serialize cover the request XML, transport the round trip to the
+    persistent connection and the HTTP transfer, server the time the server took
+    to start answering, as measured by the httpapi plugin, and parse the response.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = dict.fromkeys(TIMING_PHASES, 0.0)
+        self.requests = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def add(self, phase, seconds):
+        self.phases[phase] += seconds
+
+    def result(self):
+        timings = {phase: round(seconds, 6) for phase, seconds in self.phases.items()}
+        timings.update(
+            total=round(time.perf_counter() - self.start, 6),
+            requests=self.requests,
+            request_bytes=self.request_bytes,
+            response_bytes=self.response_bytes
+        )
+        return timings
+
+
+TIMINGS = RequestTimings()
+
+
+def reset_timings():
+    """Starts timing a new task, in the persistent connection process which outlives them."""
+    global TIMINGS
+    TIMINGS = RequestTimings()
+
+
+def timing_result(ansible_module):
+    """Returns the phase timings of the module run when requested, to be merged into module results."""
+    if not ansible_module.params.get('timings'):
+        return dict()
+    return dict(timings=TIMINGS.result())
+
+
+def name_filters(names, field='name'):
+    """Returns filters matching the given names, as few as possible."""
+    listed = [n for n in names if ',' not in n]
+    filters = [dict(criteria=[f'{field} equals {n}']) for n in names if ',' in n]
+    if listed:
+        filters.insert(0, dict(criteria=[f'{field} belongsto {",".join(listed)}']))
+    return filters
+
+
+def send_requests(ansible_module, tips_requests, workers=1):
+    """Sends requests concurrently through the persistent connection.
+
+    Returns one dict per request, holding either the raw response or the
+    error the request failed with.
+    """
+    start = time.perf_counter()
+    jobs = list()
+    for tips_request in tips_requests:
+        if tips_request.started is not None:
+            TIMINGS.add('build', start - tips_request.started)
+            tips_request.started = None
+        tips_request.body = tips_request.tostring()
+        jobs.append(dict(path=tips_request.path, data=tips_request.body))
+    sent = time.perf_counter()
+    TIMINGS.add('serialize', sent - start)
+    results = get_connection(ansible_module).send_requests(jobs, workers=workers)
+    roundtrip = time.perf_counter() - sent
+    # Server times of concurrent requests overlap, transport is what is left of the wall time.
+    server = sum(r['timing']['server'] for r in results)
+    TIMINGS.add('server', server)
+    TIMINGS.add('transport', max(0.0, roundtrip - server))
+    TIMINGS.requests += len(results)
+    TIMINGS.request_bytes += sum(r['timing']['request_bytes'] for r in results)
+    TIMINGS.response_bytes += sum(r['timing']['response_bytes'] for r in results)
+    return results
+
+
+def iter_payload_elements(payloads):
+    """Yields (container, element) for each entity element of request documents."""
+    header_tag = qualify('TipsHeader')
+    for index, payload in enumerate(payloads):
+        try:
+            root = ElementTree.fromstring(payload)
+        except ElementTree.ParseError as exc:
+            raise AnsibleError(f'Invalid XML payload {index}: {exc}')
+        for container in root:
+            if container.tag == header_tag:
+                continue
+            for el in container:
+                yield container, el
+
+
+class XMLValidator:
+    """Checks that a document is well-formed as it is fed, without building a tree."""
+
+    def __init__(self):
+        self.parser = expat.ParserCreate()
+
+    def feed(self, data, final=False):
+        try:
+            self.parser.Parse(data, final)
+        except expat.ExpatError as exc:
+            raise AnsibleError(f'Invalid XML payload: {exc}')
+
+    def close(self):
+        self.feed(b'', final=True)
+
+
+def check_wellformed(xml, chunk_size=CHUNK_SIZE):
+    validator = XMLValidator()
+    for chunk in iter_chunks(xml, chunk_size):
+        validator.feed(chunk)
+    validator.close()
+
+
 class TipsApiXML:
+    # Pre-serialized document, sent as is instead of serializing xml.
+    body = None
+
     def __init__(self, xml):
         self.xml = xml
 
     def tostring(self, remove_whitespaces=True):
-        ElementTree.register_namespace('', XMLNS)
-        xml_string = ElementTree.tostring(self.xml, encoding='utf8', method='xml').decode()
+        if self.body is not None:
+            return self.body
+        # Serialized to str directly rather than to utf8 bytes decoded back,
+        # with the declaration the latter writes.
+        xml_string = XML_DECLARATION + ElementTree.tostring(self.xml, encoding='unicode', method='xml')
         if remove_whitespaces:
-            xml_string = re.sub(r'\s+(?=<)', '', xml_string)
+            xml_string = WHITESPACE_RE.sub('<', xml_string)
         return xml_string
 
 
 class TipsApiRequest(TipsApiXML):
     def __init__(self, method, entity):
+        self.started = time.perf_counter()
         self.path = f'{ROOT_PATH}/{method}/{entity}'
         self.entity = entity
-        self.path = None
-        self.xml = Element(QName(XMLNS, 'TipsApiRequest'))
-        tips_header = SubElement(self.xml, QName(XMLNS, 'TipsHeader'), {'version': VERSION})
+        self.xml = Element(qualify('TipsApiRequest'))
+        tips_header = SubElement(self.xml, qualify('TipsHeader'), {'version': VERSION})
         if entity in (EntityChoices.GUEST_USER, EntityChoices.ONBOARD_DEVICE):
             tips_header.set('source', 'Guest')
 
-    @staticmethod
+    @classmethod
     def delete(cls, entity, identifiers):
         instance = cls('delete', entity)
         instance.xml.append(instance.tips_delete(identifiers))
         return instance
 
-    @staticmethod
+    @classmethod
+    def delete_chunks(cls, entity, identifiers, chunk_size=DELETE_CHUNK):
+        """Yields delete requests of at most chunk_size identifiers each, carrying them as identifiers."""
+        chunk_size = max(1, chunk_size)
+        for i in range(0, len(identifiers), chunk_size):
+            instance = cls.delete(entity, identifiers[i:i + chunk_size])
+            instance.identifiers = identifiers[i:i + chunk_size]
+            yield instance
+
+    @classmethod
     def deleteconfirm(cls, entity, filters=list()):
         instance = cls('deleteConfirm', entity)
         for f in filters:
@@ -87,7 +284,7 @@ class TipsApiRequest(TipsApiXML):
             instance.xml.append(instance.tips_filter())
         return instance
 
-    @staticmethod
+    @classmethod
     def reorder(cls, entity, names):
         instance = cls('reorder', entity)
         instance.xml.append(instance.tips_orderlist(names))
@@ -102,47 +299,115 @@ class TipsApiRequest(TipsApiXML):
     @classmethod
     def write(cls, entity, xml):
         instance = cls('write', entity)
-        instance.xml = ElementTree.fromstring(xml)
+        check_wellformed(xml)
+        instance.body = xml
         return instance
 
-    def get_response(self, ansible_module):
-        from ansible.module_utils.connection import Connection
+    @classmethod
+    def write_batches(cls, entity, payloads, max_records=BATCH_RECORDS, max_bytes=BATCH_BYTES):
+        """Merges the entity elements of several write payloads into batched requests.
+
+        Each payload is a complete request document. Their entity elements are
+        regrouped under the same container elements (e.g. <GuestUsers>) of as
+        few requests as max_records and max_bytes allow, the header of the
+        payloads being replaced by the one of the batch.
+        """
+        return cls.write_elements(entity, iter_payload_elements(payloads), max_records, max_bytes)
+
+    @classmethod
+    def write_elements(cls, entity, elements, max_records=BATCH_RECORDS, max_bytes=BATCH_BYTES):
+        instance, containers = None, dict()
+        for container, el in elements:
+            size = len(ElementTree.tostring(el))
+            if instance is not None and (
+                instance.records >= max_records or instance.size + size > max_bytes
+            ):
+                yield instance
+                instance = None
+            if instance is None:
+                instance = cls('write', entity)
+                instance.records, instance.size, containers = 0, 0, dict()
+            if container.tag not in containers:
+                containers[container.tag] = SubElement(instance.xml, container.tag, container.attrib)
+            containers[container.tag].append(el)
+            instance.records += 1
+            instance.size += size
+        if instance is not None:
+            yield instance
+
+    @classmethod
+    def read_names(cls, entity, names, field='name'):
+        """Reads the elements with the given names, using as few filters as possible."""
+        return cls.read(entity, name_filters(names, field))
+
+    @classmethod
+    def deleteconfirm_names(cls, entity, names, field='name'):
+        """Lists the element-ids of the elements with the given names."""
+        return cls.deleteconfirm(entity, name_filters(names, field))
+
+    def send(self, ansible_module):
+        connection = get_connection(ansible_module)
+        start = time.perf_counter()
+        if self.started is not None:
+            TIMINGS.add('build', start - self.started)
+            self.started = None
+        # Keep the serialized request, so that echoing it in results does not serialize it again.
+        data = self.body = self.tostring()
+        sent = time.perf_counter()
+        TIMINGS.add('serialize', sent - start)
+        response = connection.send_request(self.path, data=data)
+        roundtrip = time.perf_counter() - sent
+        TIMINGS.requests += 1
+        server = 0.0
+        if ansible_module.params.get('timings'):
+            stats = connection.get_request_timing()
+            server = stats['server']
+            TIMINGS.request_bytes += stats['request_bytes']
+            TIMINGS.response_bytes += stats['response_bytes']
+        TIMINGS.add('server', server)
+        TIMINGS.add('transport', roundtrip - server)
+        return response
+
+    def get_response(self, ansible_module, stream=False, children=None):
         try:
-            response = Connection(ansible_module._socket_path).send_request(
-                self.path,
-                data=self.tostring()
-            )
+            response = self.send(ansible_module)
+            if stream:
+                return TipsApiResponseStream(response, children=children)
             tips_response = TipsApiResponse(response)
         except TipsApiError as exc:
-            ansible_module.fail_json(
-                changed=False,
-                msg=f'{exc.errorcode}: {exc.message}',
-                tips_request=self.tostring(),
-                tips_response=response
-            )
+            self.fail_response(ansible_module, exc, response)
         return tips_response
 
+    def fail_response(self, ansible_module, exc, response):
+        ansible_module.fail_json(
+            changed=False,
+            msg=f'{exc.errorcode}: {exc.message}',
+            **request_result(ansible_module, self),
+            **response_result(ansible_module, response),
+            **timing_result(ansible_module)
+        )
+
     def tips_delete(self, identifiers):
-        el = Element(QName(XMLNS, 'Delete'))
+        el = Element(qualify('Delete'))
         for name in identifiers:
-            subel = SubElement(el, QName(XMLNS, 'Element-Id'))
+            subel = SubElement(el, qualify('Element-Id'))
             subel.text = name
         return el
 
     def tips_filter(self, filtr=dict()):
         entity = filtr.get('entity', self.entity)
         criteria = filtr.get('criteria', list())
-        el = Element(QName(XMLNS, 'Filter'), {'entity': entity})
+        el = Element(qualify('Filter'), {'entity': entity})
         if criteria:
             field, operator, value = parse_filter_criteria(criteria[0])
-            crit = SubElement(el, QName(XMLNS, 'Criteria'), {
+            crit = SubElement(el, qualify('Criteria'), {
                 'fieldName': field,
                 'filterString': value,
                 'match': operator
             })
             for more in criteria[1:]:
                 field, operator, value = parse_filter_criteria(more)
-                SubElement(crit, QName(XMLNS, 'MoreFilterConditions'), {
+                SubElement(crit, qualify('MoreFilterConditions'), {
                     'fieldName': field,
                     'fieldValue': value,
                     'match': operator
@@ -152,20 +417,20 @@ class TipsApiRequest(TipsApiXML):
     def tips_namelist(self, entity=None):
         if entity is None:
             entity = self.entity
-        return Element(QName(XMLNS, 'EntityNameList'), {'entity': entity})
+        return Element(qualify('EntityNameList'), {'entity': entity})
 
     def tips_orderlist(self, names):
-        el = Element(QName(XMLNS, 'EntityOrderList'), {'entity': self.entity})
+        el = Element(qualify('EntityOrderList'), {'entity': self.entity})
         for name in names:
-            subel = SubElement(el, QName(XMLNS, 'Name'))
+            subel = SubElement(el, qualify('Name'))
             subel.text = name
         return el
 
     def tips_statuslist(self, status_list):
-        el = Element(QName(XMLNS, 'EntityStatusList'), {'entity': self.entity})
+        el = Element(qualify('EntityStatusList'), {'entity': self.entity})
         for item in status_list:
             status = EntityStatusChoices.ENABLED if item['enabled'] else EntityStatusChoices.DISABLED
-            subel = SubElement(el, QName(XMLNS, status))
+            subel = SubElement(el, qualify(status))
             subel.text = item['name']
         return el
 
@@ -176,12 +441,12 @@ class TipsApiError(Exception):
 
     @property
     def errorcode(self):
-        tag = QName(XMLNS, 'ErrorCode').text
+        tag = qualify('ErrorCode')
         return self.xml.find(tag).text
 
     @property
     def messages(self):
-        tag = QName(XMLNS, 'Message').text
+        tag = qualify('Message')
         return [m.text for m in self.xml.findall(tag)]
 
     @property
@@ -191,20 +456,24 @@ class TipsApiError(Exception):
 
 class TipsApiResponse(TipsApiXML):
     def __init__(self, body):
+        # Returned as received rather than serialized back from the tree.
+        self.body = body
+        start = time.perf_counter()
         self.xml = ElementTree.fromstring(body)
+        TIMINGS.add('parse', time.perf_counter() - start)
         if self.statuscode == 'Failure':
-            tag = QName(XMLNS, 'TipsApiError').text
+            tag = qualify('TipsApiError')
             raise TipsApiError(self.xml.find(tag))
 
     @property
     def statuscode(self):
-        tag = QName(XMLNS, 'StatusCode').text
+        tag = qualify('StatusCode')
         return self.xml.find(tag).text
 
     @property
     def messages(self):
-        logmessages_tag = QName(XMLNS, 'LogMessages').text
-        message_tag = QName(XMLNS, 'Message').text
+        logmessages_tag = qualify('LogMessages')
+        message_tag = qualify('Message')
         el = self.xml.find(logmessages_tag)
         if not el:
             return list()
@@ -215,3 +484,76 @@ class TipsApiResponse(TipsApiXML):
         if not self.messages:
             return ''
         return '. '.join(self.messages)
+
+
+class TipsApiResponseStream:
+    """Incrementally parsed API response.
+
+    Iterating yields the entity elements of the response one at a time, e.g.
+    each <GuestUser> of <GuestUsers> or each <Name> of <EntityNameList>.
+    Yielded elements are detached from the tree so memory stays flat
+    regardless of the record count. TipsApiError is raised as soon as the
+    error element has been parsed, before any entity is yielded. The
+    enclosing element of the last yielded one is available as container.
+    When children is a set of tags, other child elements of the entities
+    are dropped as soon as they are parsed.
+    """
+
+    def __init__(self, body, chunk_size=CHUNK_SIZE, children=None):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.children = children
+        self.statuscode = None
+        self.messages = list()
+        self.count = 0
+        self.container = None
+
+    @property
+    def message(self):
+        return '. '.join(self.messages)
+
+    def __iter__(self):
+        parser = ElementTree.XMLPullParser(events=('start', 'end'))
+        state = dict(depth=0, root=None, entity=None)
+        for chunk in iter_chunks(self.body, self.chunk_size):
+            start = time.perf_counter()
+            parser.feed(chunk)
+            TIMINGS.add('parse', time.perf_counter() - start)
+            yield from self._read_events(parser, state)
+        parser.close()
+        yield from self._read_events(parser, state)
+        if self.statuscode is None:
+            raise AnsibleError('Incomplete API response: missing StatusCode')
+
+    def _read_events(self, parser, state):
+        for event, el in parser.read_events():
+            if event == 'start':
+                state['depth'] += 1
+                if state['depth'] == 1:
+                    state['root'] = el
+                elif state['depth'] == 2:
+                    self.container = el
+                elif state['depth'] == 3:
+                    state['entity'] = el
+                continue
+            state['depth'] -= 1
+            if state['depth'] == 3:
+                if self.children is not None and el.tag not in self.children \
+                        and self.container.tag not in RESPONSE_META_TAGS:
+                    state['entity'].remove(el)
+            elif state['depth'] == 1:
+                self._handle_toplevel(el)
+                state['root'].remove(el)
+            elif state['depth'] == 2 and self.container.tag not in RESPONSE_META_TAGS:
+                self.count += 1
+                yield el
+                self.container.remove(el)
+
+    def _handle_toplevel(self, el):
+        if el.tag == qualify('StatusCode'):
+            self.statuscode = el.text
+        elif el.tag == qualify('TipsApiError'):
+            raise TipsApiError(el)
+        elif el.tag == qualify('LogMessages'):
+            tag = qualify('Message')
+            self.messages.extend(m.text for m in el.findall(tag))
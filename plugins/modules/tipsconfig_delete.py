@@ -23,6 +23,12 @@ descirption:
   - Deletes a set of configuration elements identified by element-id.
   - The XML response contains a log of deleted elements.
   - The list of identifiers for each object that needs to be deleted can be returned by the tipsconfig_deleteconfirm module.
+  - Identifiers are sent in chunks of I(chunk_size), up to I(workers) chunks at a time.
+  - With I(filters), the elements to delete are looked up with a deleteConfirm request in the same task,
+    and the element-ids of the response are fed straight into the delete requests.
+  - When a chunk is rejected with an error matching I(missing_pattern) and I(ignore_missing) is set, it is split
+    in halves and resent, so that identifiers already deleted are singled out and skipped without failing the
+    remaining ones. Chunks rejected with any other error fail as a whole.
 options:
 
   entity:
@@ -35,9 +41,108 @@ options:
   identifiers:
     description:
       - List of elements to be deleted.
+      - Mutually exclusive with I(filters), one of them is required.
     type: list
     elements: str
-    required: yes
+    required: no
+    aliases: [elementid_list]
+
+  filters:
+    description:
+      - Delete the elements matching these filters instead of a list of I(identifiers).
+      - Multiple filters are combined by an OR operator.
+      - Multiple criteria within filters are combined by an AND operator
+      - In check mode, only the matching elements are looked up and returned.
+    type: list
+    elements: dict
+    required: no
+    suboptions:
+      entity:
+        description:
+          - Sub-entity type to be filtered
+        required: no
+        default: Entity specified in top level options.
+      criteria:
+        description:
+          - List of filter expressions to be combined by an AND operator
+        type: list
+        elements: str
+        required: yes
+        suboptions:
+          description:
+            - Condition expression in the form "field operator value".
+            - List of valid operators: equals, notequals, contains, icontains, belongsto.
+          type: str
+          required: yes
+
+  max_deletions:
+    description:
+      - Safety cap on the number of elements matching I(filters). When more elements match, the task fails
+        before anything is deleted.
+      - The cap is disabled when set to 0.
+    type: int
+    required: no
+    default: 100
+
+  chunk_size:
+    description:
+      - Maximum number of identifiers sent in a single delete request.
+    type: int
+    required: no
+    default: 500
+
+  workers:
+    description:
+      - Number of delete requests sent concurrently through the persistent connection.
+      - Also bounded by the I(max_concurrency) option of the httpapi plugin.
+    type: int
+    required: no
+    default: 1
+
+  ignore_missing:
+    description:
+      - Skip identifiers the server reports as not found instead of failing their chunk.
+    type: bool
+    required: no
+    default: yes
+
+  missing_pattern:
+    description:
+      - Regular expression matched against the error of a rejected chunk to tell it holds identifiers that do not exist.
+    type: str
+    required: no
+    default: (?i)not found|does not exist|no such|invalid element
+
+  timings:
+    description:
+      - Return the time spent building, serializing, transporting and parsing the API requests of the task in C(timings).
+    type: bool
+    required: no
+    default: no
+
+  return_request:
+    description:
+      - Return the XML request sent to the server in C(tips_request).
+    type: bool
+    required: no
+    default: yes
+
+  return_response:
+    description:
+      - How the XML response of the server is returned in C(tips_response).
+      - C(full) returns it as is, C(truncate) cuts it to I(response_max_bytes), C(compress) returns it gzip-compressed
+        and base64-encoded, and C(summary) leaves it out, only returning its size in C(tips_response_size).
+    type: str
+    required: no
+    choices: [full, truncate, compress, summary]
+    default: full
+
+  response_max_bytes:
+    description:
+      - Maximum size of C(tips_response) when I(return_response) is C(truncate).
+    type: int
+    required: no
+    default: 65536
 '''
 
 EXAMPLES = r'''
@@ -46,6 +151,21 @@ EXAMPLES = r'''
     entity: GuestUser
     identifiers:
       - GuestUser_kang_MCw
+
+- name: Delete all stale Endpoints, 1000 per request, 4 requests at a time
+  tipsconfig_delete:
+    entity: Endpoint
+    identifiers: "{{ stale_endpoint_ids }}"
+    chunk_size: 1000
+    workers: 4
+
+- name: Delete the guest accounts of a past event, at most 2000 of them
+  tipsconfig_delete:
+    entity: GuestUser
+    filters:
+      - criteria:
+        - name contains event2019
+    max_deletions: 2000
 '''
 
 RETURNS = r'''
@@ -57,7 +177,7 @@ tips_path:
 
 tips_request:
   type: str
-  returned: always
+  returned: when all identifiers fit in a single chunk
   description:
     - XML content sent to the server
   sample: |-\n
@@ -71,7 +191,7 @@ tips_request:
 
 tips_response:
   type: str
-  returned: on success
+  returned: on success, when all identifiers fit in a single chunk
   description:
     - XML content returned by the server
   sample: |-\n
@@ -84,47 +204,131 @@ tips_response:
       </LogMessages>\n
     </TipsApiResponse>\n
 
+chunks:
+  type: list
+  elements: dict
+  returned: unless check mode
+  description:
+    - Outcome of each chunk of identifiers, in order.
+    - C(records) is the number of identifiers of the chunk, C(deleted) the number of deleted ones,
+      C(missing) and C(failed) the identifiers skipped as not found and those that could not be deleted.
+    - C(requests) counts the requests sent for the chunk, more than one when it was split.
+  sample:
+    - index: 0
+      records: 500
+      deleted: 499
+      missing:
+        - Endpoint_1a2b3c
+      failed: []
+      requests: 17
+      status: Success
+      msg: Endpoint deleted successfully
+
+found:
+  type: int
+  returned: when I(filters) is set
+  description:
+    - Number of elements matching the filters.
+
+identifiers:
+  type: list
+  elements: str
+  returned: when I(filters) is set, in check mode
+  description:
+    - Element-ids of the elements matching the filters, that would be deleted.
+
+deleted:
+  type: int
+  returned: unless check mode
+  description:
+    - Total number of deleted elements.
+
+missing:
+  type: list
+  elements: str
+  returned: unless check mode
+  description:
+    - Identifiers skipped because the server reported them as not found.
+
+timings:
+  type: dict
+  returned: when I(timings) is set
+  description:
+    - Seconds spent in each phase of the API requests of the task, summed over all requests.
+    - C(build) and C(serialize) cover the request XML, C(transport) the HTTP transfer, C(server) the time until
+      the server started to answer and C(parse) the response parsing, all of which happen in the persistent
+      connection. C(total) is the time the persistent connection spent on the task.
+    - C(requests), C(request_bytes) and C(response_bytes) count the requests and their uncompressed body sizes.
+  sample:
+    build: 0.000412
+    serialize: 0.000088
+    transport: 0.021734
+    server: 0.184512
+    parse: 0.003921
+    total: 0.214337
+    requests: 1
+    request_bytes: 231
+    response_bytes: 5120
+
+tips_response_size:
+  type: int
+  returned: when I(return_response) is not C(full)
+  description:
+    - Size in bytes of the XML response of the server.
+
+tips_response_truncated:
+  type: bool
+  returned: when I(return_response) is C(truncate)
+  description:
+    - Whether C(tips_response) was cut to I(response_max_bytes).
+
+tips_response_encoding:
+  type: str
+  returned: when I(return_response) is C(compress)
+  description:
+    - Encoding of C(tips_response), to be decoded with C(b64decode) and gunzipped.
+  sample: gzip+base64
 '''
 
+import re
+
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.connection import Connection
-from ansible.module_utils.six.moves.urllib.error import HTTPError
 
-from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.argspec import TipsArgSpec
-from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.argspec import DELETE_CHUNK, TipsArgSpec
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.result import exit_result
 
 
 def run_module():
     argspec = dict(
         entity=TipsArgSpec.entity,
-        elementid_list=dict(required=True, type='list', element='str')
+        timings=TipsArgSpec.timings,
+        return_request=TipsArgSpec.return_request,
+        return_response=TipsArgSpec.return_response,
+        response_max_bytes=TipsArgSpec.response_max_bytes,
+        identifiers=dict(required=False, type='list', elements='str', aliases=['elementid_list']),
+        filters=dict(TipsArgSpec.filterlist, default=None),
+        max_deletions=dict(required=False, type='int', default=100),
+        chunk_size=dict(required=False, type='int', default=DELETE_CHUNK),
+        workers=dict(required=False, type='int', default=1),
+        ignore_missing=dict(required=False, type='bool', default=True),
+        missing_pattern=dict(required=False, type='str', default=r'(?i)not found|does not exist|no such|invalid element')
     )
 
     module = AnsibleModule(
         argument_spec=argspec,
+        mutually_exclusive=[('identifiers', 'filters')],
+        required_one_of=[('identifiers', 'filters')],
         supports_check_mode=True
     )
 
-    tips_request = TipsApiRequest.delete(
-        module.params.get('entity'),
-        module.params.get('identifiers')
-    )
-
-    if module.check_mode:
-        module.exit_json(
-            changed=False,
-            tips_path=tips_request.path,
-            tips_request=tips_request.tostring()
-        )
-
-    tips_response = tips_request.get_response(module)
+    try:
+        re.compile(module.params['missing_pattern'])
+    except re.error as exc:
+        module.fail_json(msg=f'Invalid missing_pattern: {exc}')
 
-    module.exit_json(
-        changed=True,
-        tips_request=tips_request.tostring(),
-        tips_response=tips_response.tostring(),
-        msg=tips_response.message
-    )
+    # Matching elements are found and deleted chunk by chunk by the persistent connection.
+    exit_result(module, Connection(module._socket_path).delete_batch(module.params, module.check_mode))
 
 
 def main():
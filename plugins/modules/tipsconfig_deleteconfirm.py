@@ -59,6 +59,63 @@ options:
             - List of valid operators: equals, notequals, contains, icontains, belongsto.
           type: str
           required: yes
+
+  dest:
+    description:
+      - Path of a file the raw XML response is written to.
+      - When set, the response is streamed to this file instead of being returned as C(tips_response),
+        and only its path, size, record count and digest are returned.
+      - The file is only replaced, and the task reported as changed, when the content of the response differs
+        from the one of the existing file.
+    type: path
+    required: no
+
+  compress:
+    description:
+      - Gzip-compress the file written to I(dest).
+    type: bool
+    required: no
+    default: no
+
+  parse:
+    description:
+      - Return the response as structured data in C(elements) instead of raw XML in C(tips_response).
+      - The response is parsed in a single pass with an extractor specific to each entity type.
+      - Mutually exclusive with I(dest).
+    type: bool
+    required: no
+    default: no
+
+  timings:
+    description:
+      - Return the time spent building, serializing, transporting and parsing the API requests of the task in C(timings).
+    type: bool
+    required: no
+    default: no
+
+  return_request:
+    description:
+      - Return the XML request sent to the server in C(tips_request).
+    type: bool
+    required: no
+    default: yes
+
+  return_response:
+    description:
+      - How the XML response of the server is returned in C(tips_response).
+      - C(full) returns it as is, C(truncate) cuts it to I(response_max_bytes), C(compress) returns it gzip-compressed
+        and base64-encoded, and C(summary) leaves it out, only returning its size in C(tips_response_size).
+    type: str
+    required: no
+    choices: [full, truncate, compress, summary]
+    default: full
+
+  response_max_bytes:
+    description:
+      - Maximum size of C(tips_response) when I(return_response) is C(truncate).
+    type: int
+    required: no
+    default: 65536
 '''
 
 EXAMPLES = r'''
@@ -79,7 +136,7 @@ tips_path:
 
 tips_request:
   type: str
-  returned: always
+  returned: unless I(return_request) is disabled
   description:
     - XML content sent to the server
   sample: |-\n
@@ -93,7 +150,7 @@ tips_request:
 
 tips_response:
   type: str
-  returned: on success
+  returned: on success, unless I(dest) or I(parse) is set
   description:
     - XML content returned by the server
     - Contains the list of <element-id> elements to be used in with the delete module
@@ -113,6 +170,104 @@ tips_response:
         </GuestUser>\n
       </GuestUsers>\n
     </TipsApiResponse>\n
+
+dest:
+  type: str
+  returned: when I(dest) is set
+  description:
+    - Absolute path of the file the response was written to.
+
+size:
+  type: int
+  returned: when I(dest) is set
+  description:
+    - Size in bytes of the uncompressed response.
+
+records:
+  type: int
+  returned: when I(dest) is set
+  description:
+    - Number of entity elements in the response.
+
+digest:
+  type: str
+  returned: when I(dest) is set
+  description:
+    - Digest of the uncompressed response, prefixed with the algorithm name.
+  sample: sha256:9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08
+
+elements:
+  type: list
+  elements: dict
+  returned: when I(parse) is set
+  description:
+    - One dict per entity element of the response, in document order.
+    - Each dict holds the C(entity) type and C(name) of the element, its C(attributes),
+      its C(element_id) when the response provides one and its C(tags) for tagged entities
+      such as GuestUser, LocalUser and Endpoint.
+  sample:
+    - entity: GuestUser
+      name: kang
+      attributes:
+        enabled: 'true'
+        name: kang
+      element_id: GuestUser_kang_MCw
+      tags:
+        Location: Room A
+
+tips_cache:
+  type: dict
+  returned: when the connection caches responses, see the I(cache_ttl) option of the httpapi plugin
+  description:
+    - Counters of the response cache of the persistent connection, after this request.
+    - Holds the number of cached C(entries) and their C(bytes), and the cumulated C(hits), C(misses),
+      C(evictions) and C(invalidations).
+  sample:
+    entries: 3
+    bytes: 48213
+    hits: 12
+    misses: 3
+    evictions: 0
+    invalidations: 1
+
+timings:
+  type: dict
+  returned: when I(timings) is set
+  description:
+    - Seconds spent in each phase of the API requests of the task, summed over all requests.
+    - C(build) and C(serialize) cover the request XML, C(transport) the round trip through the persistent
+      connection and the HTTP transfer, C(server) the time until the server started to answer and C(parse)
+      the response parsing. C(total) is the wall time of the module run.
+    - C(requests), C(request_bytes) and C(response_bytes) count the requests and their uncompressed body sizes.
+  sample:
+    build: 0.000412
+    serialize: 0.000088
+    transport: 0.021734
+    server: 0.184512
+    parse: 0.003921
+    total: 0.214337
+    requests: 1
+    request_bytes: 231
+    response_bytes: 5120
+
+tips_response_size:
+  type: int
+  returned: when I(return_response) is not C(full)
+  description:
+    - Size in bytes of the XML response of the server.
+
+tips_response_truncated:
+  type: bool
+  returned: when I(return_response) is C(truncate)
+  description:
+    - Whether C(tips_response) was cut to I(response_max_bytes).
+
+tips_response_encoding:
+  type: str
+  returned: when I(return_response) is C(compress)
+  description:
+    - Encoding of C(tips_response), to be decoded with C(b64decode) and gunzipped.
+  sample: gzip+base64
 '''
 
 from ansible.module_utils.basic import AnsibleModule
@@ -120,17 +275,28 @@ from ansible.module_utils.connection import Connection
 from ansible.module_utils.six.moves.urllib.error import HTTPError
 
 from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.argspec import TipsArgSpec
-from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.extractors import extract_stream
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.output import dump_response
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.result import request_result, response_result
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest, TipsApiError, cache_result, timing_result
 
 
 def run_module():
     argspec = dict(
         entity=TipsArgSpec.entity,
-        filters=TipsArgSpec.filterlist
+        timings=TipsArgSpec.timings,
+        return_request=TipsArgSpec.return_request,
+        return_response=TipsArgSpec.return_response,
+        response_max_bytes=TipsArgSpec.response_max_bytes,
+        filters=TipsArgSpec.filterlist,
+        dest=TipsArgSpec.dest,
+        compress=TipsArgSpec.compress,
+        parse=TipsArgSpec.parse
     )
 
     module = AnsibleModule(
         argument_spec=argspec,
+        mutually_exclusive=[('dest', 'parse')],
         supports_check_mode=True
     )
 
@@ -143,16 +309,50 @@ def run_module():
         module.exit_json(
             changed=False,
             tips_path=tips_request.path,
-            tips_request=tips_request.tostring()
+            **request_result(module, tips_request)
+        )
+
+    if module.params.get('dest'):
+        tips_stream = tips_request.get_response(module, stream=True)
+        try:
+            result = dump_response(
+                tips_stream.body,
+                module.params.get('dest'),
+                compress=module.params.get('compress')
+            )
+        except TipsApiError as exc:
+            tips_request.fail_response(module, exc, tips_stream.body)
+        module.exit_json(
+            **request_result(module, tips_request),
+            **result,
+            **cache_result(module),
+            **timing_result(module)
+        )
+
+    if module.params.get('parse'):
+        tips_stream = tips_request.get_response(module, stream=True)
+        try:
+            elements = extract_stream(tips_stream)
+        except TipsApiError as exc:
+            tips_request.fail_response(module, exc, tips_stream.body)
+        module.exit_json(
+            changed=False,
+            **request_result(module, tips_request),
+            elements=elements,
+            msg=tips_stream.message,
+            **cache_result(module),
+            **timing_result(module)
         )
 
     tips_response = tips_request.get_response(module)
 
     module.exit_json(
         changed=False,
-        tips_request=tips_request.tostring(),
-        tips_response=tips_response.tostring(),
-        msg=tips_response.message
+        **request_result(module, tips_request),
+        **response_result(module, tips_response),
+        msg=tips_response.message,
+        **cache_result(module),
+        **timing_result(module)
     )
 
 
@@ -0,0 +1,388 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = r'''
+---
+author: Sacha Boudjema (@sachaboudjema)
+module: sachaboudjema.tipsconfig.tipsconfig_export
+version_added: 2.9
+short_description: Exports the configuration of several entity types to files.
+description:
+  - Reads every element of each requested entity type and writes each response to its own file in I(dest).
+  - Requests are sent concurrently by the persistent connection, so the export takes about as long as the
+    slowest entity type. Make sure the command timeout of the connection allows for it.
+  - Files are named after the entity type, spaces being replaced with underscores, e.g. C(Service.xml)
+    or C(RADIUS_Dictionary.xml.gz).
+  - In incremental mode, I(dest) holds a snapshot that is brought up to date rather than rewritten.
+options:
+
+  entities:
+    description:
+      - Element types to be exported.
+    type: list
+    elements: str
+    required: no
+    default: All entity types.
+    choices: See API documentation.
+
+  dest:
+    description:
+      - Directory the files are written to. It is created if it does not exist.
+    type: path
+    required: yes
+
+  compress:
+    description:
+      - Gzip-compress the files.
+    type: bool
+    required: no
+    default: no
+
+  workers:
+    description:
+      - Maximum number of requests in flight at the same time.
+    type: int
+    required: no
+    default: 4
+
+  incremental:
+    description:
+      - Update the snapshot in I(dest) from the differences between the current list of names of each
+        entity type and the one recorded by the previous run in C(index.json).
+      - Only the new names are read, elements whose name disappeared are dropped from the snapshot.
+        The reads of all entity types are sent concurrently, as in a full export.
+      - Names the reads do not return, e.g. elements deleted in between, are left out of the index and read
+        again by the next run.
+      - Elements modified without being renamed are not detected, so a full export should still be taken
+        periodically, e.g. by deleting C(index.json).
+      - Entity types without a previous snapshot are fully exported.
+      - The changes are recorded in C(changeset.json) and returned in C(changeset).
+    type: bool
+    required: no
+    default: no
+
+  batch_names:
+    description:
+      - Maximum number of names read by a single request in incremental mode.
+    type: int
+    required: no
+    default: 500
+'''
+
+EXAMPLES = r'''
+- name: Back up policy configuration
+  tipsconfig_export:
+    entities:
+      - Service
+      - EnforcementPolicy
+      - EnforcementProfile
+      - Role
+      - RoleMapping
+    dest: /var/backups/clearpass/{{ inventory_hostname }}
+    compress: yes
+  vars:
+    ansible_command_timeout: 600
+
+- name: Nightly incremental snapshot of endpoints and guest users
+  tipsconfig_export:
+    entities:
+      - Endpoint
+      - GuestUser
+    dest: /var/backups/clearpass/snapshot
+    incremental: yes
+'''
+
+RETURNS = r'''
+entities:
+  type: list
+  elements: dict
+  returned: always
+  description:
+    - Outcome of the export of each entity type, in the order they were requested.
+    - Each item holds the C(entity) type, the C(dest) file and the C(status) of the response.
+    - On success, also holds the uncompressed C(size), number of C(records) and C(digest) of the response,
+      and whether the file C(changed), as returned by tipsconfig_read with I(dest).
+    - C(transfer) and C(elapsed) are the seconds spent waiting for the response and in total.
+  sample:
+    - entity: Service
+      dest: /var/backups/clearpass/cppm01/Service.xml.gz
+      status: Success
+      size: 2318421
+      records: 142
+      digest: sha256:9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08
+      changed: true
+      transfer: 4.213
+      elapsed: 4.377
+      msg: ''
+    - entity: Endpoint
+      dest: /var/backups/clearpass/snapshot/Endpoint.xml
+      status: Success
+      mode: incremental
+      added: 42
+      removed: 3
+      records: 51378
+      elapsed: 6.102
+
+changeset:
+  type: dict
+  returned: in incremental mode
+  description:
+    - Changes applied to the snapshot, by entity type, as written to C(changeset.json).
+    - For each entity type, C(mode) is either C(full) or C(incremental). Incremental changes list the
+      C(added) and C(removed) names.
+  sample:
+    Endpoint:
+      mode: incremental
+      added:
+        - 00:1a:2b:3c:4d:5e
+      removed: []
+    GuestUser:
+      mode: full
+      records: 1204
+
+elapsed:
+  type: float
+  returned: always
+  description:
+    - Wall time of the whole export, in seconds.
+'''
+
+import os
+import time
+
+from ansible.module_utils._text import to_text
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.connection import Connection
+
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.argspec import TipsArgSpec
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.choices import EntityChoices
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.extractors import name_attribute
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.snapshot import (
+    CHANGESET_FILE, load_index, merge_snapshot, open_snapshot, read_names, save_index, write_json
+)
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import (
+    TipsApiRequest, TipsApiResponseStream, TipsApiError, send_requests
+)
+
+
+def export_filename(entity, compress=False):
+    name = entity.replace(' ', '_') + '.xml'
+    return name + '.gz' if compress else name
+
+
+def read_namelists(module, jobs):
+    """Returns the current names of the entity type of each job, and the error reading them if any."""
+    tips_requests = [TipsApiRequest.namelist(job['entity']) for job in jobs]
+    namelists = list()
+    for result in send_requests(module, tips_requests, workers=module.params.get('workers')):
+        if 'error' in result:
+            namelists.append((None, result['error']))
+            continue
+        try:
+            namelists.append(([el.text for el in TipsApiResponseStream(result['response'])], None))
+        except TipsApiError as exc:
+            namelists.append((None, f'{exc.errorcode}: {exc.message}'))
+    return namelists
+
+
+def read_jobs(job, added, batch):
+    """Returns export jobs reading the added names of an entity type into temporary files next to its snapshot."""
+    entity = job['entity']
+    field = name_attribute(entity)
+    directory, filename = os.path.split(job['dest'])
+    jobs = list()
+    for i in range(0, len(added), batch):
+        tips_request = TipsApiRequest.read_names(entity, added[i:i + batch], field)
+        jobs.append(dict(
+            entity=entity,
+            path=tips_request.path,
+            data=tips_request.tostring(),
+            dest=os.path.join(directory, f'.{filename}.added-{i // batch}'),
+            compress=False
+        ))
+    return jobs
+
+
+def read_added(results, field, wanted, found):
+    """Yields (container, element) for the wanted names in the files read, adding the names to found."""
+    for result in results:
+        with open_snapshot(result['dest'], compress=False) as f:
+            tips_stream = TipsApiResponseStream(f)
+            for el in tips_stream:
+                name = el.get(field)
+                if name in wanted and name not in found:
+                    found.add(name)
+                    yield tips_stream.container, el
+
+
+def update_snapshot(job, previous_names, names, results):
+    """Merges the elements read into the snapshot of an entity type, returning the names it now holds and the changes."""
+    field = name_attribute(job['entity'])
+    previous = set(previous_names)
+    added = [n for n in names if n not in previous]
+    removed = previous.difference(names)
+
+    found = set()
+    records = len(names)
+    if added or removed:
+        records = merge_snapshot(job['dest'], removed, read_added(results, field, set(added), found), field)
+    # Names the read did not return, e.g. deleted in between, are not in the
+    # snapshot and are left out of the index so that the next run reads them.
+    names = [n for n in names if n in previous or n in found]
+    added = [n for n in added if n in found]
+    return names, dict(added=added, removed=sorted(removed), records=records)
+
+
+def run_incremental(module, jobs):
+    dest = module.params.get('dest')
+    connection = Connection(module._socket_path)
+    index = load_index(dest)
+    full, incremental = list(), list()
+    for job in jobs:
+        entry = index.get(job['entity'], dict())
+        if entry.get('file') == os.path.basename(job['dest']) and os.path.exists(job['dest']):
+            incremental.append(job)
+        else:
+            full.append(job)
+
+    results, changeset = list(), dict()
+    if full:
+        results = connection.export_responses(full, module.params.get('workers'))
+    for result in results:
+        result['mode'] = 'full'
+        if result['status'] == 'Success':
+            names = read_names(result['dest'], name_attribute(result['entity']))
+            index[result['entity']] = dict(file=os.path.basename(result['dest']), names=names)
+            changeset[result['entity']] = dict(mode='full', records=len(names))
+    if full:
+        save_index(dest, index)
+
+    start = time.monotonic()
+    namelists = read_namelists(module, incremental) if incremental else list()
+    # The added names of all entity types are read concurrently, each batch to its own file.
+    reads = list()
+    for job, (names, error) in zip(incremental, namelists):
+        if names is not None:
+            previous = set(index[job['entity']]['names'])
+            reads.extend(read_jobs(job, [n for n in names if n not in previous], module.params.get('batch_names')))
+    read_results = connection.export_responses(reads, module.params.get('workers')) if reads else list()
+
+    for job, (names, error) in zip(incremental, namelists):
+        result = dict(entity=job['entity'], dest=job['dest'], mode='incremental')
+        entity_results = [r for r in read_results if r['entity'] == job['entity']]
+        failed = [r for r in entity_results if r['status'] != 'Success']
+        try:
+            if error is not None:
+                result.update(status='Failure', msg=error)
+            elif failed:
+                result.update(status='Failure', msg=failed[0].get('msg', ''))
+            else:
+                names, changes = update_snapshot(job, index[job['entity']]['names'], names, entity_results)
+                # Record the names as soon as the snapshot file is rewritten, so that a
+                # later failure never leaves the index behind the file.
+                index[job['entity']]['names'] = names
+                save_index(dest, index)
+                changeset[job['entity']] = dict(mode='incremental', added=changes['added'], removed=changes['removed'])
+                result.update(
+                    status='Success',
+                    added=len(changes['added']),
+                    removed=len(changes['removed']),
+                    records=changes['records']
+                )
+        except TipsApiError as exc:
+            result.update(status='Failure', msg=f'{exc.errorcode}: {exc.message}')
+        except Exception as exc:
+            result.update(status='Failure', msg=f'{type(exc).__name__}: {to_text(exc)}')
+        finally:
+            for r in entity_results:
+                if r['status'] == 'Success':
+                    os.unlink(r['dest'])
+        result['elapsed'] = round(time.monotonic() - start, 3)
+        results.append(result)
+
+    write_json(os.path.join(dest, CHANGESET_FILE), dict(
+        time=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        entities=changeset
+    ))
+    order = [job['entity'] for job in jobs]
+    results.sort(key=lambda r: order.index(r['entity']))
+    return results, changeset
+
+
+def run_module():
+    argspec = dict(
+        entities=dict(required=False, type='list', elements='str', choices=EntityChoices.CHOICES,
+                      default=list(EntityChoices.CHOICES)),
+        dest=dict(required=True, type='path'),
+        compress=TipsArgSpec.compress,
+        workers=dict(required=False, type='int', default=4),
+        incremental=dict(required=False, type='bool', default=False),
+        batch_names=dict(required=False, type='int', default=500),
+    )
+
+    module = AnsibleModule(
+        argument_spec=argspec,
+        supports_check_mode=True
+    )
+
+    # The persistent connection does not share the working directory of the module.
+    module.params['dest'] = os.path.abspath(module.params['dest'])
+
+    jobs = list()
+    for entity in module.params.get('entities'):
+        tips_request = TipsApiRequest.read(entity)
+        jobs.append(dict(
+            entity=entity,
+            path=tips_request.path,
+            data=tips_request.tostring(),
+            dest=os.path.join(module.params.get('dest'), export_filename(entity, module.params.get('compress'))),
+            compress=module.params.get('compress')
+        ))
+
+    if module.check_mode:
+        module.exit_json(
+            changed=False,
+            entities=[dict(entity=job['entity'], dest=job['dest']) for job in jobs]
+        )
+
+    os.makedirs(module.params.get('dest'), exist_ok=True)
+    start = time.monotonic()
+    result = dict()
+    if module.params.get('incremental'):
+        results, result['changeset'] = run_incremental(module, jobs)
+        changed = any(r.get('changed') or r.get('added') or r.get('removed') for r in results)
+    else:
+        results = Connection(module._socket_path).export_responses(jobs, module.params.get('workers'))
+        changed = any(r.get('changed') for r in results)
+    elapsed = round(time.monotonic() - start, 3)
+
+    failed = [r for r in results if r['status'] != 'Success']
+    result.update(
+        changed=changed and len(failed) < len(results),
+        entities=results,
+        elapsed=elapsed,
+        msg=f'{len(results) - len(failed)} of {len(results)} entity type(s) exported'
+    )
+    if failed:
+        module.fail_json(**result)
+    module.exit_json(**result)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
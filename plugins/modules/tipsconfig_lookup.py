@@ -0,0 +1,212 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.1',
+    'status': ['preview'],
+    'supported_by': 'community'
+}
+
+DOCUMENTATION = r'''
+---
+author: Sacha Boudjema (@sachaboudjema)
+module: sachaboudjema.tipsconfig.tipsconfig_lookup
+version_added: 2.9
+short_description: Resolves element names to element-ids and checks they exist.
+description:
+  - Looks names up in the element index of the persistent connection, see the I(index) option of the httpapi plugin.
+  - Only the names the index cannot answer for are queried, with a single deleteConfirm request, or a namelist
+    request when element-ids are not needed. The responses are added to the index in turn.
+  - Without the index, every lookup queries the server.
+options:
+
+  entity:
+    description:
+      - Element type of the names.
+    type: str
+    required: yes
+    choices: See API documentation.
+
+  names:
+    description:
+      - Names of the elements to look up, e.g. MAC addresses for Endpoints.
+    type: list
+    elements: str
+    required: yes
+
+  element_ids:
+    description:
+      - Resolve the element-ids of the elements. When disabled, only their existence is checked.
+    type: bool
+    required: no
+    default: yes
+
+  refresh:
+    description:
+      - Query the server for all names, ignoring the index.
+    type: bool
+    required: no
+    default: no
+
+  timings:
+    description:
+      - Return the time spent building, serializing, transporting and parsing the API requests of the task in C(timings).
+    type: bool
+    required: no
+    default: no
+'''
+
+EXAMPLES = r'''
+- name: Resolve the element-ids of two services
+  tipsconfig_lookup:
+    entity: Service
+    names:
+      - Corporate 802.1X
+      - Guest Access
+  register: services
+
+- name: Fail early when a role is missing
+  tipsconfig_lookup:
+    entity: Role
+    names: "{{ required_roles }}"
+    element_ids: no
+  register: roles
+  failed_when: roles.missing | length > 0
+'''
+
+RETURNS = r'''
+element_ids:
+  type: dict
+  returned: always
+  description:
+    - Element-id of each existing element, by name. The element-id is null when I(element_ids) is disabled
+      and it is not known from the index.
+  sample:
+    Corporate 802.1X: Service_4_MTA
+    Guest Access: Service_7_MTA
+
+missing:
+  type: list
+  elements: str
+  returned: always
+  description:
+    - Names of the elements that do not exist.
+
+api_calls:
+  type: int
+  returned: always
+  description:
+    - Number of API requests sent, 0 when the index answered for all names.
+
+timings:
+  type: dict
+  returned: when I(timings) is set
+  description:
+    - Seconds spent in each phase of the API requests of the task, summed over all requests.
+    - C(build) and C(serialize) cover the request XML, C(transport) the round trip through the persistent
+      connection and the HTTP transfer, C(server) the time until the server started to answer and C(parse)
+      the response parsing. C(total) is the wall time of the module run.
+    - C(requests), C(request_bytes) and C(response_bytes) count the requests and their uncompressed body sizes.
+  sample:
+    build: 0.000412
+    serialize: 0.000088
+    transport: 0.021734
+    server: 0.184512
+    parse: 0.003921
+    total: 0.214337
+    requests: 1
+    request_bytes: 231
+    response_bytes: 5120
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.connection import Connection
+
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.argspec import TipsArgSpec
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.extractors import ELEMENT_ID_TAG, name_attribute
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest, TipsApiError, timing_result
+
+
+def run_module():
+    argspec = dict(
+        entity=TipsArgSpec.entity,
+        timings=TipsArgSpec.timings,
+        names=dict(required=True, type='list', elements='str'),
+        element_ids=dict(required=False, type='bool', default=True),
+        refresh=dict(required=False, type='bool', default=False)
+    )
+
+    module = AnsibleModule(
+        argument_spec=argspec,
+        supports_check_mode=True
+    )
+
+    entity = module.params.get('entity')
+    names = list(dict.fromkeys(module.params.get('names')))
+    element_ids = module.params.get('element_ids')
+
+    if module.params.get('refresh'):
+        state = dict()
+    else:
+        state = Connection(module._socket_path).lookup_elements(entity, names)['elements']
+
+    unresolved = [
+        n for n in names
+        if n not in state or state[n]['exists'] is None
+        or (element_ids and state[n]['exists'] and state[n]['element_id'] is None)
+    ]
+    api_calls = 0
+    if unresolved:
+        api_calls = 1
+        if element_ids:
+            found = find_element_ids(module, entity, unresolved)
+        else:
+            found = dict.fromkeys(find_names(module, entity, unresolved))
+        for name in unresolved:
+            state[name] = dict(exists=name in found, element_id=found.get(name))
+
+    module.exit_json(
+        changed=False,
+        element_ids={n: state[n]['element_id'] for n in names if state[n]['exists']},
+        missing=[n for n in names if not state[n]['exists']],
+        api_calls=api_calls,
+        **timing_result(module)
+    )
+
+
+def find_element_ids(module, entity, names):
+    field = name_attribute(entity)
+    tips_request = TipsApiRequest.deleteconfirm_names(entity, names, field)
+    tips_stream = tips_request.get_response(module, stream=True)
+    wanted = set(names)
+    found = dict()
+    try:
+        for el in tips_stream:
+            if el.get(field) in wanted:
+                found[el.get(field)] = el.findtext(ELEMENT_ID_TAG)
+    except TipsApiError as exc:
+        tips_request.fail_response(module, exc, tips_stream.body)
+    return found
+
+
+def find_names(module, entity, names):
+    tips_request = TipsApiRequest.namelist(entity)
+    tips_stream = tips_request.get_response(module, stream=True)
+    wanted = set(names)
+    try:
+        return [el.text for el in tips_stream if el.text in wanted]
+    except TipsApiError as exc:
+        tips_request.fail_response(module, exc, tips_stream.body)
+
+
+def main():
+    run_module()
+
+if __name__ == '__main__':
+    main()
@@ -32,6 +32,45 @@ options:
     type: str
     required: yes
     choices: See API documentation.
+
+  parse:
+    description:
+      - Return the response as structured data in C(elements) instead of raw XML in C(tips_response).
+      - The response is parsed in a single pass with an extractor specific to each entity type.
+    type: bool
+    required: no
+    default: no
+
+  timings:
+    description:
+      - Return the time spent building, serializing, transporting and parsing the API requests of the task in C(timings).
+    type: bool
+    required: no
+    default: no
+
+  return_request:
+    description:
+      - Return the XML request sent to the server in C(tips_request).
+    type: bool
+    required: no
+    default: yes
+
+  return_response:
+    description:
+      - How the XML response of the server is returned in C(tips_response).
+      - C(full) returns it as is, C(truncate) cuts it to I(response_max_bytes), C(compress) returns it gzip-compressed
+        and base64-encoded, and C(summary) leaves it out, only returning its size in C(tips_response_size).
+    type: str
+    required: no
+    choices: [full, truncate, compress, summary]
+    default: full
+
+  response_max_bytes:
+    description:
+      - Maximum size of C(tips_response) when I(return_response) is C(truncate).
+    type: int
+    required: no
+    default: 65536
 '''
 
 EXAMPLES = r'''
@@ -49,7 +88,7 @@ tips_path:
 
 tips_request:
   type: str
-  returned: always
+  returned: unless I(return_request) is disabled
   description:
     - XML content sent to the server
   sample: |-\n
@@ -61,7 +100,7 @@ tips_request:
 
 tips_response:
   type: str
-  returned: on success
+  returned: on success, unless I(parse) is set
   description:
     - XML content returned by the server
   sample: |-\n
@@ -76,19 +115,88 @@ tips_response:
         <Name>[Guest Operator Logins]</Name><Name>test 802.1X Wireless</Name>\n
       </EntityNameList>\n
     </TipsApiResponse>\n
+
+elements:
+  type: list
+  elements: dict
+  returned: when I(parse) is set
+  description:
+    - One dict per name of the response, holding the C(entity) type and the C(name).
+  sample:
+    - entity: Service
+      name: test 802.1X Wireless
+
+tips_cache:
+  type: dict
+  returned: when the connection caches responses, see the I(cache_ttl) option of the httpapi plugin
+  description:
+    - Counters of the response cache of the persistent connection, after this request.
+    - Holds the number of cached C(entries) and their C(bytes), and the cumulated C(hits), C(misses),
+      C(evictions) and C(invalidations).
+  sample:
+    entries: 3
+    bytes: 48213
+    hits: 12
+    misses: 3
+    evictions: 0
+    invalidations: 1
+
+timings:
+  type: dict
+  returned: when I(timings) is set
+  description:
+    - Seconds spent in each phase of the API requests of the task, summed over all requests.
+    - C(build) and C(serialize) cover the request XML, C(transport) the HTTP transfer, C(server) the time until
+      the server started to answer and C(parse) the response parsing, all of which happen in the persistent
+      connection. C(total) is the time the persistent connection spent on the task.
+    - C(requests), C(request_bytes) and C(response_bytes) count the requests and their uncompressed body sizes.
+  sample:
+    build: 0.000412
+    serialize: 0.000088
+    transport: 0.021734
+    server: 0.184512
+    parse: 0.003921
+    total: 0.214337
+    requests: 1
+    request_bytes: 231
+    response_bytes: 5120
+
+tips_response_size:
+  type: int
+  returned: when I(return_response) is not C(full)
+  description:
+    - Size in bytes of the XML response of the server.
+
+tips_response_truncated:
+  type: bool
+  returned: when I(return_response) is C(truncate)
+  description:
+    - Whether C(tips_response) was cut to I(response_max_bytes).
+
+tips_response_encoding:
+  type: str
+  returned: when I(return_response) is C(compress)
+  description:
+    - Encoding of C(tips_response), to be decoded with C(b64decode) and gunzipped.
+  sample: gzip+base64
 '''
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.connection import Connection
 
 from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.argspec import TipsArgSpec
-from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.result import exit_result
 
 
 def run_module():
     argspec = dict(
         entity=TipsArgSpec.entity,
-        entity_type_list=dict(required=False, type='list', elements='str', default=list())
+        timings=TipsArgSpec.timings,
+        return_request=TipsArgSpec.return_request,
+        return_response=TipsArgSpec.return_response,
+        response_max_bytes=TipsArgSpec.response_max_bytes,
+        entity_type_list=dict(required=False, type='list', elements='str', default=list()),
+        parse=TipsArgSpec.parse
     )
 
     module = AnsibleModule(
@@ -96,26 +204,8 @@ def run_module():
         supports_check_mode=True
     )
 
-    tips_request = TipsApiRequest.namelist(
-        module.params.get('entity'),
-        module.params.get('entity_type_list')
-    )
-
-    if module.check_mode:
-        module.exit_json(
-            changed=False,
-            tips_path=tips_request.path,
-            tips_request=tips_request.tostring()
-        )
-
-    tips_response = tips_request.get_response(module)
-
-    module.exit_json(
-        changed=False,
-        tips_request=tips_request.tostring(),
-        tips_response=tips_response.tostring(),
-        msg=tips_response.message
-    )
+    # The request is built and the response parsed by the persistent connection.
+    exit_result(module, Connection(module._socket_path).namelist(module.params, module.check_mode))
 
 
 def main():
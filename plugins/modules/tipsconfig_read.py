@@ -57,15 +57,122 @@ options:
             - List of valid operators: equals, notequals, contains, icontains, belongsto.
           type: str
           required: yes
+
+  query:
+    description:
+      - Conditions the returned elements must all match, as an alternative to I(filters).
+      - Each condition is a dict with a C(field), an C(op) and a C(value), or a dict with a single C(any) or C(all)
+        key holding a list of conditions, or a C(not) key holding one condition.
+      - C(field) is an attribute name, C(element-id), or C(tag:<name>) for the value of a tag.
+      - C(op) is one of C(equals) (default), C(notequals), C(contains), C(icontains), C(belongsto), C(in), C(notin),
+        C(regex), C(iregex), C(gt), C(ge), C(lt), C(le), C(between) (with a list of two bounds) or C(exists).
+      - Top level conditions the server supports, i.e. the first five operators and C(in) on plain attributes,
+        are sent as a filter. The others are applied while the response is parsed, so that only matching
+        elements are kept.
+    type: list
+    elements: dict
+    required: no
+
+  fields:
+    description:
+      - Names of the attributes and child elements to keep on the returned elements, e.g. C(enabled) or C(GuestUserTags).
+        C(tag:<name>) keeps the tags, C(element-id) the element-id.
+      - The name attribute and element-id of the elements are always kept.
+      - Other child elements are pruned while the response is parsed, before anything is returned, which
+        shrinks results and memory use for inventory-style reads of nested entities.
+    type: list
+    elements: str
+    required: no
+
+  dest:
+    description:
+      - Path of a file the raw XML response is written to.
+      - When set, the response is streamed to this file instead of being returned as C(tips_response),
+        and only its path, size, record count and digest are returned.
+      - The file is only replaced, and the task reported as changed, when the content of the response differs
+        from the one of the existing file.
+    type: path
+    required: no
+
+  compress:
+    description:
+      - Gzip-compress the file written to I(dest).
+    type: bool
+    required: no
+    default: no
+
+  parse:
+    description:
+      - Return the response as structured data in C(elements) instead of raw XML in C(tips_response).
+      - The response is parsed in a single pass with an extractor specific to each entity type.
+      - Mutually exclusive with I(dest).
+    type: bool
+    required: no
+    default: no
+
+  timings:
+    description:
+      - Return the time spent building, serializing, transporting and parsing the API requests of the task in C(timings).
+    type: bool
+    required: no
+    default: no
+
+  return_request:
+    description:
+      - Return the XML request sent to the server in C(tips_request).
+    type: bool
+    required: no
+    default: yes
+
+  return_response:
+    description:
+      - How the XML response of the server is returned in C(tips_response).
+      - C(full) returns it as is, C(truncate) cuts it to I(response_max_bytes), C(compress) returns it gzip-compressed
+        and base64-encoded, and C(summary) leaves it out, only returning its size in C(tips_response_size).
+    type: str
+    required: no
+    choices: [full, truncate, compress, summary]
+    default: full
+
+  response_max_bytes:
+    description:
+      - Maximum size of C(tips_response) when I(return_response) is C(truncate).
+    type: int
+    required: no
+    default: 65536
 '''
 
 EXAMPLES = r'''
+- name: Get the guest accounts of the sponsors of a team, created in 2019
+  tipsconfig_read:
+    entity: GuestUser
+    parse: yes
+    query:
+      - field: sponsorName
+        op: in
+        value: [alice, bob]
+      - field: name
+        op: regex
+        value: '^visitor-\d+$'
+      - any:
+          - field: expireTime
+            op: between
+            value: [1546300800, 1577836799]
+          - field: enabled
+            value: 'false'
+
 - name: Retrieve a Guest User Value
   tipsconfig_read:
     entity: GuestUser
     filters:
       - criteria:
         - name equals kang
+
+- name: Export all Endpoints to a compressed file
+  tipsconfig_read:
+    entity: Endpoint
+    dest: /var/backups/clearpass/Endpoint.xml.gz
+    compress: yes
 '''
 
 RETURNS = r'''
@@ -77,7 +184,7 @@ tips_path:
 
 tips_request:
   type: str
-  returned: always
+  returned: unless I(return_request) is disabled
   description:
     - XML content sent to the server
   sample: |-\n
@@ -91,8 +198,10 @@ tips_request:
 
 tips_response:
   type: str
-  returned: on success
+  returned: on success, unless I(dest) or I(parse) is set
   description:
+    - With I(query), holds only the matching elements.
+    - With I(fields), holds only the requested attributes and child elements.
     - XML content returned by the server
   sample: |-\n
     <?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n
@@ -109,47 +218,154 @@ tips_response:
         </GuestUser>\n
       </GuestUsers>\n
     </TipsApiResponse>\n
+
+dest:
+  type: str
+  returned: when I(dest) is set
+  description:
+    - Absolute path of the file the response was written to.
+
+size:
+  type: int
+  returned: when I(dest) is set
+  description:
+    - Size in bytes of the uncompressed response.
+
+records:
+  type: int
+  returned: when I(dest) is set
+  description:
+    - Number of entity elements in the response.
+
+digest:
+  type: str
+  returned: when I(dest) is set
+  description:
+    - Digest of the uncompressed response, prefixed with the algorithm name.
+  sample: sha256:9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08
+
+elements:
+  type: list
+  elements: dict
+  returned: when I(parse) is set
+  description:
+    - One dict per entity element of the response, in document order.
+    - Each dict holds the C(entity) type and C(name) of the element, its C(attributes),
+      its C(element_id) when the response provides one and its C(tags) for tagged entities
+      such as GuestUser, LocalUser and Endpoint.
+  sample:
+    - entity: GuestUser
+      name: kang
+      attributes:
+        enabled: 'true'
+        name: kang
+      element_id: GuestUser_kang_MCw
+      tags:
+        Location: Room A
+
+matched:
+  type: int
+  returned: when I(query) or I(fields) is set
+  description:
+    - Number of elements matching the query, out of C(scanned) elements returned by the server.
+
+scanned:
+  type: int
+  returned: when I(query) or I(fields) is set
+  description:
+    - Number of elements returned by the server, i.e. matching the conditions sent as a filter.
+
+tips_cache:
+  type: dict
+  returned: when the connection caches responses, see the I(cache_ttl) option of the httpapi plugin
+  description:
+    - Counters of the response cache of the persistent connection, after this request.
+    - Holds the number of cached C(entries) and their C(bytes), and the cumulated C(hits), C(misses),
+      C(evictions) and C(invalidations).
+  sample:
+    entries: 3
+    bytes: 48213
+    hits: 12
+    misses: 3
+    evictions: 0
+    invalidations: 1
+
+timings:
+  type: dict
+  returned: when I(timings) is set
+  description:
+    - Seconds spent in each phase of the API requests of the task, summed over all requests.
+    - C(build) and C(serialize) cover the request XML, C(transport) the HTTP transfer, C(server) the time until
+      the server started to answer and C(parse) the response parsing, all of which happen in the persistent
+      connection. C(total) is the time the persistent connection spent on the task.
+    - C(requests), C(request_bytes) and C(response_bytes) count the requests and their uncompressed body sizes.
+  sample:
+    build: 0.000412
+    serialize: 0.000088
+    transport: 0.021734
+    server: 0.184512
+    parse: 0.003921
+    total: 0.214337
+    requests: 1
+    request_bytes: 231
+    response_bytes: 5120
+
+tips_response_size:
+  type: int
+  returned: when I(return_response) is not C(full)
+  description:
+    - Size in bytes of the XML response of the server.
+
+tips_response_truncated:
+  type: bool
+  returned: when I(return_response) is C(truncate)
+  description:
+    - Whether C(tips_response) was cut to I(response_max_bytes).
+
+tips_response_encoding:
+  type: str
+  returned: when I(return_response) is C(compress)
+  description:
+    - Encoding of C(tips_response), to be decoded with C(b64decode) and gunzipped.
+  sample: gzip+base64
 '''
 
+import os
+
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.connection import Connection
-from ansible.module_utils.six.moves.urllib.error import HTTPError
 
 from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.argspec import TipsArgSpec
-from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.result import exit_result
 
 
 def run_module():
     argspec = dict(
         entity=TipsArgSpec.entity,
-        filters=TipsArgSpec.filterlist
+        timings=TipsArgSpec.timings,
+        return_request=TipsArgSpec.return_request,
+        return_response=TipsArgSpec.return_response,
+        response_max_bytes=TipsArgSpec.response_max_bytes,
+        filters=TipsArgSpec.filterlist,
+        dest=TipsArgSpec.dest,
+        compress=TipsArgSpec.compress,
+        parse=TipsArgSpec.parse,
+        query=dict(required=False, type='list', elements='dict', default=None),
+        fields=dict(required=False, type='list', elements='str', default=None)
     )
     
     module = AnsibleModule(
         argument_spec=argspec,
+        mutually_exclusive=[('dest', 'parse'), ('dest', 'query'), ('dest', 'fields'), ('filters', 'query')],
         supports_check_mode=True
     )
 
-    tips_request = TipsApiRequest.read(
-        module.params.get('entity'),
-        module.params.get('filters')
-    )
-
-    if module.check_mode:
-        module.exit_json(
-            changed=False,
-            tips_path=tips_request.path,
-            tips_request=tips_request.tostring()
-        )
+    # The persistent connection does not share the working directory of the module.
+    if module.params.get('dest'):
+        module.params['dest'] = os.path.abspath(module.params['dest'])
 
-    tips_response = tips_request.get_response(module)
-
-    module.exit_json(
-        changed=False,
-        tips_request=tips_request.tostring(),
-        tips_response=tips_response.tostring(),
-        msg=tips_response.message
-    )
+    # The request is built and the response parsed by the persistent connection.
+    exit_result(module, Connection(module._socket_path).read(module.params, module.check_mode))
 
 
 def main():
@@ -39,6 +39,37 @@ options:
     type: list
     required: yes
     elements: str
+
+  timings:
+    description:
+      - Return the time spent building, serializing, transporting and parsing the API requests of the task in C(timings).
+    type: bool
+    required: no
+    default: no
+
+  return_request:
+    description:
+      - Return the XML request sent to the server in C(tips_request).
+    type: bool
+    required: no
+    default: yes
+
+  return_response:
+    description:
+      - How the XML response of the server is returned in C(tips_response).
+      - C(full) returns it as is, C(truncate) cuts it to I(response_max_bytes), C(compress) returns it gzip-compressed
+        and base64-encoded, and C(summary) leaves it out, only returning its size in C(tips_response_size).
+    type: str
+    required: no
+    choices: [full, truncate, compress, summary]
+    default: full
+
+  response_max_bytes:
+    description:
+      - Maximum size of C(tips_response) when I(return_response) is C(truncate).
+    type: int
+    required: no
+    default: 65536
 '''
 
 EXAMPLES = r'''
@@ -61,7 +92,7 @@ tips_path:
 
 tips_request:
   type: str
-  returned: always
+  returned: unless I(return_request) is disabled
   description:
     - XML content sent to the server
   sample: |-\n
@@ -94,6 +125,45 @@ tips_response:
         <Name>[AirGroup Authorization Service]</Name>\n
       </EntityOrderList>\n
     </TipsApiResponse>\n
+
+timings:
+  type: dict
+  returned: when I(timings) is set
+  description:
+    - Seconds spent in each phase of the API requests of the task, summed over all requests.
+    - C(build) and C(serialize) cover the request XML, C(transport) the round trip through the persistent
+      connection and the HTTP transfer, C(server) the time until the server started to answer and C(parse)
+      the response parsing. C(total) is the wall time of the module run.
+    - C(requests), C(request_bytes) and C(response_bytes) count the requests and their uncompressed body sizes.
+  sample:
+    build: 0.000412
+    serialize: 0.000088
+    transport: 0.021734
+    server: 0.184512
+    parse: 0.003921
+    total: 0.214337
+    requests: 1
+    request_bytes: 231
+    response_bytes: 5120
+
+tips_response_size:
+  type: int
+  returned: when I(return_response) is not C(full)
+  description:
+    - Size in bytes of the XML response of the server.
+
+tips_response_truncated:
+  type: bool
+  returned: when I(return_response) is C(truncate)
+  description:
+    - Whether C(tips_response) was cut to I(response_max_bytes).
+
+tips_response_encoding:
+  type: str
+  returned: when I(return_response) is C(compress)
+  description:
+    - Encoding of C(tips_response), to be decoded with C(b64decode) and gunzipped.
+  sample: gzip+base64
 '''
 
 from ansible.module_utils.basic import AnsibleModule
@@ -101,12 +171,17 @@ from ansible.module_utils.connection import Connection
 from ansible.module_utils.six.moves.urllib.error import HTTPError
 
 from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.argspec import TipsArgSpec
-from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.result import request_result, response_result
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest, timing_result
 
 
 def run_module():
     argspec = dict(
         entity=TipsArgSpec.entity,
+        timings=TipsArgSpec.timings,
+        return_request=TipsArgSpec.return_request,
+        return_response=TipsArgSpec.return_response,
+        response_max_bytes=TipsArgSpec.response_max_bytes,
         names=dict(required=True, type='list', element='str')
     )
 
@@ -124,16 +199,17 @@ def run_module():
         module.exit_json(
             changed=False,
             tips_path=tips_request.path,
-            tips_request=tips_request.tostring()
+            **request_result(module, tips_request)
         )
 
     tips_response = tips_request.get_response(module)
 
     module.exit_json(
         changed=True,
-        tips_request=tips_request.tostring(),
-        tips_response=tips_response.tostring(),
-        msg=tips_response.message
+        **request_result(module, tips_request),
+        **response_result(module, tips_response),
+        msg=tips_response.message,
+        **timing_result(module)
     )
 
 
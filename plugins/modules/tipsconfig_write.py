@@ -23,6 +23,8 @@ description:
   - Either raw xml or a Jinja2 template can be provided as arguments.
   - If a template is provided, it is rendered localy using the playbook context.
   - If both template and xml are specified, template takes precedence.
+  - Several payloads or templates can be provided at once, in which case their entity elements are merged
+    into as few requests as I(batch_records) and I(batch_bytes) allow.
 options:
 
   entity:
@@ -46,6 +48,104 @@ options:
       - The content must comply to the expected format, i.e. XML declaration and default namespace (see API docmentation).
     type: str
     required: no
+
+  templates:
+    description:
+      - List of template names to be rendered, as for I(template).
+      - The rendered payloads are sent in batches, as for I(payloads).
+      - If both templates and payloads are specified, templates take precedence.
+    type: list
+    elements: str
+    required: no
+
+  items:
+    description:
+      - List of values the I(template) is rendered for, each one being available to the template as C(item).
+      - The rendered payloads are sent in batches, as for I(payloads).
+    type: list
+    elements: raw
+    required: no
+
+  render_workers:
+    description:
+      - Number of processes rendering the I(template) for I(items) in parallel.
+      - Each process inherits the compiled template and the task variables, payloads are kept in the order of I(items).
+    type: int
+    required: no
+    default: 1
+
+  payloads:
+    description:
+      - List of raw XML documents, each in the same format as I(xml).
+      - The entity elements of all payloads are merged into batched write requests.
+      - Mutually exclusive with I(xml).
+    type: list
+    elements: str
+    required: no
+
+  batch_records:
+    description:
+      - Maximum number of entity elements sent in a single request when writing I(payloads).
+    type: int
+    required: no
+    default: 1000
+
+  batch_bytes:
+    description:
+      - Maximum serialized size of the entity elements sent in a single request when writing I(payloads).
+    type: int
+    required: no
+    default: 4194304
+
+  idempotent:
+    description:
+      - Read the current version of the elements to be written and only write those that differ.
+      - Elements are compared in a canonical form, regardless of attribute order and surrounding whitespace.
+      - Attributes returned by the server but absent from the payload are not compared.
+      - Elements are matched by name, or by MAC address for endpoints. Elements without a name are always written.
+      - The outcome is reported in C(batches) as when writing I(payloads).
+    type: bool
+    required: no
+    default: no
+
+  ignore_attributes:
+    description:
+      - Attribute names not compared when I(idempotent) is set, at any depth of the elements.
+    type: list
+    elements: str
+    required: no
+    default: []
+
+  timings:
+    description:
+      - Return the time spent building, serializing, transporting and parsing the API requests of the task in C(timings).
+    type: bool
+    required: no
+    default: no
+
+  return_request:
+    description:
+      - Return the XML request sent to the server in C(tips_request).
+    type: bool
+    required: no
+    default: yes
+
+  return_response:
+    description:
+      - How the XML response of the server is returned in C(tips_response).
+      - C(full) returns it as is, C(truncate) cuts it to I(response_max_bytes), C(compress) returns it gzip-compressed
+        and base64-encoded, and C(summary) leaves it out, only returning its size in C(tips_response_size).
+    type: str
+    required: no
+    choices: [full, truncate, compress, summary]
+    default: full
+
+  response_max_bytes:
+    description:
+      - Maximum size of C(tips_response) when I(return_response) is C(truncate).
+    type: int
+    required: no
+    default: 65536
 '''
 
 EXAMPLES = r'''
@@ -70,6 +170,28 @@ EXAMPLES = r'''
           </GuestUser>\n
       </GuestUsers>\n
       </TipsApiRequest>\n
+
+- name: Only write services that differ from the server configuration
+  tipsconfig_write:
+    entity: Service
+    template: services.xml.j2
+    idempotent: yes
+  diff: yes
+
+- name: Register one NAD client per device, rendered on all controller cores
+  tipsconfig_write:
+    entity: NadClient
+    template: nad_client.xml.j2
+    items: "{{ switches }}"
+    render_workers: 8
+
+- name: Import Endpoints rendered from one template per site, 500 records per request
+  tipsconfig_write:
+    entity: Endpoint
+    templates:
+      - endpoints_site1.xml.j2
+      - endpoints_site2.xml.j2
+    batch_records: 500
 '''
 
 RETURNS = r'''
@@ -81,7 +203,7 @@ tips_path:
 
 tips_request:
   type: str
-  returned: always
+  returned: unless I(return_request) is disabled
   description:
     - XML content sent to the server
   sample: |-\n
@@ -112,45 +234,105 @@ tips_response:
         <Message>Added 1 guest user(s)</Message>\n
       </LogMessages>\n
     </TipsApiResponse>\n
+
+batches:
+  type: list
+  elements: dict
+  returned: when I(payloads), I(templates) or I(items) is set
+  description:
+    - Outcome of each batched request, in the order they were sent.
+    - Each item holds the number of C(records) and C(bytes) sent, the C(status) of the response and its C(msg).
+  sample:
+    - records: 1000
+      bytes: 231554
+      status: Success
+      msg: Added 1000 endpoint(s)
+
+changes:
+  type: list
+  elements: dict
+  returned: when I(idempotent) is set
+  description:
+    - Elements found to differ from the server configuration, with their C(name) and the C(action) taken,
+      either C(create) or C(update).
+  sample:
+    - name: Guest Access
+      action: update
+
+timings:
+  type: dict
+  returned: when I(timings) is set
+  description:
+    - Seconds spent in each phase of the API requests of the task, summed over all requests.
+    - C(build) and C(serialize) cover the request XML, C(transport) the HTTP transfer, C(server) the time until
+      the server started to answer and C(parse) the response parsing, all of which happen in the persistent
+      connection. C(total) is the time the persistent connection spent on the task.
+    - C(requests), C(request_bytes) and C(response_bytes) count the requests and their uncompressed body sizes.
+  sample:
+    build: 0.000412
+    serialize: 0.000088
+    transport: 0.021734
+    server: 0.184512
+    parse: 0.003921
+    total: 0.214337
+    requests: 1
+    request_bytes: 231
+    response_bytes: 5120
+
+tips_response_size:
+  type: int
+  returned: when I(return_response) is not C(full)
+  description:
+    - Size in bytes of the XML response of the server.
+
+tips_response_truncated:
+  type: bool
+  returned: when I(return_response) is C(truncate)
+  description:
+    - Whether C(tips_response) was cut to I(response_max_bytes).
+
+tips_response_encoding:
+  type: str
+  returned: when I(return_response) is C(compress)
+  description:
+    - Encoding of C(tips_response), to be decoded with C(b64decode) and gunzipped.
+  sample: gzip+base64
 '''
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.connection import Connection
 
-from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.argspec import TipsArgSpec
-from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.argspec import BATCH_BYTES, BATCH_RECORDS, TipsArgSpec
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.result import exit_result
 
 
 def run_module():
     argspec = dict(
         entity=TipsArgSpec.entity,
+        timings=TipsArgSpec.timings,
+        return_request=TipsArgSpec.return_request,
+        return_response=TipsArgSpec.return_response,
+        response_max_bytes=TipsArgSpec.response_max_bytes,
         xml=dict(required=False, type='str', default=None),
         template=dict(required=False, type='str', default=None),
+        templates=dict(required=False, type='list', elements='str', default=None),
+        items=dict(required=False, type='list', elements='raw', default=None),
+        render_workers=dict(required=False, type='int', default=1),
+        payloads=dict(required=False, type='list', elements='str', default=None),
+        batch_records=dict(required=False, type='int', default=BATCH_RECORDS),
+        batch_bytes=dict(required=False, type='int', default=BATCH_BYTES),
+        idempotent=dict(required=False, type='bool', default=False),
+        ignore_attributes=dict(required=False, type='list', elements='str', default=list()),
     )
     module = AnsibleModule(
         argument_spec=argspec,
+        mutually_exclusive=[('xml', 'payloads')],
+        required_one_of=[('xml', 'payloads')],
         supports_check_mode=True
     )
-    tips_request = TipsApiRequest.write(
-        module.params.get('entity'),
-        module.params.get('xml')
-    )
 
-    if module.check_mode:
-        module.exit_json(
-            changed=False,
-            tips_path=tips_request.path,
-            tips_request=tips_request.tostring()
-        )
-
-    tips_response = tips_request.get_response(module)
-
-    module.exit_json(
-        changed=True,
-        tips_request=tips_request.tostring(),
-        tips_response=tips_response.tostring(),
-        msg=tips_response.message
-    )
+    # Payloads are checked, batched and sent by the persistent connection.
+    exit_result(module, Connection(module._socket_path).write_batch(module.params, module.check_mode, module._diff))
 
 
 def main():
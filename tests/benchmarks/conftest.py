@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+import sys
+import tracemalloc
+
+import pytest
+
+RECORDS = (1000, 10000, 100000, 1000000)
+DEFAULT_MAX_RECORDS = 10000
+DEFAULT_ENTITIES = ('Endpoint', 'GuestUser', 'Service', 'NadClient')
+# Timed rounds per record count, so that large payloads keep the run short.
+ROUNDS = {1000: 20, 10000: 10, 100000: 3, 1000000: 1}
+
+
+def _collection_path():
+    """Makes the collection importable when checked out as ansible_collections/sachaboudjema/tipsconfig."""
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    parts = root.split(os.sep)
+    if parts[-3:-2] == ['ansible_collections']:
+        path = os.sep.join(parts[:-3])
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+_collection_path()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'emulator'))
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('tipsconfig benchmarks')
+    group.addoption(
+        '--max-records', type=int, default=DEFAULT_MAX_RECORDS,
+        help=f'Largest record count to run, out of {", ".join(map(str, RECORDS))} (default {DEFAULT_MAX_RECORDS}).'
+    )
+    group.addoption(
+        '--entities', default=','.join(DEFAULT_ENTITIES),
+        help='Comma separated entity types the payloads are generated for, or "all".'
+    )
+    group.addoption(
+        '--memory-baseline', default=None,
+        help='pytest-benchmark JSON file of a previous run, e.g. saved with --benchmark-autosave, '
+             'whose peak memory figures the current ones must not exceed.'
+    )
+    group.addoption(
+        '--emulator-latency', type=float, default=0.0,
+        help='Seconds the API emulator of the httpapi benchmarks adds to every request (default 0).'
+    )
+    group.addoption(
+        '--emulator-bandwidth', type=int, default=0,
+        help='Bytes per second the API emulator sends and receives at, 0 for unlimited (default).'
+    )
+    group.addoption(
+        '--memory-tolerance', type=float, default=0.1,
+        help='Allowed relative peak memory growth over --memory-baseline (default 0.1).'
+    )
+
+
+def records_id(records):
+    if records >= 1000000:
+        return f'{records // 1000000}M'
+    return f'{records // 1000}k'
+
+
+def pytest_generate_tests(metafunc):
+    config = metafunc.config
+    if 'records' in metafunc.fixturenames:
+        records = [r for r in RECORDS if r <= config.getoption('max_records')]
+        metafunc.parametrize('records', records, ids=[records_id(r) for r in records])
+    if 'entity' in metafunc.fixturenames:
+        from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.choices import EntityChoices
+        entities = config.getoption('entities')
+        if entities == 'all':
+            entities = EntityChoices.CHOICES
+        else:
+            entities = [e.strip() for e in entities.split(',') if e.strip()]
+        metafunc.parametrize('entity', entities)
+
+
+def peak_memory(target, *args):
+    """Returns the peak memory allocated by a call, in bytes."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        target(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def load_memory_baseline(path):
+    with open(path) as f:
+        data = json.load(f)
+    return {
+        b['fullname']: b['extra_info']['peak_memory']
+        for b in data.get('benchmarks', list())
+        if 'peak_memory' in b.get('extra_info', dict())
+    }
+
+
+@pytest.fixture(scope='session')
+def memory_baseline(pytestconfig):
+    path = pytestconfig.getoption('memory_baseline')
+    return load_memory_baseline(path) if path else dict()
+
+
+@pytest.fixture
+def measure(benchmark, request, records, memory_baseline):
+    """Benchmarks target(*setup()), recording its peak memory in the benchmark extra info.
+
+    setup is called before each round and is not timed. The peak memory is
+    measured on a separate, untimed call as tracing slows allocations down.
+    """
+    def run(target, setup=tuple):
+        peak = peak_memory(target, *setup())
+        benchmark.extra_info['peak_memory'] = peak
+        benchmark.extra_info['records'] = records
+        benchmark.pedantic(target, setup=lambda: (setup(), dict()), rounds=ROUNDS[records], iterations=1)
+        baseline = memory_baseline.get(benchmark.fullname)
+        tolerance = request.config.getoption('memory_tolerance')
+        if baseline is not None and peak > baseline * (1 + tolerance):
+            pytest.fail(f'Peak memory regressed: {peak} bytes, baseline {baseline} bytes (+{tolerance:.0%} allowed)')
+    return run
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Synthetic request inputs and API responses for any entity type and record count."""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from xml.sax.saxutils import quoteattr
+
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.extractors import ENTITY_EXTRACTORS, name_attribute
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import XMLNS
+
+HEADER = '<TipsHeader exportTime="Thu Sep 30 10:47:26 IST 2010" version="6.7"/>'
+TAG_NAMES = ('Company Name', 'Location', 'Owner')
+
+
+def element_tag(entity):
+    # Some entity types, e.g. "RADIUS Dictionary", are not valid tag names.
+    return entity.replace(' ', '')
+
+
+def container_tag(entity):
+    return element_tag(entity) + 's'
+
+
+def element_name(entity, i):
+    if name_attribute(entity) == 'macAddress':
+        return ':'.join(f'{b:02x}' for b in i.to_bytes(6, 'big'))
+    return f'{element_tag(entity)} {i:07d}'
+
+
+def element(entity, i):
+    """Returns one serialized element, with the attributes, element-id and tags of a typical response."""
+    tag = element_tag(entity)
+    attrs = {
+        name_attribute(entity): element_name(entity, i),
+        'description': f'Synthetic {entity} number {i} & co',
+        'enabled': 'true' if i % 2 else 'false',
+        'updatedAt': '2019-10-01 12:00:00',
+    }
+    parts = [f'<{tag}']
+    parts.extend(f' {k}={quoteattr(v)}' for k, v in attrs.items())
+    parts.append(f'><element-id>{tag}_{i}_MTA</element-id>')
+    extractor = ENTITY_EXTRACTORS.get(entity)
+    if extractor is not None and extractor.tags is not None:
+        tags_tag = extractor.tags.rpartition('}')[2]
+        parts.extend(f'<{tags_tag} tagName="{t}" tagValue="value {i}"/>' for t in TAG_NAMES)
+    parts.append(f'</{tag}>')
+    return ''.join(parts)
+
+
+def response(entity, records):
+    """Returns a read or deleteConfirm response holding records elements, as bytes."""
+    container = container_tag(entity)
+    parts = [
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><TipsApiResponse xmlns="{XMLNS}">',
+        HEADER,
+        '<StatusCode>Success</StatusCode>',
+        f'<{container}>',
+    ]
+    parts.extend(element(entity, i) for i in range(records))
+    parts.append(f'</{container}></TipsApiResponse>')
+    return ''.join(parts).encode()
+
+
+def namelist_response(entity, records):
+    parts = [
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><TipsApiResponse xmlns="{XMLNS}">',
+        HEADER,
+        '<StatusCode>Success</StatusCode>',
+        f'<EntityNameList entity={quoteattr(entity)}>',
+    ]
+    parts.extend(f'<Name>{element_name(entity, i)}</Name>' for i in range(records))
+    parts.append('</EntityNameList></TipsApiResponse>')
+    return ''.join(parts).encode()
+
+
+def write_payload(entity, records):
+    """Returns a write request document holding records elements."""
+    container = container_tag(entity)
+    body = ''.join(element(entity, i) for i in range(records))
+    return f'<TipsApiRequest xmlns="{XMLNS}"><TipsHeader version="6.7"/><{container}>{body}</{container}></TipsApiRequest>'
+
+
+def filters(entity, records):
+    """Returns read filters, one per record, each with two criteria."""
+    field = name_attribute(entity)
+    return [
+        dict(criteria=[f'{field} equals {element_name(entity, i)}', 'description contains Synthetic'])
+        for i in range(records)
+    ]
+
+
+def identifiers(entity, records):
+    return [f'{element_tag(entity)}_{i}_MTA' for i in range(records)]
+
+
+def names(entity, records):
+    return [element_name(entity, i) for i in range(records)]
+
+
+def status_list(entity, records):
+    return [dict(name=element_name(entity, i), enabled=bool(i % 2)) for i in range(records)]
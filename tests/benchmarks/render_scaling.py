@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Measures how bulk template rendering of tipsconfig_write scales with the number of render workers.
+
+Renders a synthetic Service template once per item, as render_workers does,
+for each worker count and reports the best time out of --repeat runs, the
+throughput and the speedup and parallel efficiency against a single worker.
+Items are generated from a fixed seed, so runs on different hosts or
+revisions render the same payloads.
+
+    python tests/benchmarks/render_scaling.py --items 20000 --workers 1,2,4,8 --json scaling.json
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+
+def _collection_path():
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    parts = root.split(os.sep)
+    if parts[-3:-2] == ['ansible_collections']:
+        path = os.sep.join(parts[:-3])
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+_collection_path()
+
+import jinja2  # noqa: E402
+
+from ansible_collections.sachaboudjema.tipsconfig.plugins.action.tipsconfig_write import render_bulk  # noqa: E402
+
+SEED = 20191001
+TEMPLATE = '''<TipsApiRequest xmlns="http://www.avendasys.com/tipsapiDefs/1.0">
+  <TipsHeader version="{{ tips_version }}"/>
+  <Services>
+    <Service name="{{ item.name }}" type="RADIUS" enabled="{{ item.enabled | lower }}" description="{{ item.description }}">
+      <ServiceRules matchType="{{ item.match }}">
+        {% for rule in item.rules %}
+        <ServiceRule type="{{ rule.type }}" name="{{ rule.name }}" operator="{{ rule.operator }}" value="{{ rule.value }}"/>
+        {% endfor %}
+      </ServiceRules>
+      <AuthMethodNames>
+        {% for method in item.methods %}<AuthMethodName>{{ method }}</AuthMethodName>{% endfor %}
+      </AuthMethodNames>
+      <AuthSourceNames>
+        {% for source in item.sources %}<AuthSourceName>{{ source }}</AuthSourceName>{% endfor %}
+      </AuthSourceNames>
+      <RoleMappingPolicyName>{{ item.name }} role mapping</RoleMappingPolicyName>
+      <EnfPolicyName>{{ default_policy if item.default else item.name ~ ' enforcement' }}</EnfPolicyName>
+    </Service>
+  </Services>
+</TipsApiRequest>
+'''
+OPERATORS = ('EQUALS', 'NOT_EQUALS', 'CONTAINS', 'BEGINS_WITH', 'BELONGS_TO')
+METHODS = ('[PAP]', '[CHAP]', '[EAP PEAP]', '[EAP TLS]', '[MSCHAP]', '[EAP FAST]')
+SOURCES = ('[Local User Repository]', '[Guest User Repository]', '[Endpoints Repository]', 'AD Corp', 'LDAP Lab')
+
+
+def make_items(count, seed=SEED):
+    rng = random.Random(seed)
+    return [
+        dict(
+            name=f'Service {i:06d}',
+            enabled=bool(rng.getrandbits(1)),
+            description=f'Synthetic service {i} <bench> & co',
+            match=rng.choice(('MATCHES_ANY', 'MATCHES_ALL')),
+            rules=[
+                dict(type='Radius:IETF', name='NAS-IP-Address', operator=rng.choice(OPERATORS),
+                     value=f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}')
+                for _ in range(rng.randrange(2, 12))
+            ],
+            methods=rng.sample(METHODS, rng.randrange(1, len(METHODS))),
+            sources=rng.sample(SOURCES, rng.randrange(1, len(SOURCES))),
+            default=rng.random() < 0.2,
+        )
+        for i in range(count)
+    ]
+
+
+def make_context(variables):
+    # Task vars of a real play hold facts and inventory variables, which the
+    # render processes inherit by forking rather than receive pickled.
+    rng = random.Random(SEED)
+    context = {f'var_{i}': f'{rng.getrandbits(64):016x}' for i in range(variables)}
+    context.update(tips_version='6.7', default_policy='[Allow Access Profile]')
+    return context
+
+
+def default_workers():
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 < cpus:
+        counts.append(counts[-1] * 2)
+    if cpus > 1:
+        counts.append(cpus)
+    return counts
+
+
+def measure(template, context, items, workers, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payloads = render_bulk(template, context, items, workers)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, sum(len(p) for p in payloads)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--items', type=int, default=10000, help='Number of items rendered per run (default 10000).')
+    parser.add_argument('--workers', type=lambda v: [int(w) for w in v.split(',')], default=default_workers(),
+                        help='Comma separated worker counts (default powers of two up to the CPU count).')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per worker count, the best one is reported (default 3).')
+    parser.add_argument('--variables', type=int, default=2000, help='Number of extra task vars in the context (default 2000).')
+    parser.add_argument('--json', dest='json_path', help='Also write the results to this JSON file.')
+    args = parser.parse_args(argv)
+
+    env = jinja2.Environment(autoescape=jinja2.select_autoescape(default=True, default_for_string=True))
+    template = env.from_string(TEMPLATE)
+    context = make_context(args.variables)
+    items = make_items(args.items)
+    # Warm up the template and the allocator outside of the measures.
+    render_bulk(template, context, items[:100], 1)
+
+    affinity = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    print(f'python {platform.python_version()}, jinja2 {jinja2.__version__}, {platform.machine()}, '
+          f'{os.cpu_count()} CPUs ({affinity} usable), {args.items} items, best of {args.repeat}')
+    print(f'{"workers":>7} {"seconds":>9} {"items/s":>10} {"MB/s":>7} {"speedup":>8} {"efficiency":>10}')
+
+    results = list()
+    baseline = None
+    for workers in args.workers:
+        seconds, size = measure(template, context, items, workers, args.repeat)
+        if workers == 1 and baseline is None:
+            baseline = seconds
+        speedup = baseline / seconds if baseline else None
+        results.append(dict(
+            workers=workers, seconds=seconds, items_per_second=args.items / seconds,
+            bytes=size, speedup=speedup, efficiency=speedup / workers if speedup else None,
+        ))
+        r = results[-1]
+        print(f'{workers:>7} {seconds:>9.3f} {r["items_per_second"]:>10.0f} {size / seconds / 1e6:>7.1f} '
+              + (f'{speedup:>7.2f}x {r["efficiency"]:>10.0%}' if speedup else f'{"-":>8} {"-":>10}'))
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(dict(
+                python=platform.python_version(), jinja2=jinja2.__version__, machine=platform.machine(),
+                cpus=os.cpu_count(), usable_cpus=affinity, items=args.items, repeat=args.repeat,
+                variables=args.variables, seed=SEED, results=results,
+            ), f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""End-to-end requests through the httpapi plugin, served by the local API emulator.
+
+Peak memory includes the emulator, which runs in the same process.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import payloads
+import pytest
+
+from tipsapi_emulator import TipsApiEmulator, httpapi_plugin
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest, TipsApiResponseStream
+
+WORKERS = 4
+
+
+@pytest.fixture
+def emulator(pytestconfig):
+    with TipsApiEmulator(
+        latency=pytestconfig.getoption('emulator_latency'),
+        bandwidth=pytestconfig.getoption('emulator_bandwidth'),
+    ) as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def httpapi(emulator):
+    plugin = httpapi_plugin(
+        emulator.url, dict(persistent_command_timeout=300), retries=0, max_concurrency=WORKERS, cache_max_bytes=0
+    )
+    yield plugin
+    plugin.close_connections()
+
+
+def stream_count(body):
+    return sum(1 for _ in TipsApiResponseStream(body))
+
+
+def test_httpapi_read(measure, emulator, httpapi, entity, records):
+    emulator.store.populate(entity, records)
+    request = TipsApiRequest.read(entity)
+    body = request.tostring()
+    measure(lambda: stream_count(httpapi.send_request(request.path, data=body)))
+
+
+def test_httpapi_namelist(measure, emulator, httpapi, entity, records):
+    emulator.store.populate(entity, records)
+    request = TipsApiRequest.namelist(entity)
+    body = request.tostring()
+    measure(lambda: stream_count(httpapi.send_request(request.path, data=body)))
+
+
+def test_httpapi_write_batches(measure, httpapi, entity, records):
+    # Writes replace elements of the same name, so every round stores the same elements.
+    jobs = [
+        dict(path=r.path, data=r.tostring())
+        for r in TipsApiRequest.write_batches(entity, [payloads.write_payload(entity, records)])
+    ]
+    measure(lambda: [r['response'] for r in httpapi.send_requests(jobs, workers=WORKERS)])
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Request building: TipsApiRequest constructors and their tips_* element builders."""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import payloads
+
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest
+
+
+def test_read_filters(measure, entity, records):
+    filters = payloads.filters(entity, records)
+    measure(TipsApiRequest.read, lambda: (entity, filters))
+
+
+def test_delete(measure, entity, records):
+    identifiers = payloads.identifiers(entity, records)
+    measure(TipsApiRequest.delete, lambda: (entity, identifiers))
+
+
+def test_statuschange(measure, entity, records):
+    status_list = payloads.status_list(entity, records)
+    measure(TipsApiRequest.statuschange, lambda: (entity, status_list))
+
+
+def test_reorder(measure, entity, records):
+    names = payloads.names(entity, records)
+    measure(TipsApiRequest.reorder, lambda: (entity, names))
+
+
+def test_write_batches(measure, entity, records):
+    payload = payloads.write_payload(entity, records)
+    measure(lambda entity, payloads: list(TipsApiRequest.write_batches(entity, payloads)), lambda: (entity, [payload]))
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Response parsing: whole-document TipsApiResponse, streamed TipsApiResponseStream and extractors."""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import payloads
+
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.extractors import extract_stream
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiResponse, TipsApiResponseStream
+
+
+def stream_count(body):
+    return sum(1 for _ in TipsApiResponseStream(body))
+
+
+def test_parse_response(measure, entity, records):
+    body = payloads.response(entity, records)
+    measure(TipsApiResponse, lambda: (body,))
+
+
+def test_parse_response_stream(measure, entity, records):
+    body = payloads.response(entity, records)
+    measure(stream_count, lambda: (body,))
+
+
+def test_extract_stream(measure, entity, records):
+    body = payloads.response(entity, records)
+    measure(lambda body: extract_stream(TipsApiResponseStream(body)), lambda: (body,))
+
+
+def test_parse_namelist_stream(measure, entity, records):
+    body = payloads.namelist_response(entity, records)
+    measure(stream_count, lambda: (body,))
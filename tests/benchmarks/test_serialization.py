@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Request serialization: TipsApiXML.tostring, with and without its whitespace removal pass."""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import pytest
+
+import payloads
+
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest
+
+
+def tostring(tips_request, remove_whitespaces):
+    # Drop the serialized body a previous send may have kept, so that every call serializes.
+    tips_request.body = None
+    return tips_request.tostring(remove_whitespaces)
+
+
+@pytest.mark.parametrize('remove_whitespaces', (True, False), ids=('strip', 'raw'))
+def test_tostring_read_filters(measure, entity, records, remove_whitespaces):
+    tips_request = TipsApiRequest.read(entity, payloads.filters(entity, records))
+    measure(tostring, lambda: (tips_request, remove_whitespaces))
+
+
+@pytest.mark.parametrize('remove_whitespaces', (True, False), ids=('strip', 'raw'))
+def test_tostring_delete(measure, entity, records, remove_whitespaces):
+    tips_request = TipsApiRequest.delete(entity, payloads.identifiers(entity, records))
+    measure(tostring, lambda: (tips_request, remove_whitespaces))
+
+
+def test_tostring_statuschange(measure, entity, records):
+    tips_request = TipsApiRequest.statuschange(entity, payloads.status_list(entity, records))
+    measure(tostring, lambda: (tips_request, True))
+
+
+def test_tostring_write_batches(measure, entity, records):
+    batches = list(TipsApiRequest.write_batches(entity, [payloads.write_payload(entity, records)]))
+    measure(lambda batches: [tostring(b, True) for b in batches], lambda: (batches,))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Connection options honoured by the keep-alive transport of the httpapi plugin."""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import shutil
+import subprocess
+
+import pytest
+
+from tipsapi_emulator import TipsApiEmulator, httpapi_plugin
+from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest, TipsApiResponse
+
+SESSION_KEY = {'X-Auth-Token': 'f00d'}
+
+
+def read(httpapi):
+    tips_request = TipsApiRequest.namelist('Role')
+    return TipsApiResponse(httpapi.send_request(tips_request.path, data=tips_request.tostring()))
+
+
+def openssl(*args):
+    subprocess.run(('openssl',) + args, check=True, capture_output=True)
+
+
+@pytest.fixture(scope='module')
+def certificates(tmp_path_factory):
+    if shutil.which('openssl') is None:
+        pytest.skip('openssl is not installed')
+    path = tmp_path_factory.mktemp('pki')
+    openssl('req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=Test CA',
+            '-keyout', str(path / 'ca.key'), '-out', str(path / 'ca.pem'))
+    for name in ('server', 'client'):
+        openssl('req', '-newkey', 'rsa:2048', '-nodes', '-subj', f'/CN={name}',
+                '-keyout', str(path / f'{name}.key'), '-out', str(path / f'{name}.csr'))
+        openssl('x509', '-req', '-days', '1', '-in', str(path / f'{name}.csr'), '-CA', str(path / 'ca.pem'),
+                '-CAkey', str(path / 'ca.key'), '-CAcreateserial', '-out', str(path / f'{name}.pem'))
+    return path
+
+
+def test_basic_authentication():
+    with TipsApiEmulator(username='admin', password='secret') as emulator:
+        assert read(httpapi_plugin(emulator.url, dict(password='secret'))).statuscode == 'Success'
+        with pytest.raises(HTTPError) as exc:
+            read(httpapi_plugin(emulator.url, dict(password='wrong')))
+        assert exc.value.code == 401
+
+
+def test_session_key():
+    with TipsApiEmulator(username='admin', password='secret', session_key=SESSION_KEY) as emulator:
+        httpapi = httpapi_plugin(emulator.url, dict(password=None, session_key=SESSION_KEY))
+        assert read(httpapi).statuscode == 'Success'
+
+
+def test_client_certificate(certificates):
+    emulator = TipsApiEmulator()
+    emulator.use_ssl(str(certificates / 'server.pem'), str(certificates / 'server.key'),
+                     client_cafile=str(certificates / 'ca.pem'))
+    with emulator:
+        httpapi = httpapi_plugin(emulator.url, dict(
+            client_cert=str(certificates / 'client.pem'), client_key=str(certificates / 'client.key'),
+            ciphers=['ECDHE+AESGCM', 'ECDHE+CHACHA20'],
+        ), retries=0)
+        assert read(httpapi).statuscode == 'Success'
+        with pytest.raises(Exception):
+            read(httpapi_plugin(emulator.url, retries=0))
+
+
+def test_proxied(monkeypatch):
+    httpapi = httpapi_plugin('http://127.0.0.1:8080', dict(use_proxy=True))
+    monkeypatch.delenv('no_proxy', raising=False)
+    monkeypatch.delenv('NO_PROXY', raising=False)
+    monkeypatch.setenv('http_proxy', 'http://proxy.example.com:3128')
+    assert httpapi.proxied()
+    httpapi.connection.options['use_proxy'] = False
+    assert not httpapi.proxied()
+    httpapi.connection.options['use_proxy'] = True
+    monkeypatch.setenv('no_proxy', '127.0.0.1')
+    assert not httpapi.proxied()
+
+
+def test_proxied_requests_use_stock_transport(monkeypatch):
+    sent = list()
+
+    def send(path, data, **kwargs):
+        sent.append(path)
+        raise RuntimeError('sent through the stock transport')
+
+    monkeypatch.setenv('http_proxy', 'http://proxy.example.com:3128')
+    monkeypatch.delenv('no_proxy', raising=False)
+    monkeypatch.delenv('NO_PROXY', raising=False)
+    httpapi = httpapi_plugin('http://127.0.0.1:8080', dict(use_proxy=True))
+    httpapi.connection.send = send
+    with pytest.raises(RuntimeError):
+        read(httpapi)
+    assert sent == ['/tipsapi/config/namelist/Role']
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Incremental snapshots of tipsconfig_export, run in process against the emulator."""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+
+import pytest
+
+from tipsapi_emulator import TipsApiEmulator, httpapi_plugin
+from ansible.module_utils import basic, connection
+from ansible.module_utils._text import to_bytes
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.snapshot import load_index, read_names
+from ansible_collections.sachaboudjema.tipsconfig.plugins.modules import tipsconfig_export
+
+
+@pytest.fixture
+def emulator():
+    with TipsApiEmulator() as emulator:
+        emulator.store.populate('Role', 5)
+        yield emulator
+
+
+@pytest.fixture
+def export(emulator, monkeypatch, capsys):
+    httpapi = httpapi_plugin(emulator.url)
+    monkeypatch.setattr(tipsconfig_export, 'Connection', lambda socket_path: httpapi)
+    monkeypatch.setattr(connection, 'Connection', lambda socket_path: httpapi)
+
+    def export(**args):
+        args.update(_ansible_socket='/nonexistent', _ansible_remote_tmp='/tmp', _ansible_keep_remote_files=False)
+        monkeypatch.setattr(basic, '_ANSIBLE_ARGS', to_bytes(json.dumps(dict(ANSIBLE_MODULE_ARGS=args))))
+        with pytest.raises(SystemExit):
+            tipsconfig_export.main()
+        return json.loads(capsys.readouterr().out)
+
+    export.httpapi = httpapi
+    return export
+
+
+def test_incremental(emulator, export, tmp_path):
+    args = dict(entities=['Role'], dest=str(tmp_path), incremental=True, batch_names=2)
+    assert export(**args)['entities'][0]['mode'] == 'full'
+
+    emulator.store.populate('Role', 5)
+    with emulator.store.lock:
+        del emulator.store.records('Role')['Role 0000000']
+    reads = emulator.stats['read']
+    result = export(**args)['entities'][0]
+    assert (result['mode'], result['added'], result['removed'], result['records']) == ('incremental', 5, 1, 9)
+    # Batches of the 5 added names.
+    assert emulator.stats['read'] - reads == 3
+    assert read_names(str(tmp_path / 'Role.xml')) == [f'Role {i:07d}' for i in range(1, 10)]
+    assert load_index(str(tmp_path))['Role']['names'] == [f'Role {i:07d}' for i in range(1, 10)]
+    assert sorted(os.listdir(tmp_path)) == ['Role.xml', 'changeset.json', 'index.json']
+
+
+def test_incremental_indexes_names_read_only(emulator, export, tmp_path):
+    args = dict(entities=['Role'], dest=str(tmp_path), incremental=True)
+    export(**args)
+
+    emulator.store.populate('Role', 2)
+    export_responses = export.httpapi.export_responses
+
+    def delete_then_export(jobs, workers=1):
+        # The element is deleted between the namelist and the read.
+        with emulator.store.lock:
+            del emulator.store.records('Role')['Role 0000006']
+        return export_responses(jobs, workers)
+
+    export.httpapi.export_responses = delete_then_export
+    result = export(**args)
+    assert result['changeset']['Role']['added'] == ['Role 0000005']
+    assert load_index(str(tmp_path))['Role']['names'] == read_names(str(tmp_path / 'Role.xml'))
+
+    emulator.store.populate('Role', 1)
+    export.httpapi.export_responses = export_responses
+    assert export(**args)['changeset']['Role']['added'] == ['Role 0000006']
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Module tasks run by the httpapi plugin fail with a message on invalid input, rather than raise."""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import pytest
+
+from xml.etree import ElementTree
+
+from tipsapi_emulator import TipsApiEmulator, httpapi_plugin
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.canonical import Fingerprinter
+
+
+@pytest.fixture(scope='module')
+def httpapi():
+    with TipsApiEmulator() as emulator:
+        emulator.store.populate('Role', 3)
+        yield httpapi_plugin(emulator.url)
+
+
+def test_read_dest_in_missing_directory(httpapi, tmp_path):
+    result = httpapi.read(dict(entity='Role', dest=str(tmp_path / 'missing' / 'Role.xml')))
+    assert result['failed'] and 'does not exist' in result['msg']
+
+
+def test_read_dest_unwritable(httpapi, tmp_path):
+    result = httpapi.read(dict(entity='Role', filters=list(), dest=str(tmp_path)))
+    assert result['failed'] and result['msg'].startswith('Cannot write dest')
+
+
+@pytest.mark.parametrize('condition', [
+    dict(field='name', op='regex', value=1),
+    dict(field='name', op='regex', value='('),
+    dict(field='name', op='in', value=1),
+    dict(field=1, op='exists'),
+])
+def test_read_invalid_query(httpapi, condition):
+    result = httpapi.read(dict(entity='Role', query=[condition]))
+    assert result['failed'] and 'field' in result['msg']
+
+
+def test_delete_invalid_missing_pattern(httpapi):
+    result = httpapi.delete_batch(dict(entity='Role', identifiers=['1'], chunk_size=1, missing_pattern='('))
+    assert result['failed'] and result['msg'].startswith('Invalid missing_pattern')
+
+
+def test_write_malformed_payload(httpapi):
+    payloads = [
+        '<TipsApiRequest xmlns="http://www.avendasys.com/tipsapiDefs/1.0"><Roles><Role name="r"/></Roles></TipsApiRequest>',
+        '<TipsApiRequest><Roles>',
+    ]
+    result = httpapi.write_batch(dict(entity='Role', payloads=payloads, batch_records=10, batch_bytes=None))
+    assert result['failed'] and result['msg'].startswith('Invalid XML payload 1:')
+
+
+
+def test_write_idempotent_ignores_attributes(httpapi):
+    def payload(description):
+        return (
+            '<TipsApiRequest xmlns="http://www.avendasys.com/tipsapiDefs/1.0"><Roles>'
+            f'<Role name="Idempotent" description="{description}"/></Roles></TipsApiRequest>'
+        )
+
+    params = dict(entity='Role', batch_records=10, batch_bytes=None, idempotent=True, ignore_attributes=list())
+    assert httpapi.write_batch(dict(params, payloads=[payload('a')]))['changes'] == [
+        dict(name='Idempotent', action='create')
+    ]
+    result = httpapi.write_batch(dict(params, payloads=[payload('b')], ignore_attributes=['description']))
+    assert result['changes'] == [] and not result['changed']
+    result = httpapi.write_batch(dict(params, payloads=[payload('b')]))
+    assert result['changes'] == [dict(name='Idempotent', action='update')]
+
+
+def test_ignored_attributes_keyed_by_entity_type():
+    fingerprinter = Fingerprinter({'RADIUS Dictionary': ['vendor']})
+    el = ElementTree.fromstring(
+        '<RADIUSDictionary xmlns="http://www.avendasys.com/tipsapiDefs/1.0" name="Dictionary" vendor="Aruba"/>'
+    )
+    assert fingerprinter.canonicalize(el) == '<RADIUSDictionary name="Dictionary"></RADIUSDictionary>'
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_read_dest_unchanged(httpapi, tmp_path, compress):
+    params = dict(entity='Role', filters=list(), dest=str(tmp_path / 'Role.xml'), compress=compress)
+    (tmp_path / 'Role.xml').write_text('<TipsApiResponse/>')
+    first = httpapi.read(params)
+    assert first['changed']
+    mtime = (tmp_path / 'Role.xml').stat().st_mtime_ns
+    second = httpapi.read(params)
+    assert not second['changed'] and second['digest'] == first['digest']
+    assert (tmp_path / 'Role.xml').stat().st_mtime_ns == mtime
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['Role.xml']
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Retries of the httpapi plugin on the faults injected by the emulator.
+
+Modifying requests must never be sent again once the server may have
+applied them, while reads are retried on any failure.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import socket
+import time
+
+import pytest
+
+from tipsapi_emulator import TipsApiEmulator, httpapi_plugin
+from ansible.errors import AnsibleConnectionFailure
+from ansible.module_utils.six.moves.urllib.error import HTTPError
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import TipsApiRequest
+
+RETRIES = 2
+WRITE = (
+    '<TipsApiRequest xmlns="http://www.avendasys.com/tipsapiDefs/1.0"><TipsHeader version="6.7"/>'
+    '<Roles><Role name="r"/></Roles></TipsApiRequest>'
+)
+
+
+def plugin(url, **options):
+    return httpapi_plugin(url, dict(persistent_command_timeout=10), retries=RETRIES, retry_backoff=0.01, **options)
+
+
+def requests():
+    return dict(
+        read=TipsApiRequest.read('Role'),
+        write=TipsApiRequest.write('Role', WRITE),
+        delete=TipsApiRequest.delete('Role', ['Role_1']),
+        status=TipsApiRequest.statuschange('Role', [dict(name='Role 0000000', enabled=False)]),
+        reorder=TipsApiRequest.reorder('Role', ['Role 0000000']),
+    )
+
+
+def send(httpapi, method):
+    tips_request = requests()[method]
+    return httpapi.send_request(tips_request.path, data=tips_request.tostring())
+
+
+@pytest.mark.parametrize('method', ['write', 'delete', 'status', 'reorder'])
+@pytest.mark.parametrize('status', [500, 502, 504])
+def test_modifying_not_retried_on_server_error(method, status):
+    with TipsApiEmulator(http_error_rate=1.0, http_error_statuses=[status]) as emulator:
+        with pytest.raises(HTTPError):
+            send(plugin(emulator.url), method)
+        assert emulator.stats[method] == 1
+
+
+@pytest.mark.parametrize('method', ['write', 'delete'])
+@pytest.mark.parametrize('status', [429, 503])
+def test_modifying_retried_on_overload(method, status):
+    with TipsApiEmulator(http_error_rate=1.0, http_error_statuses=[status]) as emulator:
+        with pytest.raises(HTTPError):
+            send(plugin(emulator.url), method)
+        assert emulator.stats[method] == RETRIES + 1
+
+
+@pytest.mark.parametrize('status', [500, 502, 503, 504])
+def test_read_retried_on_server_error(status):
+    with TipsApiEmulator(http_error_rate=1.0, http_error_statuses=[status]) as emulator:
+        with pytest.raises(HTTPError):
+            send(plugin(emulator.url), 'read')
+        assert emulator.stats['read'] == RETRIES + 1
+
+
+@pytest.mark.parametrize('method', ['write', 'delete', 'status', 'reorder'])
+def test_modifying_not_replayed_after_dropped_connection(method):
+    # The request is applied and the connection closed without response, as by a reset.
+    with TipsApiEmulator(timeout_rate=1.0, timeout_delay=0) as emulator:
+        emulator.store.populate('Role', 1)
+        with pytest.raises(AnsibleConnectionFailure):
+            send(plugin(emulator.url), method)
+        assert emulator.stats[method] == 1
+
+
+@pytest.mark.parametrize('method', ['write', 'delete'])
+def test_modifying_not_replayed_after_timeout(method):
+    with TipsApiEmulator(timeout_rate=1.0, timeout_delay=2) as emulator:
+        with pytest.raises(AnsibleConnectionFailure):
+            send(plugin(emulator.url, request_timeout=0.5), method)
+        assert emulator.stats[method] == 1
+
+
+def test_read_retried_after_dropped_connection():
+    with TipsApiEmulator(timeout_rate=1.0, timeout_delay=0) as emulator:
+        with pytest.raises(AnsibleConnectionFailure):
+            send(plugin(emulator.url), 'read')
+        assert emulator.stats['read'] == RETRIES + 1
+
+
+def test_read_retried_after_timeout():
+    with TipsApiEmulator(timeout_rate=1.0, timeout_delay=1) as emulator:
+        with pytest.raises(AnsibleConnectionFailure):
+            send(plugin(emulator.url, request_timeout=0.2), 'read')
+        assert emulator.stats['read'] == RETRIES + 1
+
+
+@pytest.mark.parametrize('method', ['read', 'write', 'delete'])
+def test_retried_when_connection_refused(method):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    httpapi = plugin(f'http://127.0.0.1:{port}')
+    with pytest.raises(AnsibleConnectionFailure):
+        send(httpapi, method)
+    assert httpapi._local.retries == RETRIES
+
+
+def test_modifying_sent_on_fresh_connection_once_idle_one_is_closed():
+    with TipsApiEmulator(idle_timeout=0.2) as emulator:
+        emulator.store.populate('Role', 1)
+        httpapi = plugin(emulator.url)
+        send(httpapi, 'read')
+        time.sleep(0.5)
+        send(httpapi, 'status')
+        assert emulator.stats['status'] == 1
+
+
+def test_retries_stop_at_command_timeout():
+    with TipsApiEmulator(http_error_rate=1.0, http_error_statuses=[503]) as emulator:
+        httpapi = httpapi_plugin(
+            emulator.url, dict(persistent_command_timeout=1), retries=10, retry_backoff=0.4, retry_max_backoff=0.4
+        )
+        start = time.monotonic()
+        with pytest.raises(HTTPError):
+            send(httpapi, 'read')
+        assert time.monotonic() - start < 1
+        assert emulator.stats['read'] < 11
@@ -0,0 +1,657 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright: (c) 2019, Sacha Boudjema <sachaboudjema@gmail.com>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Local stand-in for the ClearPass XML configuration API.
+
+Serves /tipsapi/config/{read,write,delete,deleteConfirm,namelist,reorder,status}/<entity>
+over an in-memory store, with configurable latency, bandwidth, request size
+limit and injected faults: TipsApiError responses, HTTP 5xx errors and
+timeouts. Responses follow the documents of the API guide closely enough for
+the httpapi plugin and the modules of the collection to run unchanged.
+
+    python tests/emulator/tipsapi_emulator.py --port 8080 --populate Service=500 --latency 0.05
+
+The emulator is also usable in process, e.g. from a pytest fixture:
+
+    with TipsApiEmulator(latency=0.01) as emulator:
+        emulator.store.populate('GuestUser', 1000)
+        ... requests to emulator.url ...
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import argparse
+import base64
+import gzip
+import os
+import random
+import ssl
+import sys
+import threading
+import time
+
+from collections import Counter, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+from xml.etree import ElementTree
+from xml.etree.ElementTree import Element, SubElement
+
+
+def _collection_path():
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    parts = root.split(os.sep)
+    if parts[-3:-2] == ['ansible_collections']:
+        path = os.sep.join(parts[:-3])
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+_collection_path()
+
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.choices import EntityChoices  # noqa: E402
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.extractors import name_attribute  # noqa: E402
+from ansible_collections.sachaboudjema.tipsconfig.plugins.module_utils.tipsapi import (  # noqa: E402
+    RESPONSE_META_TAGS, ROOT_PATH, VERSION, qualify
+)
+
+METHODS = ('read', 'write', 'delete', 'deleteConfirm', 'namelist', 'reorder', 'status')
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+CHUNK_SIZE = 16 * 1024
+# Default options of the httpapi plugin, as documented.
+PLUGIN_OPTIONS = dict(
+    keepalive=True, compression=True, compress_request=False, request_timeout=0,
+    retries=3, retry_backoff=1.0, retry_max_backoff=30.0, retry_statuses=[429, 500, 502, 503, 504],
+    max_concurrency=4, rate_limit=0, rate_burst=5, cache_ttl=0, cache_max_bytes=64 * 1024 * 1024,
+    index=False, index_path=None, index_ttl=3600,
+)
+# Entity types by element tag, some entity names not being valid tag names.
+ENTITY_TAGS = {entity.replace(' ', ''): entity for entity in EntityChoices.CHOICES}
+HEADER_TAG = qualify('TipsHeader')
+# Children of request and response documents which are not entity containers.
+NON_CONTAINER_TAGS = RESPONSE_META_TAGS | {qualify(tag) for tag in ('StatusCode', 'EntityNameList', 'Filter')}
+ELEMENT_ID_TAG = qualify('element-id')
+OPERATORS = {
+    'equals': lambda value, string: value == string,
+    'notequals': lambda value, string: value != string,
+    'contains': lambda value, string: string in value,
+    'icontains': lambda value, string: string.lower() in value.lower(),
+    'belongsto': lambda value, string: value in string.split(','),
+}
+
+
+def localname(tag):
+    return tag.rpartition('}')[2]
+
+
+def entity_of(tag):
+    return ENTITY_TAGS.get(localname(tag), localname(tag))
+
+
+def element_tag(entity):
+    return qualify(entity.replace(' ', ''))
+
+
+def container_tag(entity):
+    return qualify(entity.replace(' ', '') + 's')
+
+
+class EmulatorError(Exception):
+    """Rejects a request with a TipsApiError response."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class Settings:
+    """Emulated network conditions and faults.
+
+    latency and jitter are in seconds, bandwidth in bytes per second and
+    max_request_bytes in bytes, 0 disabling them. The rates are the
+    probabilities for a request to fail with a TipsApiError, an HTTP error
+    among http_error_statuses, or a timeout, restricted to fault_methods.
+    A timed out request is applied, then its connection is dropped without
+    response after timeout_delay seconds, as when the client gives up on a
+    slow server. Connections idle for idle_timeout seconds are closed.
+    With username set, requests need its basic authentication, or the
+    headers of session_key, as sent by hosts with ansible_httpapi_session_key.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, bandwidth=0, max_request_bytes=0,
+                 tips_error_rate=0.0, tips_error_code='InternalError', tips_error_message='Injected failure',
+                 http_error_rate=0.0, http_error_statuses=(500, 502, 503), retry_after=None,
+                 timeout_rate=0.0, timeout_delay=5.0, fault_methods=METHODS,
+                 compression=True, idle_timeout=None, username=None, password=None, session_key=None, seed=None, verbose=False):
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.max_request_bytes = max_request_bytes
+        self.tips_error_rate = tips_error_rate
+        self.tips_error_code = tips_error_code
+        self.tips_error_message = tips_error_message
+        self.http_error_rate = http_error_rate
+        self.http_error_statuses = tuple(http_error_statuses)
+        self.retry_after = retry_after
+        self.timeout_rate = timeout_rate
+        self.timeout_delay = timeout_delay
+        self.fault_methods = frozenset(fault_methods)
+        self.compression = compression
+        self.idle_timeout = idle_timeout
+        self.username = username
+        self.password = password
+        self.session_key = session_key
+        self.seed = seed
+        self.verbose = verbose
+
+
+class Store:
+    """In-memory configuration, keeping elements in insertion order per entity type."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        # entity -> name -> (container tag, element, element-id)
+        self.entities = dict()
+        self.ids = dict()
+        self.serial = 0
+
+    def records(self, entity):
+        return self.entities.setdefault(entity, OrderedDict())
+
+    def count(self, entity=None):
+        with self.lock:
+            if entity is not None:
+                return len(self.entities.get(entity, ()))
+            return sum(len(records) for records in self.entities.values())
+
+    def put(self, container, el):
+        entity = entity_of(el.tag)
+        field = name_attribute(entity)
+        name = el.get(field)
+        if name is None:
+            raise EmulatorError('InvalidInput', f'{entity} element without {field} attribute')
+        for child in el.findall(ELEMENT_ID_TAG):
+            el.remove(child)
+        records = self.records(entity)
+        current = records.get(name)
+        if current is None:
+            self.serial += 1
+            element_id = f'{localname(el.tag)}_{self.serial}'
+            self.ids[element_id] = (entity, name)
+        else:
+            element_id = current[2]
+        records[name] = (container, el, element_id)
+        return current is None
+
+    def load(self, document):
+        """Stores the entity elements of a write request or read response document."""
+        with self.lock:
+            count = 0
+            for container in ElementTree.fromstring(document):
+                if container.tag in NON_CONTAINER_TAGS:
+                    continue
+                for el in container:
+                    self.put(container.tag, el)
+                    count += 1
+            return count
+
+    def populate(self, entity, count):
+        """Adds count synthetic elements of an entity type."""
+        field = name_attribute(entity)
+        with self.lock:
+            start = len(self.records(entity))
+            for i in range(start, start + count):
+                if field == 'macAddress':
+                    name = ':'.join(f'{b:02x}' for b in i.to_bytes(6, 'big'))
+                else:
+                    name = f'{entity} {i:07d}'
+                el = Element(element_tag(entity), {
+                    field: name, 'description': f'Emulated {entity} number {i}', 'enabled': 'true'
+                })
+                self.put(container_tag(entity), el)
+
+    def select(self, filtr, default_entity):
+        entity = filtr.get('entity', default_entity)
+        criteria = filtr.find(qualify('Criteria'))
+        tests = list()
+        if criteria is not None:
+            tests.append((criteria.get('fieldName'), criteria.get('match'), criteria.get('filterString')))
+            tests.extend(
+                (more.get('fieldName'), more.get('match'), more.get('fieldValue'))
+                for more in criteria.findall(qualify('MoreFilterConditions'))
+            )
+        for field, match, _ in tests:
+            if match not in OPERATORS:
+                raise EmulatorError('InvalidFilter', f'Unsupported match "{match}" on {field}')
+        return [
+            record for record in self.records(entity).values()
+            if all(OPERATORS[match](record[1].get(field) or '', string or '') for field, match, string in tests)
+        ]
+
+    def filtered(self, request, default_entity):
+        selected = OrderedDict()
+        for filtr in request.findall(qualify('Filter')):
+            for record in self.select(filtr, default_entity):
+                selected[record[2]] = record
+        return list(selected.values())
+
+    def read(self, request, entity, response):
+        with self.lock:
+            records = self.filtered(request, entity)
+            SubElement(response, qualify('EntityMaxRecordCount')).text = str(len(records))
+            append_grouped(response, ((c, el) for c, el, _ in records))
+
+    def delete_confirm(self, request, entity, response):
+        with self.lock:
+            records = self.filtered(request, entity)
+            SubElement(response, qualify('EntityMaxRecordCount')).text = str(len(records))
+            confirmed = list()
+            for container, el, element_id in records:
+                summary = Element(el.tag, el.attrib)
+                SubElement(summary, ELEMENT_ID_TAG).text = element_id
+                confirmed.append((container, summary))
+            append_grouped(response, confirmed)
+
+    def write(self, request, entity, response):
+        with self.lock:
+            added = updated = 0
+            for container in request:
+                if container.tag == HEADER_TAG:
+                    continue
+                for el in container:
+                    if self.put(container.tag, el):
+                        added += 1
+                    else:
+                        updated += 1
+        log_messages(response, f'Added {added} and updated {updated} {entity} element(s)')
+
+    def delete(self, request, entity, response):
+        identifiers = [el.text for el in request.iter(qualify('Element-Id'))]
+        with self.lock:
+            # Rejected as a whole when any identifier is unknown, nothing being deleted.
+            for element_id in identifiers:
+                if element_id not in self.ids:
+                    raise EmulatorError('InvalidInput', f'Element not found: {element_id}')
+            for element_id in dict.fromkeys(identifiers):
+                owner, name = self.ids.pop(element_id)
+                del self.entities[owner][name]
+        log_messages(response, f'Deleted {len(identifiers)} {entity} element(s) successfully')
+
+    def namelist(self, request, entity, response):
+        with self.lock:
+            for namelist in request.findall(qualify('EntityNameList')):
+                listed = namelist.get('entity', entity)
+                el = SubElement(response, qualify('EntityNameList'), {'entity': listed})
+                for name in self.records(listed):
+                    SubElement(el, qualify('Name')).text = name
+
+    def reorder(self, request, entity, response):
+        order = request.find(qualify('EntityOrderList'))
+        if order is None:
+            raise EmulatorError('InvalidInput', 'Missing EntityOrderList')
+        names = [el.text for el in order]
+        with self.lock:
+            records = self.records(order.get('entity', entity))
+            for name in names:
+                if name not in records:
+                    raise EmulatorError('InvalidInput', f'Element not found: {name}')
+            # The listed elements come first, in the requested order.
+            for name in reversed(names):
+                records.move_to_end(name, last=False)
+        log_messages(response, f'{entity} elements have been reordered successfully')
+        response.append(order)
+
+    def status(self, request, entity, response):
+        statuses = request.find(qualify('EntityStatusList'))
+        if statuses is None:
+            raise EmulatorError('InvalidInput', 'Missing EntityStatusList')
+        with self.lock:
+            records = self.records(statuses.get('entity', entity))
+            for el in statuses:
+                if el.text not in records:
+                    raise EmulatorError('InvalidInput', f'Element not found: {el.text}')
+            for el in statuses:
+                container, current, element_id = records[el.text]
+                # Replaced rather than changed in place, responses being serialized outside of the lock.
+                changed = Element(current.tag, current.attrib)
+                changed.extend(current)
+                changed.set('enabled', 'true' if localname(el.tag) == 'Enabled' else 'false')
+                records[el.text] = (container, changed, element_id)
+        log_messages(response, 'Status successfully changed')
+        response.append(statuses)
+
+
+def append_grouped(response, elements):
+    """Appends (container tag, element) pairs, consecutive ones of the same container sharing it."""
+    container = None
+    for tag, el in elements:
+        if container is None or container.tag != tag:
+            container = SubElement(response, tag)
+        container.append(el)
+
+
+def log_messages(response, *messages):
+    el = SubElement(response, qualify('LogMessages'))
+    for message in messages:
+        SubElement(el, qualify('Message')).text = message
+
+
+def new_response(status='Success'):
+    root = Element(qualify('TipsApiResponse'))
+    SubElement(root, HEADER_TAG, {'exportTime': time.strftime('%a %b %d %H:%M:%S %Z %Y'), 'version': VERSION})
+    SubElement(root, qualify('StatusCode')).text = status
+    return root
+
+
+def error_response(code, message):
+    root = new_response('Failure')
+    error = SubElement(root, qualify('TipsApiError'))
+    SubElement(error, qualify('ErrorCode')).text = code
+    SubElement(error, qualify('Message')).text = message
+    return root
+
+
+def tostring(root):
+    return (XML_DECLARATION + ElementTree.tostring(root, encoding='unicode')).encode()
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'TipsApiEmulator/1.0'
+    # Headers and body are written separately, which delayed acks would hold back.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # Read by StreamRequestHandler, a handler timing out closes its connection.
+        self.timeout = self.server.settings.idle_timeout
+        super().setup()
+
+    def log_message(self, format, *args):
+        if self.server.settings.verbose:
+            super().log_message(format, *args)
+
+    def do_POST(self):
+        server = self.server
+        settings = server.settings
+        method, _, entity = self.path[len(ROOT_PATH) + 1:].partition('/')
+        entity = unquote(entity.partition('?')[0])
+        if not self.path.startswith(ROOT_PATH + '/') or method not in METHODS or not entity:
+            return self.send_status(404, 'Not Found')
+        if not self.authorized():
+            return self.send_status(401, 'Unauthorized', {'WWW-Authenticate': 'Basic realm="tipsapi"'})
+
+        length = int(self.headers.get('Content-Length', 0))
+        if settings.max_request_bytes and length > settings.max_request_bytes:
+            # The body is left unread, so the connection cannot be reused.
+            self.close_connection = True
+            return self.send_status(413, 'Request Entity Too Large')
+        body = self.read_body(length)
+        if self.headers.get('Content-Encoding', '').strip().lower() == 'gzip':
+            body = gzip.decompress(body)
+
+        if settings.latency or settings.jitter:
+            time.sleep(settings.latency + server.random() * settings.jitter)
+        fault = server.pick_fault(method)
+        server.count(method, fault)
+        if fault == 'http':
+            headers = {'Retry-After': str(settings.retry_after)} if settings.retry_after is not None else dict()
+            return self.send_status(server.choice(settings.http_error_statuses), 'Injected error', headers)
+        if fault == 'tips':
+            response = tostring(error_response(settings.tips_error_code, settings.tips_error_message))
+        else:
+            response = server.dispatch(method, entity, body)
+        if fault == 'timeout':
+            time.sleep(settings.timeout_delay)
+            self.close_connection = True
+            return
+        self.send_body(200, response, 'application/xml')
+
+    def authorized(self):
+        settings = self.server.settings
+        if settings.username is None:
+            return True
+        if settings.session_key and all(self.headers.get(k) == v for k, v in settings.session_key.items()):
+            return True
+        expected = base64.b64encode(f'{settings.username}:{settings.password or ""}'.encode()).decode()
+        return self.headers.get('Authorization', '') == f'Basic {expected}'
+
+    def read_body(self, length):
+        chunks = list()
+        while length > 0:
+            chunk = self.rfile.read(min(length, CHUNK_SIZE))
+            if not chunk:
+                break
+            length -= len(chunk)
+            chunks.append(chunk)
+            self.throttle(len(chunk))
+        return b''.join(chunks)
+
+    def throttle(self, size):
+        if self.server.settings.bandwidth:
+            time.sleep(size / self.server.settings.bandwidth)
+
+    def send_status(self, status, message, headers=dict()):
+        self.send_body(status, message.encode(), 'text/plain', headers)
+
+    def send_body(self, status, body, content_type, headers=dict()):
+        accepted = self.headers.get('Accept-Encoding', '')
+        compress = self.server.settings.compression and 'gzip' in accepted and len(body) > 1024
+        if compress:
+            body = gzip.compress(body, compresslevel=1)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        for i in range(0, len(body), CHUNK_SIZE):
+            self.wfile.write(body[i:i + CHUNK_SIZE])
+            self.throttle(min(CHUNK_SIZE, len(body) - i))
+
+
+class TipsApiEmulator(ThreadingHTTPServer):
+    """HTTP server emulating the API, with the Settings given as keyword arguments."""
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), store=None, **settings):
+        super().__init__(address, RequestHandler)
+        self.store = store if store is not None else Store()
+        self.settings = Settings(**settings)
+        self.stats = Counter()
+        self._rng = random.Random(self.settings.seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        scheme = 'https' if isinstance(self.socket, ssl.SSLSocket) else 'http'
+        return f'{scheme}://{host}:{port}'
+
+    def random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def choice(self, values):
+        with self._lock:
+            return self._rng.choice(values)
+
+    def pick_fault(self, method):
+        settings = self.settings
+        if method not in settings.fault_methods:
+            return None
+        draw = self.random()
+        for fault, rate in (('tips', settings.tips_error_rate), ('http', settings.http_error_rate),
+                            ('timeout', settings.timeout_rate)):
+            if draw < rate:
+                return fault
+            draw -= rate
+        return None
+
+    def count(self, method, fault):
+        with self._lock:
+            self.stats[method] += 1
+            if fault is not None:
+                self.stats[f'{fault}_faults'] += 1
+
+    def dispatch(self, method, entity, body):
+        handler = {
+            'read': self.store.read,
+            'write': self.store.write,
+            'delete': self.store.delete,
+            'deleteConfirm': self.store.delete_confirm,
+            'namelist': self.store.namelist,
+            'reorder': self.store.reorder,
+            'status': self.store.status,
+        }[method]
+        try:
+            request = ElementTree.fromstring(body)
+            response = new_response()
+            handler(request, entity, response)
+        except ElementTree.ParseError as exc:
+            response = error_response('InvalidXML', f'Invalid request: {exc}')
+        except EmulatorError as exc:
+            response = error_response(exc.code, exc.message)
+        return tostring(response)
+
+    def use_ssl(self, certfile, keyfile=None, client_cafile=None):
+        """Serves HTTPS, requiring client certificates signed by client_cafile when given."""
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        if client_cafile:
+            context.load_verify_locations(client_cafile)
+            context.verify_mode = ssl.CERT_REQUIRED
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='tipsapi-emulator', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class PluginConnection:
+    """Stands in for the httpapi connection of a host pointing at the emulator.
+
+    Lets the httpapi plugin run in process, e.g. in benchmarks and tests.
+    """
+
+    _auth = None
+    connected = False
+
+    def __init__(self, url, **options):
+        parts = urlsplit(url)
+        self._url = url
+        self.options = dict(
+            host=parts.hostname, port=parts.port, use_ssl=parts.scheme == 'https', validate_certs=False,
+            use_proxy=False, persistent_command_timeout=30, remote_user='admin', password='admin',
+        )
+        self.options.update(options)
+
+    def get_option(self, option):
+        return self.options.get(option)
+
+    def _connect(self):
+        # As the httpapi connection: session_key, or login() of the plugin, whose
+        # default is a no-op leaving requests to basic authentication.
+        self.connected = True
+        if self.get_option('session_key'):
+            self._auth = self.get_option('session_key')
+
+
+def httpapi_plugin(url, connection_options=dict(), **options):
+    """Returns the httpapi plugin of a connection to url, with the given plugin options."""
+    from ansible_collections.sachaboudjema.tipsconfig.plugins.httpapi.tipsconfig import HttpApi
+    plugin = HttpApi(PluginConnection(url, **connection_options))
+    plugin.get_option = dict(PLUGIN_OPTIONS, **options).get
+    return plugin
+
+
+def populate_spec(value):
+    entity, _, count = value.rpartition('=')
+    if not entity or not count.isdigit():
+        raise argparse.ArgumentTypeError(f'expected ENTITY=COUNT, got "{value}"')
+    return entity, int(count)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--certfile', help='Serve HTTPS with this certificate chain.')
+    parser.add_argument('--keyfile', help='Private key of --certfile, when not included in it.')
+    parser.add_argument('--client-cafile', help='Require client certificates signed by these CAs.')
+    parser.add_argument('--username', help='Require basic authentication with this user.')
+    parser.add_argument('--password')
+    parser.add_argument('--session-key', type=lambda v: dict([v.split('=', 1)]), metavar='HEADER=VALUE',
+                        help='Also accept requests carrying this header instead of basic authentication.')
+    parser.add_argument('--load', action='append', default=list(), metavar='FILE',
+                        help='Store the elements of a write request or read response document. Repeatable.')
+    parser.add_argument('--populate', action='append', default=list(), type=populate_spec, metavar='ENTITY=COUNT',
+                        help='Store COUNT synthetic elements of ENTITY. Repeatable.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Upper bound of random seconds added on top of --latency.')
+    parser.add_argument('--bandwidth', type=int, default=0, help='Bytes per second each request and response is sent at.')
+    parser.add_argument('--max-request-bytes', type=int, default=0, help='Reject larger request bodies with HTTP 413.')
+    parser.add_argument('--tips-error-rate', type=float, default=0.0, help='Probability of a TipsApiError response.')
+    parser.add_argument('--tips-error-code', default='InternalError')
+    parser.add_argument('--tips-error-message', default='Injected failure')
+    parser.add_argument('--http-error-rate', type=float, default=0.0, help='Probability of an HTTP error response.')
+    parser.add_argument('--http-error-statuses', type=lambda v: [int(s) for s in v.split(',')], default=[500, 502, 503])
+    parser.add_argument('--retry-after', type=int, help='Retry-After header of the HTTP error responses.')
+    parser.add_argument('--timeout-rate', type=float, default=0.0,
+                        help='Probability of a request being applied and its connection dropped without response.')
+    parser.add_argument('--timeout-delay', type=float, default=5.0, help='Seconds before a timed out connection is dropped.')
+    parser.add_argument('--fault-methods', type=lambda v: v.split(','), default=list(METHODS),
+                        help='Comma separated API methods faults are injected into.')
+    parser.add_argument('--idle-timeout', type=float, help='Seconds after which idle connections are closed.')
+    parser.add_argument('--no-compression', dest='compression', action='store_false',
+                        help='Never gzip responses, even when the client accepts it.')
+    parser.add_argument('--seed', type=int, help='Seed of the fault and jitter draws, for reproducible runs.')
+    parser.add_argument('--verbose', action='store_true', help='Log every request.')
+    args = parser.parse_args(argv)
+
+    store = Store()
+    for path in args.load:
+        with open(path, 'rb') as f:
+            store.load(f.read())
+    for entity, count in args.populate:
+        store.populate(entity, count)
+
+    settings = dict(vars(args))
+    for option in ('host', 'port', 'certfile', 'keyfile', 'client_cafile', 'load', 'populate'):
+        settings.pop(option)
+    emulator = TipsApiEmulator((args.host, args.port), store, **settings)
+    if args.certfile:
+        emulator.use_ssl(args.certfile, args.keyfile, args.client_cafile)
+    print(f'Serving {store.count()} elements on {emulator.url}{ROOT_PATH}', flush=True)
+    try:
+        emulator.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.server_close()
+        print(', '.join(f'{k}={v}' for k, v in sorted(emulator.stats.items())))
+
+
+if __name__ == '__main__':
+    main()